@@ -4,8 +4,9 @@ import logging
 
 logger = logging.getLogger("WFM.Main")
 
-logger.setLevel(logging.DEBUG)
-setup_checker = SetupChecker(requirements_file="requirements.txt", spacy_model="en_core_web_sm")
-setup_checker.run_checks()
-c = Controller(Config())
-
+# Worker processes re-import this module, so the GUI must only start in the main process
+if __name__ == '__main__':
+    logger.setLevel(logging.DEBUG)
+    setup_checker = SetupChecker(requirements_file="requirements.txt", spacy_model="en_core_web_sm")
+    setup_checker.run_checks()
+    c = Controller(Config())
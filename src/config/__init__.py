@@ -1,6 +1,6 @@
 from src.config.config import Config
 from src.config.lda_config import LdaConfig
-from src.config.reader_config import ReaderConfig
+from src.config.reader_config import ReaderConfig, ReaderSettings
 from src.config.processor_config import ProcessorConfig
 from src.config.gui_config import GuiConfig
 from src.config.general_config import *
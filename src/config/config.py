@@ -29,3 +29,10 @@ class Config(ABC):
         """
         logger.debug(f"Getting configuration value by key: {key}")
         return self._config.get(key)
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            A copy of all configuration values.
+        """
+        return dict(self._config)
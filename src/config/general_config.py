@@ -1 +1,25 @@
 special_character = "/&$%#@/"  # Marking beginning of references
+max_concurrent_jobs = 2  # Number of batches processed at the same time; each one loads its own spaCy model
+pdf_timeout = 120  # Seconds a single PDF may take in isolated extraction
+pdf_memory_limit = 2 * 1024 ** 3  # Bytes of address space per isolated extraction worker
+large_pdf_pages = 200  # Page count from which a document may be split across processes
+probe_pages = (1, 2, 3)  # Zero-based pages sampled to find the body font
+lda_backends = ("gensim", "sklearn_lda", "nmf")  # Training engines selectable in LdaConfig
+early_stopping_modes = ("none", "perplexity", "diff")  # Convergence checks selectable in LdaConfig
+lda_group_by = ("none", "folder", "year")  # Ways of splitting a batch into one model per group
+dedup_threshold = 0.8  # Estimated Jaccard similarity from which two texts are near-duplicate papers
+dedup_shingle_size = 5  # Words per shingle in near-duplicate detection
+dedup_permutations = 128  # MinHash permutations per document signature
+dedup_bands = 16  # LSH bands; 16 bands of 8 rows propose pairs from a similarity of about 0.7
+nlp_chunk_chars = 100_000  # Characters per spaCy call; longer texts are split at paragraph or sentence ends
+token_filter_flags = ("is_alpha", "is_digit", "is_punct", "is_space", "is_stop",
+                      "like_email", "like_num", "like_url")  # Lexical flags a token filter can drop or require
+token_filter_rules = ("drop_flags", "require_flags", "drop_pos", "drop_entities", "min_length", "drop_pattern")
+token_filters = {  # Named token filters selectable in ProcessorConfig
+    # What Processor.process has always kept: alphabetic words that are not stop words
+    "default": {"drop_flags": ("is_punct", "is_stop", "is_digit"), "require_flags": ("is_alpha",)},
+    # filter_tokens of token_extraction.ipynb
+    "notebook": {"drop_flags": ("is_stop", "is_punct", "like_email", "like_url", "like_num"),
+                 "drop_pos": ("PROPN",), "drop_entities": ("PERSON",), "min_length": 4,
+                 "drop_pattern": r'\b(?![A-Za-z]+\b)\S+\b'},
+}
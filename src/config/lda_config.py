@@ -1,4 +1,5 @@
 from src.config import Config
+from src.config.general_config import lda_backends, early_stopping_modes, lda_group_by
 from typing import Optional
 
 
@@ -12,7 +13,18 @@ class LdaConfig(Config):
                    iterations: int = 400,
                    eval_every: Optional[str | int] = None,
                    alpha: [float, int] = "auto",
-                   eta: [float, int] = "auto",):
+                   eta: [float, int] = "auto",
+                   workers: int = 1,
+                   backend: str = "gensim",
+                   early_stopping: str = "none",
+                   min_improvement: float = 0.001,
+                   patience: int = 2,
+                   holdout: float = 0.1,
+                   group_by: str = "none",
+                   dynamic: bool = False,
+                   checkpoint_every: int = 5,
+                   checkpoint_minutes: float = 10.0,
+                   export_corpus: bool = False):
         """
         :param no_below: If word occurs less than no_below times, the word is remove from the corpus
         :param no_above: If word occurs more than no_above times, the word is remove from the corpus
@@ -23,6 +35,21 @@ class LdaConfig(Config):
         :param eval_every: Should the model be evaluated at each step
         :param alpha: Alpha parameter for LDA
         :param eta: Eta parameter for LDA
+        :param workers: Number of processes building the dictionary and BoW corpus (worth it for large corpora),
+            also used as `n_jobs` of the scikit-learn LDA backend
+        :param backend: Training engine: "gensim" (LdaModel), "sklearn_lda" (LatentDirichletAllocation) or "nmf"
+        :param early_stopping: Convergence check between gensim passes: "perplexity" (held-out perplexity),
+            "diff" (change of the topic-word distributions) or "none" to always run every pass
+        :param min_improvement: Relative perplexity improvement (or topic change for "diff") below which a pass is stalled
+        :param patience: Number of consecutive stalled passes after which training stops
+        :param holdout: Fraction of the documents held out of training to measure perplexity on ("perplexity" only);
+            they are added to the model with one online update once training stops
+        :param group_by: "folder" or "year" trains one model per folder (or per year in the folder name)
+            plus one on all documents, from a single preprocessing pass; "none" trains a single model
+        :param dynamic: With group_by, also train a dynamic topic model with the groups as time slices
+        :param checkpoint_every: Save a training checkpoint every this many passes (0 to disable)
+        :param checkpoint_minutes: Save a training checkpoint when this many minutes passed since the last one (0 to disable)
+        :param export_corpus: Also write the filtered document-term matrix as a sparse `_corpus.npz` file
         :return:
         """
 
@@ -40,6 +67,23 @@ class LdaConfig(Config):
             "iterations": int(iterations),
             "eval_every": _to_int_or_none(eval_every),
             "alpha": alpha,
-            "eta": eta
+            "eta": eta,
+            "workers": max(1, int(workers)),
+            "backend": str(backend).strip().lower(),
+            "early_stopping": str(early_stopping).strip().lower(),
+            "min_improvement": float(min_improvement),
+            "patience": max(1, int(patience)),
+            "holdout": min(max(float(holdout), 0.0), 0.5),
+            "group_by": str(group_by).strip().lower(),
+            "dynamic": str(dynamic).strip().lower() in ("1", "true", "yes"),
+            "checkpoint_every": max(0, int(checkpoint_every)),
+            "checkpoint_minutes": max(0.0, float(checkpoint_minutes)),
+            "export_corpus": str(export_corpus).strip().lower() in ("1", "true", "yes"),
         }
+        if self._config["backend"] not in lda_backends:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {', '.join(lda_backends)}")
+        if self._config["early_stopping"] not in early_stopping_modes:
+            raise ValueError(f"Unknown early stopping {early_stopping!r}, expected one of {', '.join(early_stopping_modes)}")
+        if self._config["group_by"] not in lda_group_by:
+            raise ValueError(f"Unknown grouping {group_by!r}, expected one of {', '.join(lda_group_by)}")
 
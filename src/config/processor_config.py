@@ -1,10 +1,44 @@
 from src.config import Config
+from src.config.general_config import nlp_chunk_chars, token_filters, token_filter_flags, token_filter_rules
+from typing import Union
 
 
 class ProcessorConfig(Config):
-    def set_config(self, capitalise: bool = False):
+    def set_config(self, capitalise: bool = False, chunk_chars: int = nlp_chunk_chars, n_process: int = 1,
+                   token_filter: Union[str, dict] = "default"):
         """
         :param capitalise: Should the tokens be capitalised?
+        :param chunk_chars: Longest text passed to spaCy at once; longer texts are split at paragraph or
+                            sentence ends, so parser memory does not grow with the document (0 disables it)
+        :param n_process: Processes spaCy parses the chunks of one text with (`nlp.pipe`)
+        :param token_filter: Name of a filter in `token_filters` ("default" or "notebook"), or rules of the form
+                             {"drop_flags": (...), "require_flags": (...), "drop_pos": (...),
+                             "drop_entities": (...), "min_length": int, "drop_pattern": regex}
         :return:
         """
         self._config["capitalise"] = capitalise
+        self._config["chunk_chars"] = max(0, int(chunk_chars))
+        self._config["n_process"] = max(1, int(n_process))
+        self._config["token_filter"] = self._token_filter(token_filter)
+
+    @staticmethod
+    def _token_filter(token_filter: Union[str, dict]) -> dict:
+        if isinstance(token_filter, str):
+            if token_filter not in token_filters:
+                raise ValueError(f"token_filter must be one of {tuple(token_filters)} or a dict, got {token_filter!r}")
+            token_filter = token_filters[token_filter]
+        unknown = set(token_filter) - set(token_filter_rules)
+        if unknown:
+            raise ValueError(f"Unknown token filter rules {sorted(unknown)}, expected {token_filter_rules}")
+        rules = {
+            "drop_flags": tuple(token_filter.get("drop_flags", ())),
+            "require_flags": tuple(token_filter.get("require_flags", ())),
+            "drop_pos": tuple(token_filter.get("drop_pos", ())),
+            "drop_entities": tuple(token_filter.get("drop_entities", ())),
+            "min_length": int(token_filter.get("min_length", 0)),
+            "drop_pattern": token_filter.get("drop_pattern"),
+        }
+        flags = set(rules["drop_flags"] + rules["require_flags"]) - set(token_filter_flags)
+        if flags:
+            raise ValueError(f"Unknown token flags {sorted(flags)}, expected {token_filter_flags}")
+        return rules
@@ -1,5 +1,7 @@
+from dataclasses import dataclass, replace
 from src.config import Config
-from typing import Optional
+from src.config.general_config import large_pdf_pages, probe_pages
+from typing import Tuple
 
 
 class ReaderConfig(Config):
@@ -12,3 +14,30 @@ class ReaderConfig(Config):
             self._config["path"] = path
             return
         raise KeyError("Path key not found in the configuration.")
+
+
+@dataclass(frozen=True)
+class ReaderSettings:
+    """
+    Immutable, hashable settings of a PdfReader.
+
+    Unlike ReaderConfig they do not hold the path of a file, so one instance can be shared by
+    readers in many threads or processes and can be part of a cache key for extraction results.
+
+    :param probe: Whether `PdfReader.extract` probes the body font and keeps only text in that font.
+    :param probe_pages: Zero-based pages sampled when probing.
+    :param find_references: Whether to stop at the references heading.
+    :param page_workers: Number of processes sharing the pages of one large document (1 disables it).
+    :param parallel_threshold: Minimum page count for a document to be read in parallel.
+    """
+    probe: bool = False
+    probe_pages: Tuple[int, ...] = probe_pages
+    find_references: bool = True
+    page_workers: int = 1
+    parallel_threshold: int = large_pdf_pages
+
+    def replace(self, **changes) -> "ReaderSettings":
+        """
+        :return: A copy of the settings with the given fields changed.
+        """
+        return replace(self, **changes)
@@ -1,2 +1,3 @@
 from src.controller.controller import Controller
-from src.controller.setup import SetupChecker
\ No newline at end of file
+from src.controller.setup import SetupChecker
+from src.controller.scheduler import JobScheduler, Job
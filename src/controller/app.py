@@ -1,25 +1,46 @@
-from typing import Optional
-from src.config import ReaderConfig, ProcessorConfig, LdaConfig, special_character
-from src.processor import Processor, Lda
-from src.pdf_reader import PdfReader
+import os
+import threading
+from os import path
+from typing import List, Optional
+from src.config import ReaderSettings, ProcessorConfig, LdaConfig, special_character
+from src.processor import Processor, Lda, GroupedLda, DynamicLda, PassProgressMetric, TokenCheckpoint, group_of, \
+    files_digest
+from src.pdf_reader import PdfReader, Deduplicator
+from src.instrumentation import Profiler
 
 
 class App:
-    def __init__(self, gui, gui_data):
+    def __init__(self, gui, gui_data, cancel_event: Optional[threading.Event] = None, job_id: int = 0):
         # Initialize configurations and components
-        self._reader_config = ReaderConfig()
-        self._reader = PdfReader(self._reader_config)
+        self._profiler = Profiler()
+        self._reader_settings = ReaderSettings(page_workers=os.cpu_count() or 1)
+        self._reader = PdfReader(self._reader_settings, self._profiler)
+        # Copies and near copies of a paper are dropped before the NLP stage
+        self._deduplicator = Deduplicator(profiler=self._profiler)
 
         self._processor_config = ProcessorConfig()
         self._processor_config.set_config(capitalise=False)
-        self._processor = Processor(self._processor_config, 'en_core_web_sm')
+        self._processor = Processor(self._processor_config, 'en_core_web_sm', self._profiler)
+
+        # Checkpoints are keyed by their input, so they live outside the time-stamped output names
+        output_dir = gui_data[2].get("output_dir")
+        self._checkpoint_dir = path.join(output_dir, ".wfm_checkpoints") if output_dir else None
 
         self._lda_config = LdaConfig()
         self._lda_config.set_config(**gui_data[0])
-        self._lda = Lda(self._lda_config)
+        self._lda = Lda(self._lda_config, self._profiler, checkpoint_dir=self._checkpoint_dir)
+        self._group_by = self._lda_config.get("group_by")
+        # One shared token store for every group model, filled by the same preprocessing pass
+        self._grouped = GroupedLda(self._lda_config, self._profiler, checkpoint_dir=self._checkpoint_dir) \
+            if self._group_by != "none" else None
 
         self.gui = gui
         self.gui_data = gui_data
+        self._cancel_event = cancel_event or threading.Event()
+        self._job_id = job_id
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
 
     def start_processing(self, output_path: str):
         if not self.gui_data[1]:
@@ -27,30 +48,120 @@ class App:
             return
 
         list_length = len(self.gui_data[1])
-        for index, tup in enumerate(self.gui_data[1]):
-            _, file_path = tup
-            text = self.process_file(file_path)
-            if not text:
-                continue
-
-            # Process the text and add to the LDA model
-            self._processor.set_text(text)
-            self._lda.append_to_dtm(self._processor.process())
-            progress = index / list_length * 100
-            self.gui.update_bar(progress)
+        tokens_checkpoint = self._tokens_checkpoint()
+        done = tokens_checkpoint.load() if tokens_checkpoint else {}
+        try:
+            for index, tup in enumerate(self.gui_data[1]):
+                if self.is_cancelled():
+                    return
+                _, file_path = tup
+                if self._deduplicator.exact(file_path) is not None:
+                    self.gui.report_progress(self._job_id, "extraction", index + 1, list_length)
+                    self.gui.report_progress(self._job_id, "nlp", index + 1, list_length)
+                    continue
+                if file_path in done:
+                    # Preprocessed by an earlier, interrupted run; its signature still counts for near duplicates
+                    if self._deduplicator.near_signature(file_path, tokens_checkpoint.signatures.get(file_path)) is None:
+                        self._add_tokens(file_path, done[file_path])
+                    self.gui.report_progress(self._job_id, "extraction", index + 1, list_length)
+                    self.gui.report_progress(self._job_id, "nlp", index + 1, list_length)
+                    continue
+                text = self.process_file(file_path)
+                self.gui.report_progress(self._job_id, "extraction", index + 1, list_length)
+                if not text or self._deduplicator.near(file_path, text) is not None:
+                    self.gui.report_progress(self._job_id, "nlp", index + 1, list_length)
+                    continue
+
+                # Process the text and add to the LDA model
+                self._processor.set_text(text)
+                tokens = self._processor.process()
+                self._add_tokens(file_path, tokens)
+                if tokens_checkpoint:
+                    tokens_checkpoint.append(file_path, tokens, self._deduplicator.signature_of(file_path))
+                self.gui.report_progress(self._job_id, "nlp", index + 1, list_length)
+        finally:
+            # Extraction is over: stop the processes reading large documents
+            self._reader.shutdown()
+            if tokens_checkpoint:
+                tokens_checkpoint.close()
+
+        if self.is_cancelled():
+            return
+        if self._deduplicator.duplicates:
+            self.export_duplicates(path.splitext(output_path)[0] + "_duplicates.json")
 
         # Train and visualize the LDA model
         try:
-            self._lda.train_model()
-            self._lda.visualise(output_path)
+            if self._grouped is not None:
+                self.train_groups(output_path)
+            else:
+                passes = self._lda_config.get("passes")
+                self._lda.train_model(callbacks=[PassProgressMetric(self._on_pass, passes)])
+                self._lda.visualise(output_path)
+                if self._lda_config.get("export_corpus"):
+                    self._lda.export_sparse(path.splitext(output_path)[0] + "_corpus.npz")
+                self._lda.save_model(path.splitext(output_path)[0] + "_model")
+            if tokens_checkpoint:
+                tokens_checkpoint.remove()
         except Exception as e:
             self.gui.show_error("There was an error with the model: " + str(e))
+        finally:
+            self.export_profile(path.splitext(output_path)[0] + "_profile.json")
+
+    def _tokens_checkpoint(self) -> Optional[TokenCheckpoint]:
+        if not self._checkpoint_dir:
+            return None
+        digest = files_digest([file_path for _, file_path in self.gui_data[1]], self._processor_config.to_dict())
+        return TokenCheckpoint(path.join(self._checkpoint_dir, f"nlp_{digest}.jsonl"))
+
+    def _add_tokens(self, file_path: str, tokens: List[str]):
+        if self._grouped is not None:
+            self._grouped.append_to_dtm(tokens, group_of(file_path, self._group_by))
+        else:
+            self._lda.append_to_dtm(tokens)
+
+    def train_groups(self, output_path: str):
+        """
+        Train one model per group and write each group's visualisation and model next to `output_path`.
+        """
+        base = path.splitext(output_path)[0]
+        models = self._grouped.train_models(on_model=self._on_pass)
+        for name, lda in models.items():
+            lda.visualise(f"{base}_{name}.html")
+            lda.save_model(f"{base}_{name}_model")
+        if self._grouped.failures:
+            self.gui.show_error("Some groups could not be trained: " +
+                                ", ".join(f"{name} ({error})" for name, error in self._grouped.failures.items()))
+        if self._lda_config.get("dynamic") and not self.is_cancelled():
+            dynamic = DynamicLda(self._lda_config, self._profiler, checkpoint_dir=self._checkpoint_dir)
+            dynamic.train(*self._grouped.time_slices())
+            dynamic.visualise(f"{base}_dtm")
+            dynamic.save(f"{base}_dtm.gensim")
+
+    def export_profile(self, file_path: str):
+        """
+        Write the stage timings, peak memory and counters of this run to a JSON file.
+        """
+        try:
+            self._profiler.export_json(file_path)
+        except OSError as e:
+            self.gui.show_error("Could not write the profile: " + str(e))
+
+    def export_duplicates(self, file_path: str):
+        """
+        Write the papers left out as duplicates, with the paper each one duplicates, to a JSON file.
+        """
+        try:
+            self._deduplicator.export_json(file_path)
+        except OSError as e:
+            self.gui.show_error("Could not write the duplicates: " + str(e))
+
+    def _on_pass(self, done: int, total: int):
+        self.gui.report_progress(self._job_id, "training", done, total)
 
     def process_file(self, file_path) -> Optional[str]:
-        # Set file path and open the reader
-        self._reader.set_path(file_path)
         try:
-            self._reader.open()
+            return self._reader.extract(file_path)
         except ValueError as e:
             self.gui.show_error("There is a value error: " + str(e))
             return None
@@ -61,5 +172,3 @@ class App:
             self.gui.show_error("Something went wrong: " + str(e))
             return None
 
-        return self._reader.read()
-
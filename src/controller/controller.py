@@ -1,37 +1,26 @@
-import threading
 from os import path
 from src.gui import Gui
-from src.config import Config
+from src.config import Config, max_concurrent_jobs
 from .app import App
+from .scheduler import JobScheduler
 import logging
 from datetime import datetime
 logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s', level=logging.INFO)
 logger = logging.getLogger("WFM.Controller")
 
 
-class _Thread(threading.Thread):
-    def __init__(self, app_instance, output_path: str):
-        super().__init__()
-        self.app_instance = app_instance
-        self.output_path = output_path
-
-    def run(self):
-        # Run the App instance's start function in this thread
-        self.app_instance.start_processing(self.output_path)
-
-
 class Controller:
-    def __init__(self, conf: Config):
+    def __init__(self, conf: Config, max_workers: int = max_concurrent_jobs):
         self._config = conf
         self._gui_data = ()
-        self.thread_pool = []  # Store all thread instances
+        self._scheduler = JobScheduler(max_workers)  # Bounded pool of batch workers
 
-        # Initialize GUI with start callback
-        self._gui = Gui(self.start)
+        # Initialize GUI with start and cancel callbacks
+        self._gui = Gui(self.start, self.cancel)
         self._gui.run()
 
     def start(self):
-        # Start a new App instance and thread each time this is called
+        # Queue a new batch each time this is called
         self._gui_data = self._gui.get_data()
         output_dict = self._gui_data[2]
         _ = output_dict.get('viewing_dir').split(path.sep)[-1]
@@ -43,14 +32,26 @@ class Controller:
             return
 
         output_path = path.join(output_dir, file_name)
-        self._gui.update_bar(-1)
-
-        # Create a new App instance and thread for this start action
-        app_instance = App(self._gui, self._gui_data)
-        thread = _Thread(app_instance, output_path)
-        self.thread_pool.append(thread)  # Keep track of threads
-        thread.start()
 
+        # The App (and its spaCy model) is only created once a worker slot is free
+        gui_data = self._gui_data
+
+        def run(job):
+            try:
+                app_instance = App(self._gui, gui_data, job.cancel_event, job.job_id)
+                app_instance.start_processing(output_path)
+            except Exception as e:
+                # e.g. the spaCy model cannot be loaded; the scheduler marks the job as failed
+                self._gui.show_error(f"{job.name} failed: {e}")
+                raise
+            finally:
+                self._gui.finish_progress(job.job_id)
+
+        self._scheduler.submit(run, name=f"Batch {_}")
+
+    def cancel(self):
+        # Cancel all queued and running batches
+        self._scheduler.cancel_all()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,232 @@
+import threading
+import itertools
+import logging
+import unittest
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger("WFM.Scheduler")
+
+
+class Job:
+    """
+    A single batch of files waiting for, or running in, a worker thread.
+
+    :param job_id: Unique identifier of the job.
+    :param target: Callable run in the worker thread. It receives the job itself.
+    :param name: Human-readable label used in log messages.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    FINISHED = "finished"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
+
+    def __init__(self, job_id: int, target: Callable[["Job"], None], name: str = ""):
+        self.job_id = job_id
+        self.name = name or f"Job {job_id}"
+        self.state = Job.QUEUED
+        self.cancel_event = threading.Event()
+        self._target = target
+
+    def run(self):
+        self._target(self)
+
+    def __str__(self):
+        return f"{self.name} ({self.state})"
+
+
+class _Thread(threading.Thread):
+    def __init__(self, job: Job, on_done: Callable[[Job], None]):
+        super().__init__(name=f"WFM-{job.name}", daemon=True)
+        self.job = job
+        self._on_done = on_done
+
+    def run(self):
+        # Run the job and always report back to the scheduler, even on failure
+        try:
+            self.job.run()
+            self.job.state = Job.CANCELLED if self.job.cancel_event.is_set() else Job.FINISHED
+        except Exception as e:
+            logger.error(f"{self.job.name} failed: {e}")
+            self.job.state = Job.FAILED
+        finally:
+            self._on_done(self.job)
+
+
+class JobScheduler:
+    """
+    Runs jobs in worker threads with a fixed concurrency limit.
+
+    Jobs beyond the limit wait in a FIFO queue and are started as running jobs finish.
+    Finished threads are dropped as soon as they complete, so nothing accumulates.
+
+    :param max_workers: Maximum number of jobs running at the same time.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._queue: Deque[Job] = deque()
+        self._running: Dict[int, _Thread] = {}
+        logger.info(f"JobScheduler initialized with {max_workers} worker(s)")
+
+    def submit(self, target: Callable[[Job], None], name: str = "") -> Job:
+        """
+        Queue a new job and start it if a worker slot is free.
+
+        :param target: Callable receiving the job, whose cancel event it should check.
+        :param name: Optional label of the job.
+        :return: The queued job.
+        """
+        with self._lock:
+            job = Job(next(self._ids), target, name)
+            self._queue.append(job)
+            logger.info(f"{job.name} queued ({len(self._queue)} waiting)")
+            self._dispatch()
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancel a job. Queued jobs are removed, running jobs are asked to stop at the next checkpoint.
+
+        :param job_id: Identifier of the job to cancel.
+        :return: True if the job was found.
+        """
+        with self._lock:
+            for job in self._queue:
+                if job.job_id == job_id:
+                    self._queue.remove(job)
+                    job.cancel_event.set()
+                    job.state = Job.CANCELLED
+                    logger.info(f"{job.name} removed from queue")
+                    return True
+            thread = self._running.get(job_id)
+            if thread:
+                thread.job.cancel_event.set()
+                logger.info(f"{thread.job.name} cancellation requested")
+                return True
+        return False
+
+    def cancel_all(self):
+        """
+        Cancel every queued and running job.
+        """
+        with self._lock:
+            job_ids = [job.job_id for job in self._queue] + list(self._running)
+        for job_id in job_ids:
+            self.cancel(job_id)
+
+    def get_jobs(self) -> List[Job]:
+        """
+        :return: Running jobs followed by queued jobs in FIFO order.
+        """
+        with self._lock:
+            return [thread.job for thread in self._running.values()] + list(self._queue)
+
+    def active_count(self) -> int:
+        with self._lock:
+            return len(self._running)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def join(self, timeout: Optional[float] = None):
+        """
+        Wait for the currently running threads to finish.
+        """
+        with self._lock:
+            threads = list(self._running.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    def _dispatch(self):
+        # Must be called with the lock held
+        while self._queue and len(self._running) < self._max_workers:
+            job = self._queue.popleft()
+            job.state = Job.RUNNING
+            thread = _Thread(job, self._on_done)
+            self._running[job.job_id] = thread
+            thread.start()
+            logger.info(f"{job.name} started ({len(self._running)}/{self._max_workers} workers busy)")
+
+    def _on_done(self, job: Job):
+        with self._lock:
+            self._running.pop(job.job_id, None)
+            logger.info(f"{job.name} {job.state}")
+            self._dispatch()
+
+
+class TestJobScheduler(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = []
+
+    def tearDown(self):
+        self.release.set()
+
+    def _blocking(self, job: Job):
+        self.started.append(job.job_id)
+        self.release.wait(5)
+
+    def test_limits_running_jobs(self):
+        scheduler = JobScheduler(max_workers=2)
+        jobs = [scheduler.submit(self._blocking) for _ in range(3)]
+
+        self.assertEqual(scheduler.active_count(), 2)
+        self.assertEqual(scheduler.pending_count(), 1)
+        self.assertEqual([job.state for job in jobs], [Job.RUNNING, Job.RUNNING, Job.QUEUED])
+
+        self.release.set()
+        scheduler.join(5)
+        scheduler.join(5)  # The queued job starts once a worker slot is free
+        self.assertEqual(sorted(self.started), [1, 2, 3])
+        self.assertEqual([job.state for job in jobs], [Job.FINISHED] * 3)
+
+    def test_fifo_order(self):
+        scheduler = JobScheduler(max_workers=1)
+        for _ in range(3):
+            scheduler.submit(lambda job: self.started.append(job.job_id))
+        for _ in range(3):
+            scheduler.join(5)
+        self.assertEqual(self.started, [1, 2, 3])
+
+    def test_cancel(self):
+        scheduler = JobScheduler(max_workers=1)
+        running = scheduler.submit(self._blocking)
+        queued = scheduler.submit(self._blocking)
+
+        scheduler.cancel_all()
+        self.assertEqual(queued.state, Job.CANCELLED)
+        self.assertTrue(running.cancel_event.is_set())
+        self.release.set()
+        scheduler.join(5)
+        self.assertEqual(running.state, Job.CANCELLED)
+        self.assertEqual(self.started, [running.job_id])
+        self.assertFalse(scheduler.cancel(running.job_id))
+
+    def test_failed_job_frees_its_slot(self):
+        scheduler = JobScheduler(max_workers=1)
+
+        def fail(job: Job):
+            raise RuntimeError("boom")
+
+        failed = scheduler.submit(fail)
+        after = scheduler.submit(lambda job: self.started.append(job.job_id))
+        for _ in range(2):
+            scheduler.join(5)
+        self.assertEqual(failed.state, Job.FAILED)
+        self.assertEqual(after.state, Job.FINISHED)
+
+    def test_invalid_worker_count(self):
+        with self.assertRaises(ValueError):
+            JobScheduler(max_workers=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
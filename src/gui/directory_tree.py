@@ -1,23 +1,42 @@
 import os
+import queue
+import threading
 import tkinter as tk
+from collections import OrderedDict, deque
 from tkinter import ttk
-from typing import Any, Optional
+from typing import Any, Deque, List, Optional, Tuple
 
 
 class DirectoryTree:
     """
     Class to handle directory data and display it, including navigation and PDF files.
 
+    Directories are scanned with os.scandir in a background thread and the results are
+    inserted into the listbox in chunks from the Tk thread. Listings are cached per directory
+    and reused while the directory's modification time is unchanged.
+
     :param parent: The parent widget.
     :param on_pdf_click: Callback function when a PDF is clicked.
     """
 
+    CHUNK_SIZE = 500  # Listbox rows inserted per Tk tick
+    POLL_INTERVAL = 20  # Milliseconds between two checks of the scan results
+    CACHE_SIZE = 256  # Number of directory listings kept in memory
+
     def __init__(self, parent: tk.Widget, on_pdf_click):
         # Initialised later
         self._contents_frame = None
         self._scrollbar = None
         self._contents_listbox = None
 
+        # Background scanning state
+        self._results: "queue.Queue[Tuple[int, str, float, Optional[List[str]]]]" = queue.Queue()
+        self._pending: Deque[str] = deque()
+        self._cache: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+        self._generation = 0
+        self._scans_in_flight = 0
+        self._polling = False
+
         # Initialised here
         self._parent = parent
         self._current_path = os.path.expanduser('~')
@@ -83,24 +102,91 @@ class DirectoryTree:
     def populate_contents(self):
         """
         Populate the listbox with folders and PDF files in the current directory.
+
+        A cached listing is shown immediately; the directory is then scanned in the background
+        and the listbox is refreshed only if the directory changed since it was cached.
         """
-        # Clear the listbox
+        # Results of scans started for other directories are discarded
+        self._generation += 1
+        self._pending.clear()
         self._contents_listbox.delete(0, tk.END)
-        try:
-            items = os.listdir(self._current_path)
-            items.sort()
-            for item in items:
-                if item.startswith('.'):
+
+        path = self._current_path
+        cached = self._cache.get(path)
+        cached_mtime = None
+        if cached:
+            cached_mtime, lines = cached
+            self._cache.move_to_end(path)
+            self._contents_listbox.insert(tk.END, *lines)
+
+        self._scans_in_flight += 1
+        threading.Thread(target=self._scan, args=(path, self._generation, cached_mtime), daemon=True).start()
+        if not self._polling:
+            self._polling = True
+            self._parent.after(self.POLL_INTERVAL, self._poll_results)
+
+    @staticmethod
+    def _list_directory(path: str) -> List[str]:
+        """
+        List the folders and PDF files of a directory as listbox lines, using the cached DirEntry types.
+        """
+        items = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir():
+                        items.append((entry.name, f" > {entry.name}"))
+                    elif entry.name.lower().endswith('.pdf'):
+                        items.append((entry.name, f" - {entry.name}"))
+                except OSError:
                     continue
-                abs_path = os.path.join(self._current_path, item)
-                if os.path.isdir(abs_path):
-                    display_text = f" > {item}"
-                    self._contents_listbox.insert(tk.END, display_text)
-                elif item.lower().endswith('.pdf'):
-                    display_text = f" - {item}"
-                    self._contents_listbox.insert(tk.END, display_text)
+        items.sort()
+        return [line for _, line in items]
+
+    def _scan(self, path: str, generation: int, cached_mtime: Optional[float]):
+        # Runs in a worker thread; never touches Tk widgets. An unchanged directory is reported with None.
+        try:
+            mtime = os.stat(path).st_mtime
+            if mtime == cached_mtime:
+                self._results.put((generation, path, mtime, None))
+                return
+            self._results.put((generation, path, mtime, self._list_directory(path)))
         except PermissionError:
-            self._contents_listbox.insert(tk.END, "Permission Denied")
+            self._results.put((generation, path, -1.0, ["Permission Denied"]))
+        except OSError:
+            self._results.put((generation, path, -1.0, []))
+
+    def _poll_results(self):
+        # Runs on the Tk thread: apply finished scans and insert one chunk of pending rows
+        while True:
+            try:
+                generation, path, mtime, lines = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._scans_in_flight -= 1
+            if lines is None:
+                continue
+            if mtime >= 0:
+                self._cache[path] = (mtime, lines)
+                self._cache.move_to_end(path)
+                while len(self._cache) > self.CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            if generation != self._generation:
+                continue
+            # The directory changed since it was cached (or was never cached)
+            self._contents_listbox.delete(0, tk.END)
+            self._pending = deque(lines)
+
+        if self._pending:
+            chunk = [self._pending.popleft() for _ in range(min(self.CHUNK_SIZE, len(self._pending)))]
+            self._contents_listbox.insert(tk.END, *chunk)
+
+        if self._pending or self._scans_in_flight:
+            self._parent.after(self.POLL_INTERVAL, self._poll_results)
+        else:
+            self._polling = False
 
     def navigate_to(self, path: str) -> None:
         """
@@ -1,3 +1,4 @@
+import os
 import tkinter as tk
 from .pane import Pane
 from .directory_tree import DirectoryTree
@@ -5,8 +6,10 @@ from .progress_bar import ProgressBar
 from .config_pane import ConfigPane
 from .list_pane import ListPane
 from .action_pane import ActionPane
+from .progress_channel import ProgressChannel
+import threading
 from tkinter import messagebox
-from typing import Tuple, Dict, List, Callable
+from typing import Tuple, Dict, List, Callable, Optional
 
 
 class Gui:
@@ -14,10 +17,14 @@ class Gui:
     Main GUI class that brings together all components.
     """
 
-    def __init__(self, start_function: Callable):
+    POLL_INTERVAL = 100  # Milliseconds between two drains of the progress channel
+
+    def __init__(self, start_function: Callable, cancel_function: Optional[Callable] = None):
         """
         Initialize the GUI application.
 
+        :param start_function: Called when the 'Start' button is pressed.
+        :param cancel_function: Called when the 'Cancel' button is pressed.
         """
 
         # Initialised Later
@@ -32,11 +39,14 @@ class Gui:
 
         # Initialised now
         self._start_function = start_function
+        self._cancel_function = cancel_function
         self._root = tk.Tk()
         self._root.title("Topic Modeling")
         self._root.geometry("1000x600")
         self._root.resizable(False, False)
+        self._progress_channel = ProgressChannel()
         self.create_panes()
+        self._root.after(self.POLL_INTERVAL, self._poll_progress)
 
     def create_panes(self):
         """
@@ -67,7 +77,7 @@ class Gui:
         """
         Callback function when a PDF is clicked.
         """
-        label = name[3:].strip(".pdf")
+        label = os.path.splitext(name[3:])[0]  # Drop the tree icon prefix and the extension, as in add_folder
         self.add_group(label, path)
 
     def create_right_pane(self):
@@ -88,6 +98,12 @@ class Gui:
             {'label': 'eval_every', 'default': "None"},
             {'label': 'alpha', 'default': "auto"},
             {'label': 'eta', 'default': "auto"},
+            {'label': 'backend', 'default': "gensim"},
+            {'label': 'early_stopping', 'default': "none"},
+            {'label': 'min_improvement', 'default': 0.001},
+            {'label': 'group_by', 'default': "none"},
+            {'label': 'dynamic', 'default': False},
+            {'label': 'export_corpus', 'default': False},
             {'label': 'output_dir', 'default': ''}
         ]
         self._config_pane = ConfigPane(self._right_pane.get_frame(), config_inputs, padx=5, pady=5)
@@ -101,7 +117,9 @@ class Gui:
         # Bottom: ActionPane
         actions = [
             {'text': 'Start', 'command': self.start_action},
-            {'text': 'Clear', 'command': self.clear_list}
+            {'text': 'Add Folder', 'command': self.add_folder},
+            {'text': 'Clear', 'command': self.clear_list},
+            {'text': 'Cancel', 'command': self.cancel_action}
         ]
         self._action_pane = ActionPane(self._right_pane.get_frame(), actions, padx=5, pady=5)
         self._action_pane.get_frame().pack(fill=tk.X)
@@ -116,6 +134,21 @@ class Gui:
         """
         self._list_pane.add_item(name, path)
 
+    def add_folder(self):
+        """
+        Add every PDF in the directory currently shown in the directory tree.
+        """
+        directory = self._directory_tree.get_viewing_directory()
+        try:
+            with os.scandir(directory) as entries:
+                pdfs = sorted((os.path.splitext(entry.name)[0], entry.path) for entry in entries
+                              if entry.name.lower().endswith('.pdf') and not entry.name.startswith('.')
+                              and entry.is_file())
+        except OSError as e:
+            self.show_error("Could not read the folder: " + str(e))
+            return
+        self._list_pane.add_items(pdfs)
+
     def delete_group(self):
         """
         Delete the selected group.
@@ -138,6 +171,13 @@ class Gui:
         """
         self._start_function()
 
+    def cancel_action(self):
+        """
+        Function for the 'Cancel' button action.
+        """
+        if self._cancel_function:
+            self._cancel_function()
+
     def get_data(self) -> Tuple[Dict, List[str], Dict]:
         """
         Function to get the data from the GUI
@@ -158,13 +198,42 @@ class Gui:
 
     def show_error(self, error: str):
         """
-        Function for showing an error message.
+        Function for showing an error message. Safe to call from worker threads.
 
         :param error: Error message.
         :return:
         """
+        if threading.current_thread() is not threading.main_thread():
+            self._progress_channel.error(error)
+            return
         messagebox.showwarning("Error", error)
 
+    def report_progress(self, job_id: int, stage: str, done: float, total: float):
+        """
+        Report the progress of a job stage. Safe to call from worker threads.
+
+        :param job_id: Identifier of the job.
+        :param stage: Stage name ("extraction", "nlp" or "training").
+        :param done: Number of completed units.
+        :param total: Total number of units.
+        """
+        self._progress_channel.report(job_id, stage, done, total)
+
+    def finish_progress(self, job_id: int):
+        """
+        Mark a job as finished. Safe to call from worker threads.
+        """
+        self._progress_channel.finish(job_id)
+
+    def _poll_progress(self):
+        # Runs on the Tk thread: apply all queued progress events in a single update
+        progress, errors = self._progress_channel.drain()
+        if progress is not None:
+            self.update_bar(progress)
+        for error in errors:
+            self.show_error(error)
+        self._root.after(self.POLL_INTERVAL, self._poll_progress)
+
     def update_bar(self, progress: float):
         if progress < 0:
             self._progress_bar.clear()
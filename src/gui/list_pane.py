@@ -1,12 +1,15 @@
 from .pane import Pane
 import tkinter as tk
-from typing import List
+from typing import Dict, Iterable, List, Tuple
 
 
 class ListPane(Pane):
     """
     Pane that displays a list of items (e.g., groups) with associated paths.
 
+    Items are indexed by path, so duplicate checks are a dictionary lookup and the
+    listbox is only updated for the rows that actually change.
+
     :param parent: The parent widget.
     :param items: Initial list of items.
     :param **kwargs: Additional keyword arguments for Pane.
@@ -20,30 +23,35 @@ class ListPane(Pane):
         :param path: The associated path for the item.
         """
 
-        def __init__(self, text: str, path: str, index: int) -> None:
+        def __init__(self, text: str, path: str) -> None:
             self.text = text
             self.path = path
-            self.index = index
 
         def __str__(self) -> str:
             # Represent the item by its text for displaying in the listbox
-            return str(self.index+1)+". "+self.text
+            return self.text
 
     def __init__(self, parent: tk.Widget, items: List[str], paths: List[str], **kwargs) -> None:
         super().__init__(parent, **kwargs)
-        self.listbox = tk.Listbox(self.frame, width=150)
+        self._count_label = tk.Label(self.frame, anchor='w')
+        self._count_label.pack(side=tk.TOP, fill=tk.X)
+        self.listbox = tk.Listbox(self.frame, width=150, selectmode=tk.EXTENDED)
         self.listbox.pack(side=tk.LEFT, fill=tk.Y)
         scrollbar = tk.Scrollbar(self.frame, orient=tk.VERTICAL)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.listbox.config(yscrollcommand=scrollbar.set)
         scrollbar.config(command=self.listbox.yview)
-        self.items = []  # List of _Item instances
+        self._items: Dict[str, ListPane._Item] = {}  # Path -> item, for O(1) duplicate checks
+        self._order: List[str] = []  # Paths in listbox order
         self.init_items(items, paths)
-        self._populate_list()
+        self._update_count()
+
+    @property
+    def items(self) -> List["ListPane._Item"]:
+        return [self._items[path] for path in self._order]
 
-    def _populate_list(self):
-        for item in self.items:
-            self.listbox.insert(tk.END, item)
+    def _update_count(self):
+        self._count_label.config(text=f"{len(self._order)} file(s) selected")
 
     def init_items(self, items: List[str], paths: List[str]) -> None:
         """
@@ -53,9 +61,7 @@ class ListPane(Pane):
         :param paths: List of associated paths for each item.
         :return: None
         """
-        for index, text, path in enumerate(zip(items, paths)):
-            item = self._Item(text, path, index)
-            self.items.append(item)
+        self.add_items(zip(items, paths))
 
     def get_selected_item(self) -> str:
         """
@@ -66,7 +72,7 @@ class ListPane(Pane):
         selected_indices = self.listbox.curselection()
         if selected_indices:
             index = selected_indices[0]
-            return self.items[index].text
+            return self._items[self._order[index]].text
         return ''
 
     def get_selected_path(self) -> str:
@@ -78,7 +84,7 @@ class ListPane(Pane):
         selected_indices = self.listbox.curselection()
         if selected_indices:
             index = selected_indices[0]
-            return self.items[index].path
+            return self._order[index]
         return ''
 
     def add_item(self, text: str, path: str) -> None:
@@ -89,28 +95,39 @@ class ListPane(Pane):
         :param path: The associated path for the item.
         :return: None
         """
-        # Check for duplicates based on text only
-        if text not in [item.text for item in self.items]:
+        self.add_items([(text, path)])
+
+    def add_items(self, items: Iterable[Tuple[str, str]]) -> int:
+        """
+        Add many (text, path) items with a single listbox update. Paths already in the list are skipped.
 
-            item = self._Item(text, path,len(self.items))
-            self.items.append(item)
-            self.listbox.insert(tk.END, item)
+        :param items: Iterable of (text, path) tuples.
+        :return: The number of items added.
+        """
+        added = []
+        for text, path in items:
+            if path in self._items:
+                continue
+            item = self._Item(text, path)
+            self._items[path] = item
+            self._order.append(path)
+            added.append(str(item))
+        if added:
+            self.listbox.insert(tk.END, *added)
+            self._update_count()
+        return len(added)
 
     def delete_selected_item(self) -> None:
         """
-        Delete the currently selected item from the listbox.
+        Delete the currently selected items from the listbox.
 
         :return: None
         """
-        selected_indices = self.listbox.curselection()
-        if selected_indices:
-            index = selected_indices[0]
+        # Delete from the end so the remaining indices stay valid
+        for index in sorted(self.listbox.curselection(), reverse=True):
             self.listbox.delete(index)
-            del self.items[index]
-            self.listbox.delete(0, tk.END)
-            for index, item in enumerate(self.items):
-                item.index = index
-            self._populate_list()
+            del self._items[self._order.pop(index)]
+        self._update_count()
 
     def get_items(self) -> List[tuple]:
         """
@@ -118,7 +135,7 @@ class ListPane(Pane):
 
         :return: A list of tuples containing text and path of each item.
         """
-        return [(item.text, item.path) for item in self.items]
+        return [(self._items[path].text, path) for path in self._order]
 
     def clear_list(self):
         """
@@ -126,4 +143,6 @@ class ListPane(Pane):
         :return:
         """
         self.listbox.delete(0, tk.END)
-        self.items = []
+        self._items = {}
+        self._order = []
+        self._update_count()
@@ -21,17 +21,14 @@ class ProgressBar(Pane):
 
     def update(self, progress: float) -> Optional[float]:
         """
-        Update the progress display based on the provided progress value.
+        Set the progress display to the provided progress value.
 
-        :param progress: Float between 0 and 1 representing the progress level.
+        :param progress: Float between 0 and 100 representing the overall progress.
         :return: None
         """
         if progress < 0 or progress > 100:
             return progress
-        if progress + self._progressbar['value'] >= 100:
-            self._progressbar['value'] = 100
-        else:
-            self._progressbar.step(progress)
+        self._progressbar['value'] = progress
 
     def clear(self):
         self._progressbar['value'] = 0
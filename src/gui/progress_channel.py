@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+import unittest
+from typing import Dict, List, Optional, Tuple
+
+# Share of the overall job progress taken by each processing stage
+STAGE_WEIGHTS = {
+    "extraction": 0.3,
+    "nlp": 0.3,
+    "training": 0.4,
+}
+
+
+class ProgressChannel:
+    """
+    Thread-safe channel carrying progress events from worker threads to the Tk thread.
+
+    Workers call `report` from any thread. The GUI calls `drain` from the Tk thread
+    (via `root.after`) and receives the overall progress across all jobs.
+    Events of a stage are throttled to one per `min_interval` seconds on the worker side,
+    and all events queued between two drains are coalesced into a single bar update.
+
+    :param min_interval: Minimum number of seconds between two events of the same job stage.
+    """
+
+    DONE = "done"
+    ERROR = "error"
+
+    def __init__(self, min_interval: float = 0.2):
+        self._queue: "queue.Queue[Tuple[int, str, float, Optional[str]]]" = queue.Queue()
+        self._min_interval = min_interval
+        self._last_sent: Dict[Tuple[int, str], float] = {}
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, Dict[str, float]] = {}  # Only touched from the Tk thread
+
+    def report(self, job_id: int, stage: str, done: float, total: float) -> None:
+        """
+        Report the progress of one stage of a job.
+
+        :param job_id: Identifier of the job.
+        :param stage: Name of the stage, one of STAGE_WEIGHTS.
+        :param done: Number of completed units of work.
+        :param total: Total number of units of work.
+        """
+        fraction = min(max(done / total, 0.0), 1.0) if total else 1.0
+        now = time.monotonic()
+        key = (job_id, stage)
+        with self._lock:
+            if fraction < 1.0 and now - self._last_sent.get(key, 0.0) < self._min_interval:
+                return
+            self._last_sent[key] = now
+        self._queue.put((job_id, stage, fraction, None))
+
+    def finish(self, job_id: int) -> None:
+        """
+        Mark a job as finished or cancelled.
+        """
+        with self._lock:
+            for key in [key for key in self._last_sent if key[0] == job_id]:
+                del self._last_sent[key]
+        self._queue.put((job_id, ProgressChannel.DONE, 1.0, None))
+
+    def error(self, message: str) -> None:
+        """
+        Send an error message to be shown by the Tk thread.
+        """
+        self._queue.put((0, ProgressChannel.ERROR, 0.0, message))
+
+    def drain(self) -> Tuple[Optional[float], List[str]]:
+        """
+        Consume all pending events. Must be called from the Tk thread.
+
+        :return: (overall progress in percent or None if nothing changed, error messages)
+        """
+        changed = False
+        errors = []
+        while True:
+            try:
+                job_id, stage, fraction, message = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if stage == ProgressChannel.ERROR:
+                errors.append(message)
+                continue
+            changed = True
+            if stage == ProgressChannel.DONE:
+                # Finished jobs count as complete until every tracked job is done
+                self._jobs[job_id] = dict.fromkeys(STAGE_WEIGHTS, 1.0)
+            else:
+                self._jobs.setdefault(job_id, {})[stage] = fraction
+
+        if not changed:
+            return None, errors
+        progress = self._overall()
+        if progress >= 100 - 1e-6:
+            self._jobs.clear()
+        return progress, errors
+
+    def _overall(self) -> float:
+        if not self._jobs:
+            return 100.0
+        total = 0.0
+        for stages in self._jobs.values():
+            total += sum(weight * stages.get(stage, 0.0) for stage, weight in STAGE_WEIGHTS.items())
+        return total / len(self._jobs) * 100
+
+
+class TestProgressChannel(unittest.TestCase):
+    def test_stages_are_weighted(self):
+        channel = ProgressChannel(min_interval=0)
+        channel.report(1, "extraction", 1, 1)
+        channel.report(1, "nlp", 1, 2)
+
+        progress, errors = channel.drain()
+        self.assertAlmostEqual(progress, (0.3 + 0.15) * 100)
+        self.assertEqual(errors, [])
+        self.assertEqual(channel.drain(), (None, []))
+
+    def test_jobs_are_averaged(self):
+        channel = ProgressChannel(min_interval=0)
+        channel.report(1, "extraction", 1, 1)
+        channel.report(2, "extraction", 0, 1)
+
+        progress, _ = channel.drain()
+        self.assertAlmostEqual(progress, 15.0)
+
+        channel.finish(1)
+        progress, _ = channel.drain()
+        self.assertAlmostEqual(progress, 50.0)
+
+        # Once every job is done the bar is full and the jobs are forgotten
+        channel.finish(2)
+        self.assertAlmostEqual(channel.drain()[0], 100.0)
+        channel.report(3, "training", 1, 2)
+        self.assertAlmostEqual(channel.drain()[0], 20.0)
+
+    def test_reports_are_throttled(self):
+        channel = ProgressChannel(min_interval=60)
+        channel.report(1, "nlp", 1, 10)
+        channel.report(1, "nlp", 2, 10)
+        channel.report(1, "extraction", 1, 10)
+        self.assertEqual(channel._queue.qsize(), 2)
+
+        # The end of a stage is never dropped
+        channel.report(1, "nlp", 10, 10)
+        progress, _ = channel.drain()
+        self.assertAlmostEqual(progress, (0.03 + 0.3) * 100)
+
+    def test_errors(self):
+        channel = ProgressChannel()
+        channel.error("first")
+        channel.error("second")
+        self.assertEqual(channel.drain(), (None, ["first", "second"]))
+
+    def test_report_from_threads(self):
+        channel = ProgressChannel(min_interval=0)
+        threads = [threading.Thread(target=channel.report, args=(job_id, "training", 1, 1)) for job_id in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertAlmostEqual(channel.drain()[0], 40.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
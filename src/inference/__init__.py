@@ -0,0 +1,2 @@
+from src.inference.topic_inferencer import TopicInferencer
+from src.inference.server import InferenceServer
@@ -0,0 +1,39 @@
+"""
+Classify new documents against a model saved next to a run's visualisation (`<name>_model`).
+
+    python -m src.inference --model ./output/<name>_model paper1.pdf paper2.pdf
+    python -m src.inference --model ./output/<name>_model --serve --port 8765
+"""
+import sys
+import json
+import logging
+import argparse
+from src.inference import TopicInferencer, InferenceServer
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", required=True, help="Directory written by Lda.save_model")
+    parser.add_argument("--spacy-model", default="en_core_web_sm", help="spaCy model used for training")
+    parser.add_argument("--serve", action="store_true", help="Serve POST /infer on a local HTTP port")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("pdfs", nargs="*", help="PDF files to classify")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s', level=logging.INFO)
+    inferencer = TopicInferencer(args.model, model_name=args.spacy_model)
+    if args.pdfs:
+        json.dump(inferencer.infer_pdfs(args.pdfs), sys.stdout, indent=2)
+        print()
+    if args.serve:
+        with InferenceServer(inferencer, (args.host, args.port)) as server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+import threading
+import unittest
+from urllib import request as urllib_request
+from urllib.error import HTTPError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from src.inference.topic_inferencer import TopicInferencer, save_test_model, topic_text
+
+logger = logging.getLogger("WFM.InferenceServer")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "InferenceServer"
+
+    def _send(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, self.server.inferencer.info())
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/infer":
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            paths, texts = request.get("paths", []), request.get("texts", [])
+            if not isinstance(paths, list) or not isinstance(texts, list) or not (paths or texts):
+                raise ValueError('Expected a JSON object with a "paths" and/or "texts" list')
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+        try:
+            inferencer = self.server.inferencer
+            self._send(200, {"paths": inferencer.infer_pdfs(paths) if paths else [],
+                             "texts": inferencer.infer_texts(texts) if texts else []})
+        except Exception as e:
+            logger.exception("Inference failed")
+            self._send(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class InferenceServer(ThreadingHTTPServer):
+    """
+    Local HTTP endpoint of a `TopicInferencer`.
+
+    GET /health returns the model information; POST /infer takes {"paths": [...], "texts": [...]}
+    (PDF paths readable by the server and/or raw texts) and returns the results of both lists.
+
+    :param inferencer: The loaded inferencer.
+    :param address: (host, port) to listen on; binds to localhost by default.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, inferencer: TopicInferencer, address: Tuple[str, int] = ("127.0.0.1", 8765)):
+        super().__init__(address, _Handler)
+        self.inferencer = inferencer
+        logger.info(f"Serving topic inference on http://{address[0]}:{self.server_address[1]}")
+
+
+class TestInferenceServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.mkdtemp()
+        inferencer = TopicInferencer(save_test_model(os.path.join(cls._tmp, "model")))
+        cls.server = InferenceServer(inferencer, ("127.0.0.1", 0))
+        cls._thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls._thread.start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls._tmp, ignore_errors=True)
+
+    def _request(self, path: str, body: dict = None) -> tuple:
+        data = None if body is None else json.dumps(body).encode()
+        try:
+            with urllib_request.urlopen(urllib_request.Request(self.url + path, data=data), timeout=30) as response:
+                return response.status, json.loads(response.read())
+        except HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_health(self):
+        status, body = self._request("/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(body["num_topics"], 3)
+        self.assertEqual(body["backend"], "gensim")
+
+    def test_infer(self):
+        missing = os.path.join(self._tmp, "missing.pdf")
+        status, body = self._request("/infer", {"texts": [topic_text(0, seed=20)], "paths": [missing]})
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body["texts"]), 1)
+        self.assertAlmostEqual(sum(probability for _, probability in body["texts"][0]["topics"]), 1.0, places=1)
+        self.assertEqual(body["paths"][0]["path"], missing)
+        self.assertIsNotNone(body["paths"][0]["error"])
+        self.assertEqual(body["paths"][0]["topics"], [])
+
+    def test_bad_requests(self):
+        self.assertEqual(self._request("/infer", {"paths": "not a list"})[0], 400)
+        self.assertEqual(self._request("/infer", {})[0], 400)
+        self.assertEqual(self._request("/unknown")[0], 404)
+        self.assertEqual(self._request("/unknown", {"texts": ["text"]})[0], 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
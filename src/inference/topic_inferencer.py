@@ -0,0 +1,213 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Sequence
+from logging import getLogger
+import numpy as np
+from scipy import sparse
+from src.config import LdaConfig, ProcessorConfig, ReaderSettings
+from src.pdf_reader import PdfReader
+from src.processor import Lda, Processor, SklearnTopicModel
+from test.synthetic_corpus import TOPIC_WORDS, make_pdf
+logger = getLogger("WFM.TopicInferencer")
+
+
+class TopicInferencer:
+    """
+    Topic distributions of new documents against a model saved with `Lda.save_model`.
+
+    The model, dictionary, spaCy pipeline and PDF reader are loaded once; each batch then runs
+    PdfReader -> Processor -> doc2bow and a single vectorised inference step for all documents.
+    Instances are thread-safe: PDFs are extracted concurrently, NLP and inference are serialised.
+
+    :param model_dir: Directory written by `Lda.save_model`.
+    :param processor_config: Processor settings; must match the ones used for training.
+    :param model_name: spaCy model; must match the one used for training.
+    :param reader_settings: PdfReader settings.
+    :param extract_workers: Threads extracting the PDFs of a batch.
+    :param minimum_probability: Topics below this probability are left out of the results.
+    """
+
+    def __init__(self, model_dir: str, processor_config: Optional[ProcessorConfig] = None,
+                 model_name: str = 'en_core_web_sm', reader_settings: Optional[ReaderSettings] = None,
+                 extract_workers: int = 4, minimum_probability: float = 0.01):
+        self.model_dir = model_dir
+        self.model, self.dictionary = Lda.load_model(model_dir)
+        if processor_config is None:
+            processor_config = ProcessorConfig()
+            processor_config.set_config(capitalise=False)
+        self._processor = Processor(processor_config, model_name)
+        self._reader = PdfReader(reader_settings)
+        self._extract_workers = max(1, extract_workers)
+        self._minimum_probability = minimum_probability
+        self._nlp_lock = threading.Lock()
+        self._inference_lock = threading.Lock()
+
+    @property
+    def num_topics(self) -> int:
+        if isinstance(self.model, SklearnTopicModel):
+            return self.model.estimator.n_components
+        return self.model.num_topics
+
+    def info(self) -> dict:
+        return {"model_dir": os.path.abspath(self.model_dir), "num_topics": self.num_topics,
+                "vocabulary": len(self.dictionary),
+                "backend": self.model.backend if isinstance(self.model, SklearnTopicModel) else "gensim"}
+
+    def tokens(self, text: str) -> List[str]:
+        """
+        :return: The terms of a text, filtered the way `App` and `Lda.append_to_dtm` filter them for training.
+        """
+        with self._nlp_lock:
+            self._processor.set_text(text)
+            return [token for token in self._processor.process() if len(token) > 1]
+
+    def distributions(self, token_lists: Sequence[List[str]]) -> np.ndarray:
+        """
+        :return: Document-topic matrix, one normalised row per token list.
+        """
+        bows = [self.dictionary.doc2bow(tokens) for tokens in token_lists]
+        if not bows:
+            return np.zeros((0, self.num_topics))
+        with self._inference_lock:
+            if isinstance(self.model, SklearnTopicModel):
+                return self.model.infer(self._to_csr(bows))
+            gamma, _ = self.model.inference(bows)
+        return gamma / gamma.sum(axis=1, keepdims=True)
+
+    def _to_csr(self, bows: List[List[tuple]]) -> sparse.csr_matrix:
+        indptr = np.cumsum([0] + [len(bow) for bow in bows])
+        pairs = np.array([pair for bow in bows for pair in bow], dtype=np.int64).reshape(-1, 2)
+        return sparse.csr_matrix((pairs[:, 1], pairs[:, 0], indptr), shape=(len(bows), len(self.dictionary)))
+
+    def _result(self, distribution: Optional[np.ndarray], tokens: List[str], **fields) -> dict:
+        result = dict(fields)
+        result["tokens"] = len(tokens)
+        result["known_tokens"] = sum(1 for token in tokens if token in self.dictionary.token2id)
+        if distribution is None or not result["known_tokens"]:
+            # Nothing the model knows: the distribution would only be the prior
+            result["topics"] = []
+            return result
+        order = np.argsort(-distribution)
+        result["topics"] = [[int(topic), float(distribution[topic])] for topic in order
+                            if distribution[topic] >= self._minimum_probability]
+        return result
+
+    def infer_texts(self, texts: Sequence[str]) -> List[dict]:
+        """
+        Topic distributions of raw texts.
+
+        :return: For each text: token counts and [topic, probability] pairs, most probable first.
+        """
+        token_lists = [self.tokens(text) for text in texts]
+        distributions = self.distributions(token_lists)
+        return [self._result(distribution, tokens) for distribution, tokens in zip(distributions, token_lists)]
+
+    def _extract(self, pdf_path: str):
+        started = time.perf_counter()
+        try:
+            return self._reader.extract(pdf_path), None, time.perf_counter() - started
+        except Exception as e:
+            logger.warning(f"Could not read {pdf_path}: {e}")
+            return "", str(e), time.perf_counter() - started
+
+    def infer_pdfs(self, pdf_paths: Iterable[str]) -> List[dict]:
+        """
+        Topic distributions of PDF files. A file that cannot be read gets an "error" and no topics.
+
+        :return: For each file: its path, token counts, [topic, probability] pairs and timings.
+        """
+        pdf_paths = list(pdf_paths)
+        with ThreadPoolExecutor(max_workers=min(self._extract_workers, len(pdf_paths) or 1)) as executor:
+            extracted = list(executor.map(self._extract, pdf_paths))
+
+        started = time.perf_counter()
+        token_lists = [self.tokens(text) if text else [] for text, _, _ in extracted]
+        distributions = self.distributions(token_lists)
+        seconds = (time.perf_counter() - started) / max(1, len(pdf_paths))
+        return [self._result(distribution if error is None else None, tokens, path=pdf_path, error=error,
+                             extraction_seconds=round(extraction, 4), inference_seconds=round(seconds, 4))
+                for pdf_path, (_, error, extraction), tokens, distribution
+                in zip(pdf_paths, extracted, token_lists, distributions)]
+
+
+def topic_text(topic: int, words: int = 30, seed: int = 0) -> str:
+    """
+    :return: A text of short sentences about one of the synthetic topics.
+    """
+    rng = np.random.default_rng(seed)
+    return " ".join(f"The {word}." for word in rng.choice(TOPIC_WORDS[topic], size=words))
+
+
+def save_test_model(directory: str) -> str:
+    """
+    Train and save a small three-topic model on texts run through the inferencer's own preprocessing.
+
+    :return: The model directory.
+    """
+    config = LdaConfig()
+    config.set_config(no_below=1, no_above=1.0, num_topics=3, chunk_size=100, passes=4, iterations=50)
+    processor_config = ProcessorConfig()
+    processor_config.set_config(capitalise=False)
+    processor = Processor(processor_config)
+    lda = Lda(config)
+    for i in range(12):
+        processor.set_text(topic_text(i % 3, seed=i))
+        lda.append_to_dtm([token for token in processor.process() if len(token) > 1])
+    lda.train_model()
+    lda.save_model(directory)
+    return directory
+
+
+class TestTopicInferencer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.mkdtemp()
+        cls.inferencer = TopicInferencer(save_test_model(os.path.join(cls._tmp, "model")), minimum_probability=0.0)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._tmp, ignore_errors=True)
+
+    def test_info(self):
+        info = self.inferencer.info()
+        self.assertEqual(info["backend"], "gensim")
+        self.assertEqual(info["num_topics"], 3)
+        self.assertEqual(info["vocabulary"], len(self.inferencer.dictionary))
+
+    def test_infer_texts(self):
+        results = self.inferencer.infer_texts([topic_text(0, seed=20), topic_text(1, seed=21), "Nothing known."])
+        for result in results[:2]:
+            self.assertGreater(result["known_tokens"], 0)
+            self.assertEqual(len(result["topics"]), 3)
+            self.assertAlmostEqual(sum(probability for _, probability in result["topics"]), 1.0, places=5)
+            probabilities = [probability for _, probability in result["topics"]]
+            self.assertEqual(probabilities, sorted(probabilities, reverse=True))
+        self.assertNotEqual(results[0]["topics"][0][0], results[1]["topics"][0][0])
+        self.assertEqual(results[2]["known_tokens"], 0)
+        self.assertEqual(results[2]["topics"], [])
+
+    def test_distributions_are_normalised(self):
+        distributions = self.inferencer.distributions([self.inferencer.tokens(topic_text(2)), []])
+        self.assertEqual(distributions.shape, (2, 3))
+        np.testing.assert_allclose(distributions.sum(axis=1), 1.0, rtol=1e-6)
+        self.assertEqual(self.inferencer.distributions([]).shape, (0, 3))
+
+    def test_infer_pdfs(self):
+        pdf_path = make_pdf(os.path.join(self._tmp, "paper.pdf"), pages=3, seed=1)
+        missing = os.path.join(self._tmp, "missing.pdf")
+        found, not_found = self.inferencer.infer_pdfs([pdf_path, missing])
+        self.assertIsNone(found["error"])
+        self.assertGreater(found["known_tokens"], 0)
+        self.assertAlmostEqual(sum(probability for _, probability in found["topics"]), 1.0, places=5)
+        self.assertEqual(not_found["path"], missing)
+        self.assertIsNotNone(not_found["error"])
+        self.assertEqual(not_found["topics"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1 @@
+from src.instrumentation.profiler import Profiler, profiled
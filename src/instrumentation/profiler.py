@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import time
+import threading
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger("WFM.Profiler")
+
+
+def current_rss() -> int:
+    """
+    :return: Resident set size of the current process in bytes, or 0 if it cannot be determined.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # High-water mark only; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return 0
+
+
+class Profiler:
+    """
+    Collects per-stage timings, peak memory and counters of one processing run.
+
+    Stages are timed with the `stage` context manager (or the `profiled` decorator).
+    While a stage is open, a background thread samples the process RSS so that each stage
+    records the peak memory reached while it ran. The profiler is thread-safe, so one instance
+    can be shared by every component of a run.
+
+    :param enabled: If False, stages and counters are no-ops.
+    :param sample_interval: Seconds between two RSS samples while a stage is open.
+    """
+
+    def __init__(self, enabled: bool = True, sample_interval: float = 0.05):
+        self.enabled = enabled
+        self._sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._stages: Dict[str, dict] = {}
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._open: List[dict] = []
+        self._sampler: Optional[threading.Thread] = None
+        self._started = time.time()
+
+    @classmethod
+    def disabled(cls) -> "Profiler":
+        return cls(enabled=False)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time the enclosed block and record it under the given stage name.
+
+        :param name: Name of the stage, e.g. "extraction".
+        """
+        if not self.enabled:
+            yield
+            return
+        record = {"peak": current_rss()}
+        rss_start = record["peak"]
+        with self._lock:
+            self._open.append(record)
+            self._ensure_sampler()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            rss_end = current_rss()
+            with self._lock:
+                # Records of nested stages can compare equal, so remove this one by identity
+                self._open = [other for other in self._open if other is not record]
+                stats = self._stages.setdefault(name, {
+                    "calls": 0,
+                    "wall_seconds": 0.0,
+                    "cpu_seconds": 0.0,
+                    "max_wall_seconds": 0.0,
+                    "peak_rss_bytes": 0,
+                    "rss_delta_bytes": 0,
+                })
+                stats["calls"] += 1
+                stats["wall_seconds"] += wall
+                stats["cpu_seconds"] += cpu
+                stats["max_wall_seconds"] = max(stats["max_wall_seconds"], wall)
+                stats["peak_rss_bytes"] = max(stats["peak_rss_bytes"], record["peak"], rss_end)
+                stats["rss_delta_bytes"] += rss_end - rss_start
+
+    def count(self, name: str, value: int = 1):
+        """
+        Increase a counter, e.g. the number of pages, spans or tokens.
+
+        :param name: Name of the counter.
+        :param value: Amount to add.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] += value
+
+    def to_dict(self) -> dict:
+        """
+        :return: A JSON-serialisable snapshot of all stages and counters.
+        """
+        with self._lock:
+            return {
+                "started": self._started,
+                "peak_rss_bytes": max([s["peak_rss_bytes"] for s in self._stages.values()], default=0),
+                "stages": {name: dict(stats) for name, stats in self._stages.items()},
+                "counters": dict(self._counters),
+            }
+
+    def export_json(self, file_path: str):
+        """
+        Write the snapshot of this run to a JSON file.
+
+        :param file_path: Path of the JSON file.
+        """
+        with open(file_path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+        logger.info(f"Profile written to {file_path}")
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self._started = time.time()
+
+    def _ensure_sampler(self):
+        # Must be called with the lock held
+        if self._sampler is None or not self._sampler.is_alive():
+            self._sampler = threading.Thread(target=self._sample, name="WFM-Profiler", daemon=True)
+            self._sampler.start()
+
+    def _sample(self):
+        while True:
+            time.sleep(self._sample_interval)
+            rss = current_rss()
+            with self._lock:
+                if not self._open:
+                    self._sampler = None
+                    return
+                for record in self._open:
+                    record["peak"] = max(record["peak"], rss)
+
+
+def profiled(name: str) -> Callable:
+    """
+    Method decorator timing each call as a stage of the instance's `_profiler`.
+
+    :param name: Name of the stage.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self._profiler.stage(name):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,3 +1,7 @@
 from src.pdf_reader.page import PaperPage
 from src.pdf_reader.text_extractor import PdfReader
 from src.pdf_reader.multi_reader import MultiReader
+from src.pdf_reader.manifest import CorpusManifest, ManifestDiff
+from src.pdf_reader.isolated_reader import IsolatedReader, ExtractionReport
+from src.pdf_reader.deduplicator import Deduplicator
+from src.pdf_reader.text_arena import TextArena, TextRef, EMPTY_TEXT, read_text, text_view, release_maps
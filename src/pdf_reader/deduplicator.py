@@ -0,0 +1,212 @@
+import os
+import re
+import json
+import zlib
+import logging
+import tempfile
+import unittest
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from src.config import dedup_threshold, dedup_shingle_size, dedup_permutations, dedup_bands
+from src.instrumentation import Profiler
+from src.pdf_reader.manifest import file_hash
+
+logger = logging.getLogger("WFM.Deduplicator")
+
+_MERSENNE_PRIME = (1 << 31) - 1  # a * x stays below 2 ** 62, so the permutations never overflow uint64
+_BLOCK = 8192  # Shingles hashed per block, bounding the (permutations x block) working array
+
+
+class Deduplicator:
+    """
+    Finds papers that are already part of a batch before they reach the NLP stage, so that the same
+    paper found in two folders (or a preprint next to its published version) is neither parsed twice
+    nor weighted twice in the topic model. The first document seen is kept.
+
+    - Exact duplicates have the same file content (SHA-256, as in the corpus manifest); they are found
+      before extraction.
+    - Near duplicates are found after extraction with MinHash signatures over word shingles of the
+      text; LSH banding proposes candidate pairs and a pair is a duplicate when the estimated Jaccard
+      similarity of the shingle sets reaches `threshold`.
+
+    :param threshold: Estimated Jaccard similarity from which two texts are near duplicates.
+    :param shingle_size: Words per shingle.
+    :param permutations: MinHash permutations per signature; must be divisible by `bands`.
+    :param bands: LSH bands; more bands propose more (and less similar) candidate pairs.
+    :param profiler: Optional profiler recording stage timings and counts.
+    :param seed: Seed of the hash permutations.
+    """
+
+    def __init__(self, threshold: float = dedup_threshold, shingle_size: int = dedup_shingle_size,
+                 permutations: int = dedup_permutations, bands: int = dedup_bands,
+                 profiler: Optional[Profiler] = None, seed: int = 1):
+        if permutations % bands:
+            raise ValueError(f"permutations ({permutations}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self._rows = permutations // bands
+        self._profiler = profiler or Profiler.disabled()
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=(permutations, 1), dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=(permutations, 1), dtype=np.uint64)
+        self._hashes: Dict[str, str] = {}  # File hash -> first path with that content
+        self._signatures: Dict[str, np.ndarray] = {}  # Path -> signature of every kept text
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self.duplicates: Dict[str, Tuple[str, float]] = {}  # Duplicate path -> (kept path, similarity)
+
+    def exact(self, file_path: str) -> Optional[str]:
+        """
+        Register a file by its content.
+
+        :return: The path of an earlier file with the same content, or None if the file is new or cannot
+            be read (the reader reports that error).
+        """
+        try:
+            digest = file_hash(file_path)
+        except OSError as e:
+            logger.debug(f"Could not hash {file_path}: {e}")
+            return None
+        original = self._hashes.setdefault(digest, file_path)
+        if original == file_path:
+            return None
+        self.duplicates[file_path] = (original, 1.0)
+        self._profiler.count("dedup.exact")
+        logger.info(f"{file_path} is a copy of {original}")
+        return original
+
+    def near(self, file_path: str, text: str) -> Optional[Tuple[str, float]]:
+        """
+        Register the extracted text of a document. A text shorter than one shingle is never a duplicate.
+
+        :return: (path of an earlier similar document, estimated Jaccard similarity), or None if it is new.
+        """
+        with self._profiler.stage("dedup.minhash"):
+            signature = self.signature(text)
+        return self.near_signature(file_path, signature)
+
+    def near_signature(self, file_path: str, signature: Optional[np.ndarray]) -> Optional[Tuple[str, float]]:
+        """
+        `near` for a signature computed earlier, e.g. one restored from a checkpoint.
+        """
+        if signature is None:
+            return None
+        keys = [signature[band * self._rows:(band + 1) * self._rows].tobytes() for band in range(self.bands)]
+        candidates = {path for band, key in enumerate(keys) for path in self._buckets[band].get(key, ())}
+        best = max(((float(np.mean(self._signatures[path] == signature)), path) for path in candidates),
+                   default=(0.0, None))
+        if best[1] is not None and best[0] >= self.threshold:
+            self.duplicates[file_path] = (best[1], best[0])
+            self._profiler.count("dedup.near")
+            logger.info(f"{file_path} is a near duplicate of {best[1]} (similarity {best[0]:.2f})")
+            return best[1], best[0]
+
+        self._signatures[file_path] = signature
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(file_path)
+        return None
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        :return: MinHash signature of the word shingles of a text, or None if it has no full shingle.
+        """
+        words = re.findall(r"\w+", text.lower())
+        count = len(words) - self.shingle_size + 1
+        if count < 1:
+            return None
+        shingles = {" ".join(words[i:i + self.shingle_size]) for i in range(count)}
+        hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64,
+                             count=len(shingles)) % np.uint64(_MERSENNE_PRIME)
+        signature = np.full(self._a.shape[0], _MERSENNE_PRIME, dtype=np.uint64)
+        for start in range(0, len(hashes), _BLOCK):
+            block = (self._a * hashes[start:start + _BLOCK] + self._b) % np.uint64(_MERSENNE_PRIME)
+            np.minimum(signature, block.min(axis=1), out=signature)
+        return signature
+
+    def signature_of(self, file_path: str) -> Optional[np.ndarray]:
+        """
+        :return: The signature a kept document was registered with, or None.
+        """
+        return self._signatures.get(file_path)
+
+    def export_json(self, file_path: str):
+        """
+        Write the duplicates found so far, with the document each one duplicates, to a JSON file.
+        """
+        with open(file_path, "w") as file:
+            json.dump([{"path": path, "duplicate_of": original, "similarity": round(similarity, 4)}
+                       for path, (original, similarity) in self.duplicates.items()], file, indent=2)
+
+
+class TestDeduplicator(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        vocabulary = [f"word{i}" for i in range(2000)]
+        self.words = list(rng.choice(vocabulary, size=600))
+        self.other = list(rng.choice(vocabulary, size=600))
+
+    def test_exact(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, name) for name in ("a.pdf", "b.pdf", "c.pdf")]
+            for path, content in zip(paths, (b"same", b"same", b"other")):
+                with open(path, "wb") as file:
+                    file.write(content)
+            deduplicator = Deduplicator()
+
+            self.assertEqual([deduplicator.exact(path) for path in paths], [None, paths[0], None])
+            self.assertIsNone(deduplicator.exact(os.path.join(directory, "missing.pdf")))
+            self.assertEqual(deduplicator.duplicates, {paths[1]: (paths[0], 1.0)})
+
+    def test_near(self):
+        deduplicator = Deduplicator()
+        edited = list(self.words)
+        edited[300] = "changed"  # One word changes 5 of about 600 shingles
+
+        self.assertIsNone(deduplicator.near("a", " ".join(self.words)))
+        self.assertIsNone(deduplicator.near("b", " ".join(self.other)))
+        kept, similarity = deduplicator.near("c", " ".join(edited))
+        self.assertEqual(kept, "a")
+        self.assertGreaterEqual(similarity, deduplicator.threshold)
+        self.assertEqual(list(deduplicator.duplicates), ["c"])
+        # Duplicates are not registered, so a copy of the copy still points at the kept document
+        self.assertEqual(deduplicator.near("d", " ".join(edited))[0], "a")
+
+    def test_threshold_boundary(self):
+        deduplicator = Deduplicator(threshold=0.75, permutations=16, bands=4)
+        signature = np.arange(16, dtype=np.uint64)
+        deduplicator.near_signature("kept", signature)
+
+        # Rows 0-3 (one band) differ: 12/16 = 0.75 is a duplicate
+        at_threshold = signature.copy()
+        at_threshold[:4] += np.uint64(100)
+        self.assertEqual(deduplicator.near_signature("equal", at_threshold), ("kept", 0.75))
+
+        # One more row differs: 11/16 is below the threshold
+        below = at_threshold.copy()
+        below[4] += np.uint64(100)
+        self.assertIsNone(deduplicator.near_signature("below", below))
+        self.assertNotIn("below", deduplicator.duplicates)
+
+    def test_short_text(self):
+        deduplicator = Deduplicator()
+        self.assertIsNone(deduplicator.signature("too few words"))
+        self.assertIsNone(deduplicator.near("a", "too few words"))
+        self.assertIsNone(deduplicator.near("b", "too few words"))
+        self.assertIsNone(deduplicator.signature_of("a"))
+        self.assertEqual(deduplicator.duplicates, {})
+
+    def test_restored_signature(self):
+        # A resumed run registers the signatures of restored documents instead of their texts
+        first = Deduplicator()
+        first.near("a", " ".join(self.words))
+        resumed = Deduplicator()
+        self.assertIsNone(resumed.near_signature("a", first.signature_of("a")))
+        self.assertEqual(resumed.near("b", " ".join(self.words)), ("a", 1.0))
+
+    def test_invalid_bands(self):
+        with self.assertRaises(ValueError):
+            Deduplicator(permutations=100, bands=16)
+
+
+if __name__ == "__main__":
+    unittest.main()
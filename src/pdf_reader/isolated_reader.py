@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Deque, List, Optional, Tuple, Union
+from src.config import ReaderSettings
+from src.pdf_reader.text_arena import TextArena, TextRef, EMPTY_TEXT
+from test.synthetic_corpus import make_pdf
+
+logger = logging.getLogger("WFM.IsolatedReader")
+
+
+def _limit_memory(memory_limit: Optional[int]):
+    if not memory_limit:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    except (ImportError, ValueError, OSError) as e:
+        # Not available on Windows and not enforced on every platform
+        logger.warning(f"Could not limit worker memory: {e}")
+
+
+def _worker_main(conn, settings: ReaderSettings, memory_limit: Optional[int], arena_dir: Optional[str]):
+    """
+    Entry point of a worker process: report ready, then read the PDFs sent over the pipe until None
+    is received. With an arena directory, texts are written to this worker's arena file and only their
+    `TextRef` is sent back.
+    """
+    from src.pdf_reader.text_extractor import PdfReader
+
+    _limit_memory(memory_limit)
+    reader = PdfReader(settings)
+    arena = TextArena(os.path.join(arena_dir, f"extract_{os.getpid()}.arena")) if arena_dir else None
+    conn.send((None, "ready", None))
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        index, pdf_path = task
+        try:
+            text = reader.extract(pdf_path)
+            conn.send((index, "ok", arena.write(text) if arena else text))
+        except MemoryError as e:
+            conn.send((index, "memory", str(e) or "Memory limit exceeded"))
+        except Exception as e:
+            conn.send((index, "error", str(e)))
+
+
+class _Worker:
+    def __init__(self, context, target, settings: ReaderSettings, memory_limit: Optional[int],
+                 arena_dir: Optional[str]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=target, args=(child_conn, settings, memory_limit, arena_dir),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task: Optional[Tuple[int, str]] = None
+        self.started = 0.0
+
+    def submit(self, index: int, pdf_path: str):
+        self.task = (index, pdf_path)
+        self.started = time.monotonic()
+        self.conn.send(self.task)
+
+    def set_ready(self):
+        # Until now the clock of the first document ran while the process spawned and imported PyMuPDF
+        self.started = time.monotonic()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+
+
+class ExtractionReport:
+    """
+    Outcome of an isolated extraction run: which documents failed and why.
+    """
+
+    def __init__(self):
+        self.succeeded = 0
+        self.failures: List[dict] = []
+
+    def add_failure(self, pdf_path: str, reason: str, detail: str, seconds: float):
+        logger.warning(f"{reason.capitalize()} while reading {pdf_path}: {detail}")
+        self.failures.append({"path": pdf_path, "reason": reason, "detail": detail, "seconds": round(seconds, 3)})
+
+    def to_dict(self) -> dict:
+        return {"succeeded": self.succeeded, "failed": len(self.failures), "failures": self.failures}
+
+    def save(self, file_path: str):
+        with open(file_path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+        logger.info(f"Extraction report written to {file_path}")
+
+
+class IsolatedReader:
+    """
+    Reads PDFs in separate worker processes with a per-document time and memory limit.
+
+    A worker that exceeds the timeout is killed, a worker that crashes is detected through
+    its pipe, and both are replaced by a fresh process so the rest of the batch keeps running.
+    The clock of a worker's first document starts once the worker reports ready, so process
+    startup is not charged to the document (startup itself may take at most the timeout).
+    Failed documents yield an empty string and are listed in the `ExtractionReport`.
+
+    :param settings: Reader settings sent to every worker.
+    :param workers: Number of worker processes (defaults to the CPU count).
+    :param timeout: Seconds a single document may take.
+    :param memory_limit: Address-space limit of each worker in bytes (POSIX only), or None.
+    :param arena_dir: If given, workers write the texts into `TextArena` files in this directory and
+                      `read_all` returns `TextRef`s (`EMPTY_TEXT` for failures) instead of strings.
+    """
+
+    def __init__(self, settings: Optional[ReaderSettings] = None, workers: Optional[int] = None,
+                 timeout: float = 120.0, memory_limit: Optional[int] = None, arena_dir: Optional[str] = None):
+        self._settings = settings or ReaderSettings()
+        self._workers = max(1, workers or os.cpu_count() or 1)
+        self._timeout = timeout
+        self._memory_limit = memory_limit
+        self._arena_dir = os.path.abspath(arena_dir) if arena_dir else None
+        self._context = multiprocessing.get_context("spawn")
+
+    _worker_target = staticmethod(_worker_main)
+
+    def read_all(self, pdf_paths: List[str]) -> Tuple[List[Union[str, TextRef]], ExtractionReport]:
+        """
+        Read the PDFs and return their texts in the given order.
+
+        :param pdf_paths: Paths of the PDF files.
+        :return: (texts, report)
+        """
+        texts = [EMPTY_TEXT if self._arena_dir else ""] * len(pdf_paths)
+        report = ExtractionReport()
+        pending: Deque[Tuple[int, str]] = deque(enumerate(pdf_paths))
+        workers = [self._new_worker() for _ in range(min(self._workers, len(pdf_paths)))]
+
+        try:
+            while pending or any(worker.task for worker in workers):
+                for worker in workers:
+                    if worker.task is None and pending:
+                        worker.submit(*pending.popleft())
+
+                busy = [worker for worker in workers if worker.task]
+                now = time.monotonic()
+                wait_for = max(0.0, min(worker.started + self._timeout - now for worker in busy))
+                ready = wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy], wait_for)
+
+                for position, worker in enumerate(workers):
+                    if worker.task is None:
+                        continue
+                    index, pdf_path = worker.task
+                    elapsed = time.monotonic() - worker.started
+                    if worker.conn in ready or worker.conn.poll():
+                        try:
+                            result_index, status, payload = worker.conn.recv()
+                        except (EOFError, OSError):
+                            report.add_failure(pdf_path, "crash", f"Worker exited with code {worker.process.exitcode}", elapsed)
+                            workers[position] = self._replace(worker)
+                            continue
+                        if status == "ready":
+                            worker.set_ready()
+                            continue
+                        worker.task = None
+                        if status == "ok":
+                            texts[result_index] = payload
+                            report.succeeded += 1
+                        else:
+                            report.add_failure(pdf_path, status, payload, elapsed)
+                    elif not worker.process.is_alive():
+                        report.add_failure(pdf_path, "crash", f"Worker exited with code {worker.process.exitcode}", elapsed)
+                        workers[position] = self._replace(worker)
+                    elif elapsed >= self._timeout:
+                        report.add_failure(pdf_path, "timeout", f"No result after {self._timeout} seconds", elapsed)
+                        workers[position] = self._replace(worker, kill=True)
+        finally:
+            for worker in workers:
+                worker.stop()
+
+        logger.info(f"Isolated extraction finished: {report.succeeded} succeeded, {len(report.failures)} failed")
+        return texts, report
+
+    def _replace(self, worker: _Worker, kill: bool = False) -> _Worker:
+        if kill:
+            worker.kill()
+        worker.conn.close()
+        worker.process.join(1)
+        return self._new_worker()
+
+    def _new_worker(self) -> _Worker:
+        return _Worker(self._context, self._worker_target, self._settings, self._memory_limit, self._arena_dir)
+
+
+def _misbehaving_worker_main(conn, settings: ReaderSettings, memory_limit: Optional[int], arena_dir: Optional[str]):
+    """
+    Test worker: reads real PDFs, except that "slow.pdf" takes two seconds, "sleep.pdf" hangs, "crash.pdf"
+    kills the process and "memory.pdf" allocates more than any memory limit.
+    """
+    from src.pdf_reader.text_extractor import PdfReader
+
+    extract = PdfReader.extract
+
+    def misbehave(reader, pdf_path: str, *args, **kwargs):
+        name = os.path.basename(pdf_path)
+        if name in ("slow.pdf", "sleep.pdf"):
+            time.sleep(2 if name == "slow.pdf" else 60)
+        elif name == "crash.pdf":
+            os._exit(3)
+        elif name == "memory.pdf":
+            return bytearray(64 * 1024 ** 3).decode()
+        return extract(reader, pdf_path, *args, **kwargs)
+
+    PdfReader.extract = misbehave
+    _worker_main(conn, settings, memory_limit, arena_dir)
+
+
+def _slow_start_worker_main(conn, settings: ReaderSettings, memory_limit: Optional[int], arena_dir: Optional[str]):
+    """
+    Test worker whose startup takes two seconds.
+    """
+    time.sleep(2)
+    _misbehaving_worker_main(conn, settings, memory_limit, arena_dir)
+
+
+class TestIsolatedReader(unittest.TestCase):
+    class _MisbehavingReader(IsolatedReader):
+        _worker_target = staticmethod(_misbehaving_worker_main)
+
+    class _SlowStartReader(IsolatedReader):
+        _worker_target = staticmethod(_slow_start_worker_main)
+
+    def setUp(self):
+        self._tmp = tempfile.mkdtemp()
+        self.paper = make_pdf(os.path.join(self._tmp, "paper.pdf"), pages=2, seed=1)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+    def _paths(self, *names: str) -> List[str]:
+        return [self.paper if name == "paper.pdf" else os.path.join(self._tmp, name) for name in names]
+
+    def _read(self, reader: IsolatedReader, *names: str) -> Tuple[List[str], dict]:
+        texts, report = reader.read_all(self._paths(*names))
+        return texts, {os.path.basename(failure["path"]): failure["reason"] for failure in report.failures}
+
+    def test_failures_do_not_stop_the_batch(self):
+        reader = self._MisbehavingReader(workers=2, timeout=5.0)
+        texts, failures = self._read(reader, "paper.pdf", "crash.pdf", "sleep.pdf", "missing.pdf", "paper.pdf")
+        self.assertEqual(failures, {"crash.pdf": "crash", "sleep.pdf": "timeout", "missing.pdf": "error"})
+        self.assertTrue(texts[0])
+        self.assertEqual(texts[0], texts[4])
+        self.assertEqual(texts[1:4], ["", "", ""])
+
+    @unittest.skipUnless(os.name == "posix", "Memory limits need resource.setrlimit")
+    def test_memory_limit(self):
+        reader = self._MisbehavingReader(workers=1, timeout=30.0, memory_limit=2 * 1024 ** 3)
+        texts, failures = self._read(reader, "memory.pdf", "paper.pdf")
+        self.assertEqual(failures, {"memory.pdf": "memory"})
+        self.assertTrue(texts[1])
+
+    def test_startup_is_not_timed_as_the_first_document(self):
+        # Startup and document each fit in the timeout, together they do not; slow.pdf does not exist,
+        # so once it is past the timeout it ends in an error
+        texts, failures = self._read(self._SlowStartReader(workers=1, timeout=3.0), "slow.pdf", "paper.pdf")
+        self.assertEqual(failures, {"slow.pdf": "error"})
+        self.assertTrue(texts[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
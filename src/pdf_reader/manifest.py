@@ -0,0 +1,168 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional
+import pymupdf as fitz
+
+logger = logging.getLogger("WFM.Manifest")
+
+
+def find_pdf_files(directory: str, recursive: bool = False) -> List[str]:
+    """
+    Find the PDF files of a directory.
+
+    :param directory: Root directory of the corpus.
+    :param recursive: Whether to descend into sub-directories (hidden ones are skipped).
+    :return: Sorted paths relative to the directory.
+    """
+    if not recursive:
+        return sorted(f for f in os.listdir(directory) if f.lower().endswith('.pdf'))
+
+    pdf_files = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for f in files:
+            if f.lower().endswith('.pdf') and not f.startswith('.'):
+                pdf_files.append(os.path.relpath(os.path.join(root, f), directory))
+    pdf_files.sort()
+    return pdf_files
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """
+    :return: SHA-256 hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _page_count(path: str) -> Optional[int]:
+    try:
+        with fitz.open(path) as doc:
+            return doc.page_count
+    except Exception as e:
+        logger.warning(f"Could not count pages of {path}: {e}")
+        return None
+
+
+class ManifestDiff:
+    """
+    Difference between the saved manifest and the files currently on disk.
+    All lists hold paths relative to the corpus root.
+    """
+
+    def __init__(self, added: List[str], changed: List[str], removed: List[str], unchanged: List[str]):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        self.unchanged = unchanged
+
+    @property
+    def to_process(self) -> List[str]:
+        """
+        :return: New and changed files, sorted.
+        """
+        return sorted(self.added + self.changed)
+
+    def __str__(self):
+        return (f"{len(self.added)} added, {len(self.changed)} changed, "
+                f"{len(self.removed)} removed, {len(self.unchanged)} unchanged")
+
+
+class CorpusManifest:
+    """
+    Record of the PDF files of a corpus (size, mtime, content hash, page count), persisted
+    as JSON in the corpus root so that later runs only process new or changed files.
+
+    Files whose size and mtime did not change keep their recorded hash, so a re-scan only
+    reads the content of files that were touched.
+
+    :param directory: Root directory of the corpus.
+    :param recursive: Whether to include sub-directories.
+    """
+
+    FILE_NAME = ".wfm_manifest.json"
+
+    def __init__(self, directory: str, recursive: bool = True):
+        self.directory = directory
+        self.recursive = recursive
+        self.path = os.path.join(directory, CorpusManifest.FILE_NAME)
+        self.entries: Dict[str, dict] = self._load()
+        self._scanned: Optional[Dict[str, dict]] = None
+
+    def _load(self) -> Dict[str, dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as file:
+                return json.load(file).get("files", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+            return {}
+
+    def scan(self) -> ManifestDiff:
+        """
+        Compare the files on disk against the saved manifest. Nothing is written until `save`.
+
+        :return: The difference between the manifest and the disk.
+        """
+        scanned = {}
+        added, changed, unchanged = [], [], []
+        for relative_path in find_pdf_files(self.directory, self.recursive):
+            full_path = os.path.join(self.directory, relative_path)
+            try:
+                stat = os.stat(full_path)
+            except OSError as e:
+                logger.warning(f"Skipping {full_path}: {e}")
+                continue
+            old = self.entries.get(relative_path)
+            if old and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime:
+                scanned[relative_path] = old
+                unchanged.append(relative_path)
+                continue
+
+            entry = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": file_hash(full_path),
+                "pages": None,
+            }
+            if old and old["sha256"] == entry["sha256"]:
+                # Touched but identical content
+                entry["pages"] = old["pages"]
+                unchanged.append(relative_path)
+            else:
+                entry["pages"] = _page_count(full_path)
+                (changed if old else added).append(relative_path)
+            scanned[relative_path] = entry
+
+        removed = sorted(set(self.entries) - set(scanned))
+        self._scanned = scanned
+        diff = ManifestDiff(added, changed, removed, unchanged)
+        logger.info(f"Manifest scan of {self.directory}: {diff}")
+        return diff
+
+    def save(self, failed: Iterable[str] = ()):
+        """
+        Persist the result of the last `scan`.
+
+        :param failed: Relative paths that could not be processed; they keep their previous entry (or none),
+            so that the next scan reports them again.
+        """
+        if self._scanned is not None:
+            for relative_path in failed:
+                if relative_path in self.entries:
+                    self._scanned[relative_path] = self.entries[relative_path]
+                else:
+                    self._scanned.pop(relative_path, None)
+            self.entries = self._scanned
+            self._scanned = None
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"recursive": self.recursive, "files": self.entries}, file, indent=1)
+        os.replace(tmp_path, self.path)
+        logger.debug(f"Manifest saved: {self.path}")
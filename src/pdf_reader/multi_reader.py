@@ -1,11 +1,17 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
 import unittest
 import os
-from src.config import ReaderConfig
+import tempfile
+from src.config import ReaderConfig, ReaderSettings, pdf_timeout, pdf_memory_limit
+from src.instrumentation import Profiler
 
 from src.pdf_reader import PdfReader
+from src.pdf_reader.manifest import CorpusManifest, ManifestDiff, find_pdf_files
+from src.pdf_reader.isolated_reader import IsolatedReader, ExtractionReport
+from src.pdf_reader.deduplicator import Deduplicator
+from src.pdf_reader.text_arena import TextArena, TextRef, EMPTY_TEXT, read_text, release_maps
 
 logger = logging.getLogger("WFM.MultiReader")
 
@@ -13,83 +19,277 @@ logger = logging.getLogger("WFM.MultiReader")
 class MultiReader:
     """
     A multi-threaded PDF reader that processes multiple PDF files concurrently.
+
+    :param directory: Directory containing the PDF files.
+    :param settings: Reader settings shared by all threads (a legacy ReaderConfig is accepted).
+    :param profiler: Optional profiler shared by all readers.
+    :param recursive: Whether to include PDF files in sub-directories (e.g. one folder per year).
+    :param isolated: Whether to read each PDF in a separate worker process with a time and memory limit,
+                     so that a malformed file cannot hang or crash the whole batch.
+    :param timeout: Seconds a single PDF may take in isolated mode.
+    :param memory_limit: Bytes of address space per worker in isolated mode.
+    :param deduplicate: Whether `read_all` skips copies of a file and returns an empty text for
+                        near-duplicate texts, keeping the first in file order (see `Deduplicator`).
     """
 
-    def __init__(self, directory: str, config: ReaderConfig):
+    def __init__(self, directory: str, settings: Union[ReaderSettings, ReaderConfig, None] = None,
+                 profiler: Optional[Profiler] = None,
+                 recursive: bool = False, isolated: bool = False, timeout: float = pdf_timeout,
+                 memory_limit: Optional[int] = pdf_memory_limit, deduplicate: bool = False):
         self.directory = directory
-        self.config = config
+        self.profiler = profiler or Profiler.disabled()
+        self.reader = PdfReader(settings, self.profiler)  # Stateless extract() is shared by all threads
+        self.recursive = recursive
+        self.isolated = isolated
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.report: Optional[ExtractionReport] = None  # Failures of the last isolated run
+        self.deduplicator: Optional[Deduplicator] = Deduplicator(profiler=self.profiler) if deduplicate else None
         self.pdf_files = self._get_pdf_files(directory)
         self.texts: List[Optional[str]] = [None] * len(self.pdf_files)  # Placeholder for storing the texts in correct order
 
     def _get_pdf_files(self, directory: str):
         """
-        Get a sorted list of PDF files from the specified directory.
+        Get a sorted list of PDF files (relative to the directory) from the specified directory.
         """
-        pdf_files = [f for f in os.listdir(directory) if f.lower().endswith('.pdf')]
-        pdf_files.sort()  # Sort files alphabetically
-        return pdf_files
+        return find_pdf_files(directory, self.recursive)
 
     def _read_pdf(self, pdf_path: str, index: int):
         """
         Helper function to read a single PDF and store the result at the correct index.
         """
-        pdf_reader = PdfReader(self.config)
-        pdf_reader.set_path(pdf_path)
+        self.texts[index] = self._read_text(pdf_path)
+
+    def _read_text(self, pdf_path: str) -> str:
+        """
+        Read a single PDF, returning an empty string if it cannot be read.
+        """
         try:
-            pdf_reader.open()
-            text = pdf_reader.read()
-            pdf_reader.close()
+            text = self.reader.extract(pdf_path)
             logger.info(f"Successfully read {pdf_path}")
         except Exception as e:
             logger.warning(f"Error reading {pdf_path}: {e}")
             text = ""
-        self.texts[index] = text
+        return text
 
     def read_all(self):
         """
         Read all PDFs in the directory concurrently and return the texts in the correct order.
+        Duplicates found by the deduplicator, if enabled, get an empty text.
         """
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for index, pdf_file in enumerate(self.pdf_files):
-                pdf_path = os.path.join(self.directory, pdf_file)
-                futures.append(executor.submit(self._read_pdf, pdf_path, index))
+        paths = [os.path.join(self.directory, pdf_file) for pdf_file in self.pdf_files]
+        self.texts = [""] * len(paths)
+        to_read = [index for index, pdf_path in enumerate(paths)
+                   if self.deduplicator is None or self.deduplicator.exact(pdf_path) is None]
+
+        if self.isolated:
+            texts, self.report = self._isolated_reader().read_all([paths[index] for index in to_read])
+            for index, text in zip(to_read, texts):
+                self.texts[index] = text
+        else:
+            with ThreadPoolExecutor() as executor:
+                futures = [executor.submit(self._read_pdf, paths[index], index) for index in to_read]
+                for future in as_completed(futures):
+                    future.result()
+
+        if self.deduplicator is not None:
+            # In file order, so that the kept copy does not depend on which thread finished first
+            for index in to_read:
+                if self.texts[index] and self.deduplicator.near(paths[index], self.texts[index]):
+                    self.texts[index] = ""
+        return self.texts
+
+    def read_to_arena(self, arena_dir: str) -> List[TextRef]:
+        """
+        Read all PDFs like `read_all`, but write the texts into `TextArena` files in `arena_dir` and
+        return a `TextRef` per file (`EMPTY_TEXT` for failures and duplicates), so that the texts can
+        be handed to NLP worker processes (see `NlpPool`) without pickling them.
+        In isolated mode every worker process writes its own arena file.
+        """
+        paths = [os.path.join(self.directory, pdf_file) for pdf_file in self.pdf_files]
+        refs = [EMPTY_TEXT] * len(paths)
+        to_read = [index for index, pdf_path in enumerate(paths)
+                   if self.deduplicator is None or self.deduplicator.exact(pdf_path) is None]
+
+        if self.isolated:
+            read, self.report = self._isolated_reader(arena_dir).read_all([paths[index] for index in to_read])
+            for index, ref in zip(to_read, read):
+                refs[index] = ref
+        else:
+            arena = TextArena(os.path.join(arena_dir, f"extract_{os.getpid()}.arena"))
 
+            def read(index: int):
+                refs[index] = arena.write(self._read_text(paths[index]))
+
+            try:
+                with ThreadPoolExecutor() as executor:
+                    for future in as_completed([executor.submit(read, index) for index in to_read]):
+                        future.result()
+            finally:
+                arena.close()
+
+        if self.deduplicator is not None:
+            for index in to_read:
+                if refs[index].length and self.deduplicator.near(paths[index], read_text(refs[index])):
+                    refs[index] = EMPTY_TEXT
+        return refs
+
+    def read_changed(self) -> Tuple[Dict[str, str], ManifestDiff]:
+        """
+        Read only the PDFs that are new or changed since the last run, according to the corpus manifest.
+        The manifest is updated once the files have been read; files that gave no text are left out of
+        it, so they are read again next time.
+
+        :return: (texts keyed by path relative to the directory, manifest difference)
+        """
+        manifest = CorpusManifest(self.directory, recursive=self.recursive)
+        diff = manifest.scan()
+        to_process = diff.to_process
+        if self.isolated:
+            paths = [os.path.join(self.directory, relative_path) for relative_path in to_process]
+            texts, self.report = self._isolated_reader().read_all(paths)
+            # Timed-out, crashed and out-of-memory files are read again next time
+            failed = {os.path.relpath(failure["path"], self.directory) for failure in self.report.failures}
+            failed.update(relative_path for relative_path, text in zip(to_process, texts) if not text)
+            manifest.save(failed=failed)
+            return dict(zip(to_process, texts)), diff
+
+        texts: List[Optional[str]] = [None] * len(to_process)
+
+        def read(index: int, relative_path: str):
+            pdf_path = os.path.join(self.directory, relative_path)
+            texts[index] = self._read_text(pdf_path)
+
+        with ThreadPoolExecutor() as executor:
+            futures = [executor.submit(read, index, relative_path) for index, relative_path in enumerate(to_process)]
             for future in as_completed(futures):
                 future.result()
 
-        return self.texts
+        manifest.save(failed=[relative_path for relative_path, text in zip(to_process, texts) if not text])
+        return dict(zip(to_process, texts)), diff
+
+    def _isolated_reader(self, arena_dir: Optional[str] = None) -> IsolatedReader:
+        return IsolatedReader(settings=self.reader.settings, timeout=self.timeout, memory_limit=self.memory_limit,
+                              arena_dir=arena_dir)
 
 
 class TestMultiReader(unittest.TestCase):
     def setUp(self):
-        # Create a test data directory if it doesn't exist
-        self.test_directory = "../../data"
+        # Generate a synthetic corpus instead of relying on a local data folder
+        from test.synthetic_corpus import make_corpus
+        self._tmp = tempfile.TemporaryDirectory()
+        self.test_directory = self._tmp.name
+        make_corpus(self.test_directory, documents=4)
         logger.setLevel(logging.DEBUG)
 
+    def tearDown(self):
+        self._tmp.cleanup()
+
     def test_read_all_pdfs(self):
-        # Set up MultiReader with the test directory and a dummy config
-        config = ReaderConfig()
-        multi_reader = MultiReader(self.test_directory, config)
+        multi_reader = MultiReader(self.test_directory, ReaderSettings())
 
-        # Perform the read_all operation
         results = multi_reader.read_all()
 
-        print(len(results))
-
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(results))
 
     def test_read_with_errors(self):
-        # Introduce an error by removing one file before reading
-        os.remove(os.path.join(self.test_directory, "Paper 2.pdf"))
+        # Introduce an error by corrupting one file of the temporary corpus
+        with open(os.path.join(self.test_directory, "Paper 00002.pdf"), "wb") as file:
+            file.write(b"not a pdf")
+
+        multi_reader = MultiReader(self.test_directory, ReaderSettings())
+
+        results = multi_reader.read_all()
 
-        # Set up MultiReader with the test directory and a dummy config
-        config = ReaderConfig()
-        multi_reader = MultiReader(self.test_directory, config)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[2], "")
+
+    def test_read_all_deduplicated(self):
+        # A copy of a paper under another name is not read a second time
+        import shutil
+        shutil.copy(os.path.join(self.test_directory, "Paper 00001.pdf"),
+                    os.path.join(self.test_directory, "Paper 00004.pdf"))
+        multi_reader = MultiReader(self.test_directory, ReaderSettings(), deduplicate=True)
+
+        results = multi_reader.read_all()
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[4], "")
+        self.assertTrue(all(results[:4]))
+        self.assertEqual(list(multi_reader.deduplicator.duplicates),
+                         [os.path.join(self.test_directory, "Paper 00004.pdf")])
+
+    def test_read_all_near_duplicates(self):
+        # A copy with a note stamped on its first page is a different file with almost the same text
+        import pymupdf as fitz
+        with fitz.open(os.path.join(self.test_directory, "Paper 00001.pdf")) as doc:
+            doc[0].insert_text((72, 40), "Preprint version", fontsize=6)
+            doc.save(os.path.join(self.test_directory, "Paper 00004.pdf"))
+        multi_reader = MultiReader(self.test_directory, ReaderSettings(), deduplicate=True)
 
-        # Perform the read_all operation
         results = multi_reader.read_all()
 
-        print(len(results))
+        self.assertEqual(results[4], "")
+        self.assertTrue(all(results[:4]))
+        original, similarity = multi_reader.deduplicator.duplicates[
+            os.path.join(self.test_directory, "Paper 00004.pdf")]
+        self.assertEqual(original, os.path.join(self.test_directory, "Paper 00001.pdf"))
+        self.assertLess(similarity, 1.0)
+
+        # Isolated workers find the same duplicate
+        multi_reader = MultiReader(self.test_directory, ReaderSettings(), isolated=True, deduplicate=True)
+        self.assertEqual(multi_reader.read_all(), results)
+
+    def test_read_to_arena(self):
+        with open(os.path.join(self.test_directory, "Paper 00002.pdf"), "wb") as file:
+            file.write(b"not a pdf")
+        texts = MultiReader(self.test_directory, ReaderSettings()).read_all()
+
+        for isolated in (False, True):
+            arena_dir = os.path.abspath(os.path.join(self.test_directory, f"arena_{isolated}"))
+            multi_reader = MultiReader(self.test_directory, ReaderSettings(), isolated=isolated)
+
+            refs = multi_reader.read_to_arena(arena_dir)
+
+            self.assertEqual([read_text(ref) for ref in refs], texts)
+            self.assertEqual(refs[2], EMPTY_TEXT)
+            arenas = {ref.path for ref in refs if ref.length}
+            if isolated:
+                # Every worker process writes its own arena file
+                self.assertNotIn(os.path.join(arena_dir, f"extract_{os.getpid()}.arena"), arenas)
+            else:
+                self.assertEqual(arenas, {os.path.join(arena_dir, f"extract_{os.getpid()}.arena")})
+            self.assertEqual(sorted(os.listdir(arena_dir)), sorted(os.path.basename(path) for path in arenas))
+        release_maps()
+
+    def test_read_changed(self):
+        multi_reader = MultiReader(self.test_directory, ReaderSettings())
+
+        texts, diff = multi_reader.read_changed()
+        self.assertEqual(len(diff.added), 4)
+        self.assertEqual(len(texts), 4)
+
+        # A second run only reads the files touched in between
+        from test.synthetic_corpus import make_pdf
+        make_pdf(os.path.join(self.test_directory, "Paper 00001.pdf"), seed=99)
+        texts, diff = multi_reader.read_changed()
+        self.assertEqual(diff.changed, ["Paper 00001.pdf"])
+        self.assertEqual(list(texts), ["Paper 00001.pdf"])
+
+    def test_read_changed_retries_failed(self):
+        with open(os.path.join(self.test_directory, "Paper 00002.pdf"), "wb") as file:
+            file.write(b"not a pdf")
+        multi_reader = MultiReader(self.test_directory, ReaderSettings())
+
+        texts, diff = multi_reader.read_changed()
+        self.assertEqual(texts["Paper 00002.pdf"], "")
+
+        # The file that could not be read is not recorded as done
+        texts, diff = multi_reader.read_changed()
+        self.assertEqual(diff.added, ["Paper 00002.pdf"])
+        self.assertEqual(list(texts), ["Paper 00002.pdf"])
+
 
 if __name__ == "__main__":
     unittest.main()
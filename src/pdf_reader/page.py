@@ -1,8 +1,13 @@
+import os
+import tempfile
+import unittest
 import pymupdf as fitz
+import numpy as np
 from logging import getLogger
 from difflib import get_close_matches
 from src.config import special_character
 from collections import defaultdict
+from typing import Dict, List, NamedTuple
 logger = getLogger("WFM.Page")
 
 
@@ -16,6 +21,18 @@ def contains_keywords(text, similarity_threshold=0.9, keywords=("references", "b
     return False
 
 
+class SpanColumns(NamedTuple):
+    """
+    The spans of a page as NumPy columns, one row per span in reading order.
+    """
+    sizes: np.ndarray  # Font size
+    font_ids: np.ndarray  # Index into `fonts`
+    lengths: np.ndarray  # Characters of text
+    bboxes: np.ndarray  # (x0, y0, x1, y1)
+    fonts: List[str]  # Font names in order of first appearance
+    bold: np.ndarray  # Whether each font of `fonts` is bold
+
+
 class PaperPage:
     """
     A custom Page class that wraps around the fitz.Page object.
@@ -26,39 +43,73 @@ class PaperPage:
         logger.debug("Initializing PaperPage")
         self._fitz_page = fitz_page
         self.text = None
+        self.span_count = 0
+        self._span_cache = None
+        self._column_cache = None
 
     def _spans(self):
-        for block in self._fitz_page.get_text("dict")["blocks"]:
-            if block['type'] == 0:
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        yield span
-
-    def _compare_none(self, v1, v2=None):
-        if v2 is None:
-            return True
-        elif v1 == v2:
-            return True
-        return False
+        # Parse the page once; probing and reading the same page share the spans
+        if self._span_cache is None:
+            self._span_cache = [span
+                                for block in self._fitz_page.get_text("dict")["blocks"] if block['type'] == 0
+                                for line in block["lines"]
+                                for span in line["spans"]]
+        return self._span_cache
 
-    def _in_middle(self, rect):
-        page_width, page_height = self._fitz_page.rect.width, self._fitz_page.rect.height
-        left_bound = page_width * 0.1
-        right_bound = page_width * 0.9
-        top_bound = page_height * 0.25
-        bottom_bound = page_height * 0.75
+    def _columns(self) -> SpanColumns:
+        if self._column_cache is None:
+            spans = self._spans()
+            font_index: Dict[str, int] = {}
+            font_ids = np.fromiter((font_index.setdefault(span["font"], len(font_index)) for span in spans),
+                                   dtype=np.int32, count=len(spans))
+            self._column_cache = SpanColumns(
+                sizes=np.fromiter((span["size"] for span in spans), dtype=np.float64, count=len(spans)),
+                font_ids=font_ids,
+                lengths=np.fromiter((len(span["text"]) for span in spans), dtype=np.int64, count=len(spans)),
+                bboxes=np.array([span["bbox"] for span in spans], dtype=np.float64).reshape(len(spans), 4),
+                fonts=list(font_index),
+                bold=np.array(["bold" in font.lower() for font in font_index], dtype=bool),
+            )
+        return self._column_cache
+
+    def _match_size(self, columns: SpanColumns, fontsize) -> np.ndarray:
+        if fontsize is None:
+            return np.ones(len(columns.sizes), dtype=bool)
+        try:
+            return columns.sizes == float(fontsize)
+        except (TypeError, ValueError):
+            return np.zeros(len(columns.sizes), dtype=bool)
 
-        return (left_bound <= rect[0] <= right_bound and
-                left_bound <= rect[2] <= right_bound and
-                top_bound <= rect[1] <= bottom_bound and
-                top_bound <= rect[3] <= bottom_bound)
+    def _match_font(self, columns: SpanColumns, fonttype) -> np.ndarray:
+        if fonttype is None:
+            return np.ones(len(columns.font_ids), dtype=bool)
+        if fonttype not in columns.fonts:
+            return np.zeros(len(columns.font_ids), dtype=bool)
+        return columns.font_ids == columns.fonts.index(fonttype)
+
+    def _in_middle(self, bboxes: np.ndarray) -> np.ndarray:
+        """
+        :return: Whether each (x0, y0, x1, y1) box lies in the middle of the page: within 10-90% of its
+            width and 25-75% of its height.
+        """
+        page_width, page_height = self._fitz_page.rect.width, self._fitz_page.rect.height
+        x, y = bboxes[:, [0, 2]], bboxes[:, [1, 3]]
+        return (((page_width * 0.1 <= x) & (x <= page_width * 0.9)).all(axis=1) &
+                ((page_height * 0.25 <= y) & (y <= page_height * 0.75)).all(axis=1))
 
     def get_font(self):
+        """
+        :return: Number of spans in the middle of the page per font size and per font name, keyed by
+            their string, in order of first appearance.
+        """
+        columns = self._columns()
+        middle = self._in_middle(columns.bboxes)
         result = defaultdict(int)
-        for span in self._spans():
-            if self._in_middle(span["bbox"]):
-                result[str(span["size"])] += 1
-                result[str(span["font"])] += 1
+        for values, names in ((columns.sizes[middle], None), (columns.font_ids[middle], columns.fonts)):
+            unique, first, counts = np.unique(values, return_index=True, return_counts=True)
+            for position in np.argsort(first):
+                value = unique[position].item()
+                result[str(value) if names is None else names[value]] += int(counts[position])
         return result
 
     def get_text(self, find_references=True, **kwargs):
@@ -69,26 +120,27 @@ class PaperPage:
 
         :return: str: The text extracted from the page.
         """
+        fontsize = kwargs.get("fontsize")
+        fonttype = kwargs.get("fonttype")
+
+        spans = self._spans()
+        columns = self._columns()
+        self.span_count = len(spans)
+        size_ok = self._match_size(columns, fontsize)
+
+        # Text stops at the first bold span of the body size that names a references section;
+        # only those candidates go through the keyword search
         found_references = False
-        fontsize = None
-        fonttype = None
-        for key in kwargs.keys():
-            if "fontsize" == key:
-                fontsize = kwargs[key]
-            if "fonttype" == key:
-                fonttype = kwargs[key]
-
-        string = ""
-        for span in self._spans():
-            text = span["text"]
-            font_size = span["size"]
-            font_type = span["font"]
-            if find_references and contains_keywords(text):
-                if "bold" in font_type.lower() and self._compare_none(font_size, fontsize):
-                    found_references = True
-            if not found_references:
-                if self._compare_none(font_size, fontsize) and self._compare_none(font_type, fonttype) and len(text) > 3:
-                    string += text
+        end = len(spans)
+        if find_references:
+            for index in np.flatnonzero(columns.bold[columns.font_ids] & size_ok):
+                if contains_keywords(spans[index]["text"]):
+                    found_references, end = True, index
+                    break
+
+        keep = size_ok & self._match_font(columns, fonttype) & (columns.lengths > 3)
+        keep[end:] = False
+        string = "".join(spans[index]["text"] for index in np.flatnonzero(keep))
         self.text = string
         if find_references:
             return found_references, string
@@ -97,3 +149,85 @@ class PaperPage:
 
     def __str__(self):
         return self.text
+
+
+class TestPaperPage(unittest.TestCase):
+    """
+    The vectorised filters against a span-by-span reading of the same pages.
+    """
+
+    def setUp(self):
+        from test.synthetic_corpus import make_pdf
+        self._tmp = tempfile.TemporaryDirectory()
+        self.docs = [fitz.open(make_pdf(os.path.join(self._tmp.name, f"{seed}.pdf"), pages=4, seed=seed))
+                     for seed in range(3)]
+
+    def tearDown(self):
+        for doc in self.docs:
+            doc.close()
+        self._tmp.cleanup()
+
+    def _pages(self):
+        return [(doc, page_num) for doc in self.docs for page_num in range(doc.page_count)]
+
+    @staticmethod
+    def _spans(fitz_page: fitz.Page):
+        return [span for block in fitz_page.get_text("dict")["blocks"] if block["type"] == 0
+                for line in block["lines"] for span in line["spans"]]
+
+    def _expected_text(self, fitz_page: fitz.Page, fontsize, fonttype):
+        found_references, string = False, ""
+        for span in self._spans(fitz_page):
+            size_ok = fontsize is None or span["size"] == fontsize
+            if contains_keywords(span["text"]) and "bold" in span["font"].lower() and size_ok:
+                found_references = True
+            if not found_references and size_ok and fonttype in (None, span["font"]) and len(span["text"]) > 3:
+                string += span["text"]
+        return found_references, string
+
+    def _expected_font(self, fitz_page: fitz.Page):
+        width, height = fitz_page.rect.width, fitz_page.rect.height
+        result = defaultdict(int)
+        for span in self._spans(fitz_page):
+            x0, y0, x1, y1 = span["bbox"]
+            if all(width * 0.1 <= x <= width * 0.9 for x in (x0, x1)) and \
+                    all(height * 0.25 <= y <= height * 0.75 for y in (y0, y1)):
+                result[str(span["size"])] += 1
+                result[span["font"]] += 1
+        return result
+
+    def test_get_font(self):
+        for doc, page_num in self._pages():
+            expected = self._expected_font(doc.load_page(page_num))
+            actual = PaperPage(doc.load_page(page_num)).get_font()
+            self.assertEqual(dict(actual), dict(expected))
+            # Ties between the most common sizes (or fonts) go to the first one seen
+            for is_size in (True, False):
+                self.assertEqual([key for key in actual if key[0].isdigit() == is_size],
+                                 [key for key in expected if key[0].isdigit() == is_size])
+
+    def test_get_text(self):
+        for doc, page_num in self._pages():
+            fitz_page = doc.load_page(page_num)
+            spans = self._spans(fitz_page)
+            fonts = [None, "missing"] + sorted({span["font"] for span in spans})
+            sizes = [None, 99.0] + sorted({span["size"] for span in spans})
+            for fontsize in sizes:
+                for fonttype in fonts:
+                    page = PaperPage(doc.load_page(page_num))
+                    self.assertEqual(page.get_text(fontsize=fontsize, fonttype=fonttype),
+                                     self._expected_text(fitz_page, fontsize, fonttype))
+                    self.assertEqual(page.span_count, len(spans))
+
+    def test_references_are_found(self):
+        doc = self.docs[0]
+        last = PaperPage(doc.load_page(doc.page_count - 1))
+        found, text = last.get_text()
+        self.assertTrue(found)
+        self.assertNotIn("Journal", text)
+        self.assertEqual(last.get_text(find_references=False), "".join(
+            span["text"] for span in self._spans(doc.load_page(doc.page_count - 1)) if len(span["text"]) > 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
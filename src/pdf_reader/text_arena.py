@@ -0,0 +1,153 @@
+import os
+import mmap
+import tempfile
+import threading
+import unittest
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, NamedTuple, Tuple
+
+
+class TextRef(NamedTuple):
+    """
+    Location of a text in a `TextArena` file; small enough to pass between processes instead of the text.
+    """
+    path: str
+    offset: int  # Bytes from the start of the file
+    length: int  # Bytes of UTF-8
+
+
+EMPTY_TEXT = TextRef("", 0, 0)  # Reference of a document without text (e.g. one that could not be read)
+
+
+class TextArena:
+    """
+    Append-only file of UTF-8 texts. A process writes the texts it extracted and hands out `TextRef`s;
+    any process reads them back with `read_text`, through a memory map of the file, so texts cross
+    process boundaries through the page cache instead of being pickled.
+
+    Each writing process needs its own arena file; readers may map any number of them.
+
+    :param file_path: Path of the arena file; it is created or appended to.
+    """
+
+    def __init__(self, file_path: str):
+        self.path = os.path.abspath(file_path)
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> TextRef:
+        if not text:
+            return EMPTY_TEXT
+        data = text.encode("utf-8", "surrogatepass")
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "ab")
+            offset = self._file.tell()
+            self._file.write(data)
+            self._file.flush()
+        return TextRef(self.path, offset, len(data))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_maps: Dict[str, Tuple[mmap.mmap, int]] = {}  # Arena file -> (read-only map, mapped size) in this process
+_maps_lock = threading.Lock()
+
+
+def _mapped(ref: TextRef) -> mmap.mmap:
+    with _maps_lock:
+        mapped = _maps.get(ref.path)
+        if mapped is None or mapped[1] < ref.offset + ref.length:
+            # First use, or the arena grew since it was mapped; an older map is freed with its last view
+            with open(ref.path, "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                mapped = (mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ), size)
+            _maps[ref.path] = mapped
+        return mapped[0]
+
+
+def text_view(ref: TextRef) -> memoryview:
+    """
+    :return: The UTF-8 bytes of a text, without copying them out of the arena.
+    """
+    if not ref.length:
+        return memoryview(b"")
+    return memoryview(_mapped(ref))[ref.offset:ref.offset + ref.length]
+
+
+def read_text(ref: TextRef) -> str:
+    """
+    :return: The text a `TextRef` points to; decoding is the only copy made.
+    """
+    if not ref.length:
+        return ""
+    with memoryview(_mapped(ref)) as view:
+        return str(view[ref.offset:ref.offset + ref.length], "utf-8", "surrogatepass")
+
+
+def release_maps():
+    """
+    Unmap every arena mapped by this process, e.g. before its files are deleted.
+    """
+    with _maps_lock:
+        for mapped, _ in _maps.values():
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # A `text_view` is still in use; the map is freed with it
+        _maps.clear()
+
+
+class TestTextArena(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.arena = TextArena(os.path.join(self._tmp.name, "texts", "extract.arena"))
+        self.texts = ["Franchise agreements and royalties.", "Überblick – naïve café \U0001F4C4", "x" * 10_000]
+
+    def tearDown(self):
+        self.arena.close()
+        release_maps()
+        self._tmp.cleanup()
+
+    def test_round_trip(self):
+        refs = [self.arena.write(text) for text in self.texts]
+        self.assertEqual(self.arena.write(""), EMPTY_TEXT)
+        self.assertEqual([read_text(ref) for ref in refs], self.texts)
+        self.assertEqual(read_text(EMPTY_TEXT), "")
+        self.assertEqual(bytes(text_view(refs[1])), self.texts[1].encode("utf-8"))
+        self.assertEqual([ref.offset for ref in refs], [0, refs[0].length, refs[0].length + refs[1].length])
+
+    def test_read_in_other_process(self):
+        refs = [self.arena.write(text) for text in self.texts]
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            self.assertEqual(list(executor.map(read_text, refs + [EMPTY_TEXT])), self.texts + [""])
+
+    def test_arena_grows_after_mapping(self):
+        first = self.arena.write(self.texts[0])
+        view = text_view(first)
+        self.assertEqual(_maps[first.path][1], first.length)
+
+        # A text written after the arena was mapped is read through a new, larger map
+        second = self.arena.write(self.texts[2])
+        self.assertEqual(read_text(second), self.texts[2])
+        self.assertEqual(_maps[first.path][1], first.length + second.length)
+        self.assertEqual(bytes(view), self.texts[0].encode("utf-8"))
+        view.release()
+
+    def test_release_maps_with_view_in_use(self):
+        ref = self.arena.write(self.texts[0])
+        view = text_view(ref)
+        release_maps()
+        self.assertEqual(bytes(view), self.texts[0].encode("utf-8"))
+        view.release()
+        self.assertEqual(read_text(ref), self.texts[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,121 +1,326 @@
+import os
+import threading
 import pymupdf as fitz
-from src.config import ReaderConfig
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from src.config import ReaderConfig, ReaderSettings
 from src.pdf_reader.page import PaperPage
-from collections import defaultdict
+from src.instrumentation import Profiler, profiled
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from collections import OrderedDict, defaultdict, deque
 import logging
 
 logger = logging.getLogger("WFM.PdfReader")
 
+# Dominant font of each file, keyed by (path, size, mtime, probed pages), shared by all readers
+_font_cache: "OrderedDict[tuple, Dict[str, Optional[object]]]" = OrderedDict()
+_font_cache_lock = threading.Lock()
+_FONT_CACHE_SIZE = 4096  # Files whose probe result is kept; the least recently used are dropped first
+_CHUNKS_PER_WORKER = 4  # Page chunks per worker in parallel reading; smaller chunks waste less work past the references
+
+
+def _file_key(path: Optional[str]) -> Optional[Tuple[str, int, float]]:
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return os.path.abspath(path), stat.st_size, stat.st_mtime
+
+
+def _read_page(doc: fitz.Document, page_num: int, fontsize, fonttype, find_references: bool = True,
+               page: Optional[PaperPage] = None) -> Tuple[bool, str, int]:
+    """
+    Extract the body text of one page.
+
+    :param page: The already loaded page, if any.
+    :return: (found references, text, number of spans); an unreadable page yields no text
+    """
+    try:
+        page = page or PaperPage(doc.load_page(page_num))
+        if find_references:
+            found_references, string = page.get_text(find_references=True, fontsize=fontsize, fonttype=fonttype)
+        else:
+            found_references, string = False, page.get_text(find_references=False, fontsize=fontsize, fonttype=fonttype)
+        logger.debug(f"Extracted string: {string}")
+        return found_references, string, page.span_count
+    except Exception as e:
+        logger.warning(f"Error reading page {page_num + 1}: {e}")
+        return False, "", 0
+
+
+def _read_page_range(path: str, start: int, stop: int, fontsize, fonttype,
+                     find_references: bool = True) -> List[Tuple[bool, str, int]]:
+    """
+    Worker function: open the document independently and extract pages [start, stop).
+    Stops after the first page containing the references heading.
+    """
+    pages = []
+    with fitz.open(path) as doc:
+        for page_num in range(start, stop):
+            pages.append(_read_page(doc, page_num, fontsize, fonttype, find_references))
+            if pages[-1][0]:
+                break
+    return pages
+
+
+def _most_common_fonts(data) -> Dict[str, Optional[object]]:
+    max_num_key = None
+    max_num_value = float('-inf')
+
+    max_str_key = None
+    max_str_value = float('-inf')
+
+    for key, value in data.items():
+        try:
+            float_key = float(key)
+            if value > max_num_value:
+                max_num_key = float_key
+                max_num_value = value
+        except ValueError:
+            if value > max_str_value:
+                max_str_key = key
+                max_str_value = value
+    return {"fontsize": max_num_key, "fonttype": max_str_key}
+
+
+def _open_document(path: Optional[str]) -> fitz.Document:
+    if not path:
+        raise ValueError("PDF path is not set in the configuration.")
+    try:
+        doc = fitz.open(path)
+        logger.debug(f"PDF opened: {path}")
+        return doc
+    except FileNotFoundError:
+        raise FileNotFoundError(f"The file at path '{path}' was not found.")
+    except Exception as e:
+        raise Exception(f"An error occurred while opening the PDF: {e}")
+
 
 class PdfReader:
     """
     Manages PDF operations and provides a generator to iterate through pages.
+
+    `extract(path)` is stateless: it opens, reads and closes the file within the call, so one reader
+    can be shared by many threads. The older `set_path`/`open`/`read`/`close` sequence keeps the open
+    document on the instance and must not be shared.
+
+    :param settings: Immutable reader settings. A legacy ReaderConfig is accepted for its path.
+    :param profiler: Optional profiler recording stage timings and counts.
     """
 
-    def __init__(self, config: ReaderConfig):
-        self._config = config
+    def __init__(self, settings: Union[ReaderSettings, ReaderConfig, None] = None,
+                 profiler: Optional[Profiler] = None):
+        self._path = None
+        if isinstance(settings, ReaderConfig):
+            self._path = settings.get("path")
+            settings = None
+        self._settings: ReaderSettings = settings or ReaderSettings()
         self._doc = None
         self._common_fonts = {}
+        self._profiler = profiler or Profiler.disabled()
+        self._probed_pages: Dict[int, PaperPage] = {}  # Pages parsed by probe, reused by read
+        self._page_pool: Optional[ProcessPoolExecutor] = None  # Shared by every large document of this reader
+        self._page_pool_lock = threading.Lock()
         logger.info("PdfReader initialized")
 
-    def _populate_common_fonts(self, data):
-        max_num_key = None
-        max_num_value = float('-inf')
-
-        max_str_key = None
-        max_str_value = float('-inf')
-
-        for key, value in data.items():
-            try:
-                float_key = float(key)
-                if value > max_num_value:
-                    max_num_key = float_key
-                    max_num_value = value
-            except ValueError:
-                if value > max_str_value:
-                    max_str_key = key
-                    max_str_value = value
-        self._common_fonts["fontsize"] = max_num_key
-        self._common_fonts["fonttype"] = max_str_key
+    @property
+    def settings(self) -> ReaderSettings:
+        return self._settings
+
+    def cache_key(self, path: str) -> Optional[Tuple[str, int, float, ReaderSettings]]:
+        """
+        Key identifying the extraction result of a file with these settings.
+
+        :return: (absolute path, size, mtime, settings), or None if the file cannot be accessed
+        """
+        key = _file_key(path)
+        return key + (self._settings,) if key else None
+
+    @profiled("extraction")
+    def extract(self, path: str) -> str:
+        """
+        Read a PDF in one call, probing the body font first if the settings ask for it. Thread-safe.
+
+        :param path: Path to the PDF.
+        :return: (str) Pdf text
+        """
+        doc = _open_document(path)
+        try:
+            fonts, probed_pages = {}, {}
+            if self._settings.probe:
+                fonts, probed_pages = self._probe_document(doc, path, self._settings.probe_pages)
+            return self._read_document(doc, path, fonts, probed_pages)
+        finally:
+            doc.close()
 
     def set_path(self, path: str):
         """
-        Update the configuration path.
+        Set the file read by the next `open`. The settings are not modified.
         """
-        self._config.set_config(path)
-        logger.debug("PdfReader config updated")
+        self._path = path
+        logger.debug("PdfReader path updated")
 
     def open(self):
         """
-        Open the PDF specified in the configuration path.
+        Open the PDF set with `set_path`.
         """
-        if not self._config.get("path"):
-            raise ValueError("PDF path is not set in the configuration.")
-        path = self._config.get("path")
-        try:
-            self._doc = fitz.open(path)
-            logger.debug(f"PDF opened: {path}")
-        except FileNotFoundError:
-            raise FileNotFoundError(f"The file at path '{path}' was not found.")
-        except Exception as e:
-            raise Exception(f"An error occurred while opening the PDF: {e}")
+        self._doc = _open_document(self._path)
+        self._common_fonts = {}
+        self._probed_pages = {}
 
     def close(self):
         """
         Close the open PDF document, if any.
         """
         if self._doc:
+            self._probed_pages = {}
             self._doc.close()
             self._doc = None
             logger.debug("PDF closed")
         else:
             raise ValueError("No PDF file is currently open.")
 
-    def probe(self):
+    def probe(self, pages: Optional[Sequence[int]] = None):
         """
-        Function to probe pages 2, 3 and 4 to identify most common font size and font type
+        Function to probe a sample of pages to identify most common font size and font type.
+        The result is cached per file, so probing an unchanged file again is free.
 
+        :param pages: Zero-based page numbers to sample (defaults to the settings' probe_pages).
+                      Pages beyond the end of the document are ignored; if none remain, every page is used.
         :return: (int, str): font size, font type
         """
-        logger.info("Probing Pdf")
         self._ensure_document_open()
-        page_1 = PaperPage(self._doc.load_page(1)).get_font()
-        page_2 = PaperPage(self._doc.load_page(2)).get_font()
-        page_3 = PaperPage(self._doc.load_page(3)).get_font()
+        self._common_fonts, self._probed_pages = self._probe_document(
+            self._doc, self._path, self._settings.probe_pages if pages is None else tuple(pages))
+        return self._common_fonts.get("fontsize"), self._common_fonts.get("fonttype")
+
+    @profiled("probe")
+    def _probe_document(self, doc: fitz.Document, path: str, pages: Tuple[int, ...]):
+        key = _file_key(path)
+        key = key + (pages,) if key else None
+        with _font_cache_lock:
+            cached = _font_cache.get(key) if key else None
+            if cached:
+                _font_cache.move_to_end(key)
+        if cached:
+            logger.debug("Using cached probe result")
+            return dict(cached), {}
+
+        logger.info("Probing Pdf")
+        sample = [page_num for page_num in pages if 0 <= page_num < doc.page_count]
+        if not sample:
+            sample = range(doc.page_count)
 
         result = defaultdict(int)
+        probed_pages = {}
+        for page_num in sample:
+            page = PaperPage(doc.load_page(page_num))
+            probed_pages[page_num] = page
+            for font, count in page.get_font().items():
+                result[font] += count
+        fonts = _most_common_fonts(result)
 
-        for d in [page_1, page_2, page_3]:
-            for key, value in d.items():
-                result[key] += value
-        self._populate_common_fonts(result)
+        if key:
+            with _font_cache_lock:
+                _font_cache[key] = dict(fonts)
+                while len(_font_cache) > _FONT_CACHE_SIZE:
+                    _font_cache.popitem(last=False)
+        return fonts, probed_pages
 
+    @profiled("extraction")
     def read(self) -> str:
         """
         Function to read the entire pdf with or without references
         :return: (str) Pdf text
         """
         self._ensure_document_open()
+        probed_pages, self._probed_pages = self._probed_pages, {}
+        return self._read_document(self._doc, self._path, self._common_fonts, probed_pages)
+
+    def _read_document(self, doc: fitz.Document, path: str, fonts: dict, probed_pages: Dict[int, PaperPage]) -> str:
+        fontsize = fonts.get("fontsize")
+        fonttype = fonts.get("fonttype")
+        if self._settings.page_workers > 1 and doc.page_count >= self._settings.parallel_threshold:
+            pages = self._read_parallel(doc, path, fontsize, fonttype)
+        else:
+            pages = self._read_sequential(doc, fontsize, fonttype, probed_pages)
+
         text = ""
-        skip = False
-        for page_num in range(self._doc.page_count):
-            if skip:
-                logger.debug(f"Skipping page {page_num}")
-                continue
-            try:
-                page = PaperPage(self._doc.load_page(page_num))
-                found_references, string = page.get_text(find_references=True,
-                                                         fontsize=self._common_fonts.get("fontsize"),
-                                                         fonttype=self._common_fonts.get("fonttype"))
-                logger.debug(f"Extracted string: {string}")
-                if found_references:
-                    logger.debug("Found References")
-                    skip = True
-                text += string
-            except Exception as e:
-                logger.warning(f"Error reading page {page_num + 1}: {e}")
+        for found_references, string, span_count in pages:
+            self._profiler.count("pages")
+            self._profiler.count("spans", span_count)
+            text += string
+            if found_references:
+                logger.debug("Found References")
+                break
+        self._profiler.count("documents")
+        self._profiler.count("characters", len(text))
         return text
 
+    def _read_sequential(self, doc: fitz.Document, fontsize, fonttype, probed_pages: Dict[int, PaperPage]):
+        # Lazily read pages so that nothing after the references is parsed
+        for page_num in range(doc.page_count):
+            yield _read_page(doc, page_num, fontsize, fonttype, self._settings.find_references,
+                             probed_pages.pop(page_num, None))
+
+    def _read_parallel(self, doc: fitz.Document, path: str, fontsize, fonttype) -> List[Tuple[bool, str, int]]:
+        """
+        Split the page range into small contiguous chunks read by the reader's worker processes, each opening
+        the file itself. Only one chunk per worker is in flight and the next one is submitted as results come
+        in, in page order, so reading stops shortly after the references page: queued chunks are cancelled and
+        the results of the few chunks still running are dropped.
+
+        :return: Page results in page order, up to and including the first references page.
+        """
+        page_count = doc.page_count
+        workers = min(self._settings.page_workers, page_count)
+        size = max(1, -(-page_count // (workers * _CHUNKS_PER_WORKER)))
+        ranges = deque((start, min(start + size, page_count)) for start in range(0, page_count, size))
+        logger.debug(f"Reading {page_count} pages of {path} in {len(ranges)} chunks with {workers} workers")
+
+        executor = self._page_executor()
+        in_flight = deque()
+
+        def submit_next():
+            start, stop = ranges.popleft()
+            in_flight.append(executor.submit(_read_page_range, path, start, stop, fontsize, fonttype,
+                                             self._settings.find_references))
+
+        for _ in range(min(workers, len(ranges))):
+            submit_next()
+        pages = []
+        try:
+            while in_flight:
+                chunk = in_flight.popleft().result()
+                pages.extend(chunk)
+                if chunk and chunk[-1][0]:
+                    # The references cutoff makes the remaining chunks irrelevant
+                    break
+                if ranges:
+                    submit_next()
+        finally:
+            for later in in_flight:
+                later.cancel()
+        return pages
+
+    def _page_executor(self) -> ProcessPoolExecutor:
+        with self._page_pool_lock:
+            if self._page_pool is None:
+                self._page_pool = ProcessPoolExecutor(max_workers=self._settings.page_workers,
+                                                      mp_context=multiprocessing.get_context("spawn"))
+            return self._page_pool
+
+    def shutdown(self):
+        """
+        Stop the worker processes reading large documents, if any were started.
+        """
+        with self._page_pool_lock:
+            pool, self._page_pool = self._page_pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
     def _ensure_document_open(self):
         """
         Ensure the document is open, otherwise raise an error.
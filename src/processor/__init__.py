@@ -1,2 +1,11 @@
 from src.processor.lda import Lda
 from src.processor.text_processor import Processor
+from src.processor.token_filter import TokenFilter
+from src.processor.nlp_pool import NlpPool
+from src.processor.callbacks import PassProgressMetric, EarlyStoppingMetric
+from src.processor.token_store import TokenStore
+from src.processor.sparse_corpus import save_corpus, load_corpus
+from src.processor.sklearn_backend import SklearnTopicModel
+from src.processor.grouped_lda import GroupedLda, group_of
+from src.processor.dynamic_lda import DynamicLda, ParallelLdaSeqModel
+from src.processor.checkpoint import TokenCheckpoint, TrainingCheckpoint, files_digest
@@ -0,0 +1,145 @@
+from typing import Callable, List, Optional, Tuple
+from logging import getLogger
+import numpy as np
+from gensim.models.callbacks import Metric
+from src.processor.checkpoint import TrainingCheckpoint
+logger = getLogger("WFM.Callbacks")
+
+
+class _Converged(Exception):
+    """
+    Raised by `EarlyStoppingMetric` at the end of the pass in which training converged, so that
+    `LdaModel.update` skips its remaining passes; `Lda.train_model` catches it.
+    """
+
+
+class PassProgressMetric(Metric):
+    """
+    Gensim metric that does not measure anything but reports each finished training pass.
+
+    :param on_pass: Called with (finished passes, total passes) at the end of every pass.
+    :param passes: Total number of passes the model is trained for.
+    """
+
+    def __init__(self, on_pass: Callable[[int, int], None], passes: int):
+        self.logger = None
+        self.title = "Pass"
+        self._on_pass = on_pass
+        self._passes = passes
+        self._done = 0
+
+    def skip(self, passes: int):
+        """
+        Count passes done before a resume, so progress continues from there.
+        """
+        self._done += passes
+        self._on_pass(self._done, self._passes)
+
+    def get_value(self, **kwargs):
+        self._done += 1
+        logger.debug(f"Finished pass {self._done}/{self._passes}")
+        self._on_pass(self._done, self._passes)
+        return self._done
+
+
+class EarlyStoppingMetric(Metric):
+    """
+    Gensim metric that tracks convergence between passes and stops `LdaModel.update` once training has
+    converged, by raising `_Converged` from inside gensim's pass loop. Metrics listed after it do not run
+    for that pass.
+
+    With "perplexity" the metric is the perplexity of held-out documents and a pass counts as stalled when
+    it improves the previous value by less than `min_improvement` (relative). With "diff" the metric is the
+    mean total-variation distance between each topic's word distribution before and after the pass, and a
+    pass counts as stalled when that distance is below `min_improvement`.
+
+    :param mode: "perplexity" or "diff".
+    :param min_improvement: Threshold described above.
+    :param patience: Number of consecutive stalled passes after which training has converged.
+    :param corpus: Held-out BoW documents for the perplexity mode.
+    """
+
+    MODES = ("perplexity", "diff")
+
+    def __init__(self, mode: str = "perplexity", min_improvement: float = 0.001, patience: int = 2,
+                 corpus: Optional[List[List[Tuple[int, int]]]] = None):
+        if mode not in EarlyStoppingMetric.MODES:
+            raise ValueError(f"Unknown convergence mode {mode!r}, expected one of {', '.join(EarlyStoppingMetric.MODES)}")
+        if mode == "perplexity" and not corpus:
+            raise ValueError("The perplexity mode needs a held-out corpus")
+        self.logger = None
+        self.title = "EarlyStopping"
+        self.mode = mode
+        self.min_improvement = min_improvement
+        self.patience = max(1, patience)
+        self.corpus = corpus
+        self.history: List[float] = []
+        self._stalled = 0
+        self._previous_topics: Optional[np.ndarray] = None
+
+    def set_start(self, model):
+        """
+        Record the state of a model before its first pass, so that "diff" can measure the first pass too.
+        """
+        if self.mode == "diff":
+            self._previous_topics = model.get_topics()
+
+    def state(self) -> dict:
+        """
+        :return: JSON-serialisable state, saved with training checkpoints.
+        """
+        return {"history": self.history, "stalled": self._stalled}
+
+    def restore(self, state: dict):
+        self.history = list(state.get("history", []))
+        self._stalled = state.get("stalled", 0)
+
+    @property
+    def converged(self) -> bool:
+        return self._stalled >= self.patience
+
+    def get_value(self, **kwargs):
+        model = kwargs["model"]
+        if self.mode == "perplexity":
+            value = float(np.exp2(-model.log_perplexity(self.corpus)))
+            stalled = bool(self.history) and (self.history[-1] - value) < self.min_improvement * self.history[-1]
+        else:
+            topics = model.get_topics()
+            previous = self._previous_topics if self._previous_topics is not None else np.zeros_like(topics)
+            value = float(np.abs(topics - previous).sum(axis=1).mean() / 2)
+            self._previous_topics = topics
+            stalled = value < self.min_improvement
+        self._stalled = self._stalled + 1 if stalled else 0
+        self.history.append(value)
+        logger.debug(f"Pass {len(self.history)} {self.mode}: {value:.6g}{' (stalled)' if stalled else ''}")
+        if self.converged:
+            raise _Converged()
+        return value
+
+
+class CheckpointMetric(Metric):
+    """
+    Gensim metric that does not measure anything but saves a training checkpoint at the end of a pass
+    when one is due, so that training runs as a single `LdaModel.update` call and can still be resumed.
+    It runs after the metrics listed before it, so their state in the snapshot includes the pass.
+
+    :param checkpoint: Checkpoint to save to.
+    :param passes: Total number of passes; no snapshot is taken after the last one.
+    :param passes_done: Passes done before this call to `update`, e.g. restored from a checkpoint.
+    :param state: Returns the extra state saved with each snapshot, e.g. of the early-stopping monitor.
+    """
+
+    def __init__(self, checkpoint: TrainingCheckpoint, passes: int, passes_done: int = 0,
+                 state: Optional[Callable[[], Optional[dict]]] = None):
+        self.logger = None
+        self.title = "Checkpoint"
+        self._checkpoint = checkpoint
+        self._passes = passes
+        self._done = passes_done
+        self._state = state or (lambda: None)
+
+    def get_value(self, **kwargs):
+        self._done += 1
+        if self._done < self._passes and self._checkpoint.due(self._done):
+            self._checkpoint.save(kwargs["model"], self._done, self._state())
+        return self._done
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import unittest
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from logging import getLogger
+from gensim.models.ldamodel import LdaModel
+from src.processor.token_store import TokenStore
+logger = getLogger("WFM.Checkpoint")
+
+
+def store_digest(store: TokenStore, *settings) -> str:
+    """
+    :return: Short digest of the documents of a store and the settings they are trained with,
+        used to name checkpoints so that only a run on the same input resumes from them.
+    """
+    digest = hashlib.sha1(repr(settings).encode())
+    for ids, counts in store:
+        digest.update(ids.tobytes())
+        digest.update(counts.tobytes())
+    digest.update("\n".join(store.vocabulary).encode())
+    return digest.hexdigest()[:16]
+
+
+def files_digest(file_paths: List[str], *settings) -> str:
+    """
+    :return: Short digest of a list of input files and the settings they are processed with.
+    """
+    return hashlib.sha1(repr((sorted(os.path.abspath(p) for p in file_paths), settings)).encode()).hexdigest()[:16]
+
+
+class TokenCheckpoint:
+    """
+    Append-only record of the tokens of every preprocessed document, one JSON line per document,
+    so that an interrupted run only extracts and parses the documents it had not finished.
+
+    A document is reused only while its size and mtime are unchanged. A line cut short by a crash
+    is ignored. Each line can also hold the MinHash signature of the document's text, so that a resumed
+    run finds the same near duplicates as an uninterrupted one.
+
+    :param file_path: Path of the JSON-lines file.
+    """
+
+    def __init__(self, file_path: str):
+        self.path = file_path
+        self._file = None
+        self.signatures: Dict[str, Optional[np.ndarray]] = {}  # Signatures of the documents of the last `load`
+
+    def load(self) -> Dict[str, List[str]]:
+        """
+        :return: Tokens of the documents recorded so far, by document path; their signatures are
+            in `signatures`.
+        """
+        done = {}
+        self.signatures = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path) as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                    stat = os.stat(entry["path"])
+                except (ValueError, KeyError, OSError):
+                    continue
+                if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                    done[entry["path"]] = entry["tokens"]
+                    signature = entry.get("signature")
+                    self.signatures[entry["path"]] = np.array(signature, dtype=np.uint64) if signature else None
+        logger.info(f"Resuming preprocessing with {len(done)} documents from {self.path}")
+        return done
+
+    def append(self, document_path: str, tokens: List[str], signature: Optional[np.ndarray] = None):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a")
+        stat = os.stat(document_path)
+        self._file.write(json.dumps({"path": document_path, "size": stat.st_size, "mtime": stat.st_mtime,
+                                     "tokens": tokens,
+                                     "signature": signature.tolist() if signature is not None else None}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class TrainingCheckpoint:
+    """
+    Periodic snapshot of an `LdaModel` between passes, with the number of passes done and any extra
+    state (e.g. of the early-stopping monitor). Snapshots are written to a temporary directory and
+    swapped in, so a crash while saving leaves the previous one intact.
+
+    :param directory: Directory holding the snapshot.
+    :param every_passes: Save after this many passes (0 to disable).
+    :param every_minutes: Save when this many minutes passed since the last save (0 to disable).
+    """
+
+    STATE_FILE = "state.json"
+    MODEL_FILE = "model.gensim"
+
+    def __init__(self, directory: str, every_passes: int = 1, every_minutes: float = 0.0):
+        self.directory = directory
+        self.every_passes = every_passes
+        self.every_minutes = every_minutes
+        self._last_pass = 0
+        self._last_time = time.monotonic()
+
+    def due(self, passes_done: int) -> bool:
+        if self.every_passes and passes_done - self._last_pass >= self.every_passes:
+            return True
+        return bool(self.every_minutes) and time.monotonic() - self._last_time >= self.every_minutes * 60
+
+    def save(self, model: LdaModel, passes_done: int, state: Optional[dict] = None):
+        tmp_dir, old_dir = self.directory + ".tmp", self.directory + ".old"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        # Callbacks can hold GUI objects and held-out corpora; they are passed again on resume
+        model.save(os.path.join(tmp_dir, TrainingCheckpoint.MODEL_FILE), ignore=("state", "dispatcher", "callbacks"))
+        with open(os.path.join(tmp_dir, TrainingCheckpoint.STATE_FILE), "w") as file:
+            json.dump({"passes_done": passes_done, "state": state or {}}, file)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(self.directory):
+            os.replace(self.directory, old_dir)
+        os.replace(tmp_dir, self.directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        self._last_pass, self._last_time = passes_done, time.monotonic()
+        logger.info(f"Checkpoint after pass {passes_done}: {self.directory}")
+
+    def load(self) -> Optional[Tuple[LdaModel, int, dict]]:
+        """
+        :return: (model, passes done, extra state) of the last snapshot, or None if there is none.
+        """
+        for directory in (self.directory, self.directory + ".old"):
+            try:
+                with open(os.path.join(directory, TrainingCheckpoint.STATE_FILE)) as file:
+                    saved = json.load(file)
+                model = LdaModel.load(os.path.join(directory, TrainingCheckpoint.MODEL_FILE))
+            except (OSError, ValueError) as e:
+                if os.path.exists(directory):
+                    logger.warning(f"Ignoring unreadable checkpoint {directory}: {e}")
+                continue
+            self._last_pass = saved["passes_done"]
+            logger.info(f"Resuming training after pass {saved['passes_done']} from {directory}")
+            return model, saved["passes_done"], saved["state"]
+        return None
+
+    def remove(self):
+        for directory in (self.directory, self.directory + ".tmp", self.directory + ".old"):
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestTokenCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.documents = []
+        for name in ("a.pdf", "b.pdf"):
+            self.documents.append(os.path.join(self._tmp.name, name))
+            with open(self.documents[-1], "wb") as file:
+                file.write(name.encode())
+        self.checkpoint = TokenCheckpoint(os.path.join(self._tmp.name, "tokens.jsonl"))
+
+    def tearDown(self):
+        self.checkpoint.close()
+        self._tmp.cleanup()
+
+    def test_round_trip(self):
+        signature = np.array([2 ** 31 - 2, 0, 7], dtype=np.uint64)
+        self.checkpoint.append(self.documents[0], ["franchise", "fee"], signature)
+        self.checkpoint.append(self.documents[1], ["royalty"])
+        self.checkpoint.close()
+        with open(self.checkpoint.path, "a") as file:
+            file.write('{"path": "cut short')
+
+        done = self.checkpoint.load()
+        self.assertEqual(done, {self.documents[0]: ["franchise", "fee"], self.documents[1]: ["royalty"]})
+        np.testing.assert_array_equal(self.checkpoint.signatures[self.documents[0]], signature)
+        self.assertEqual(self.checkpoint.signatures[self.documents[0]].dtype, np.uint64)
+        self.assertIsNone(self.checkpoint.signatures[self.documents[1]])
+
+    def test_changed_document_is_not_restored(self):
+        self.checkpoint.append(self.documents[0], ["franchise"])
+        self.checkpoint.close()
+        with open(self.documents[0], "ab") as file:
+            file.write(b"edited")
+        self.assertEqual(self.checkpoint.load(), {})
+
+    def test_resumed_near_duplicates(self):
+        from src.pdf_reader.deduplicator import Deduplicator
+        text = " ".join(f"word{i % 97} term{i % 13}" for i in range(400))
+        first = Deduplicator()
+        first.near(self.documents[0], text)
+        self.checkpoint.append(self.documents[0], ["word"], first.signature_of(self.documents[0]))
+        self.checkpoint.close()
+
+        # The restored signature is registered, so the copy read after resuming is still a duplicate
+        self.checkpoint.load()
+        resumed = Deduplicator()
+        resumed.near_signature(self.documents[0], self.checkpoint.signatures[self.documents[0]])
+        self.assertEqual(resumed.near(self.documents[1], text), (self.documents[0], 1.0))
+
+    def test_remove(self):
+        self.checkpoint.append(self.documents[0], ["franchise"])
+        self.checkpoint.remove()
+        self.assertFalse(os.path.exists(self.checkpoint.path))
+        self.assertEqual(self.checkpoint.load(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,270 @@
+import os
+import tempfile
+import unittest
+import multiprocessing
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+from logging import getLogger
+import numpy as np
+from gensim.models.ldaseqmodel import LdaSeqModel, sslm
+from src.config import LdaConfig
+from src.instrumentation import Profiler, profiled
+from src.processor.token_store import TokenStore
+from src.processor.checkpoint import store_digest
+import pyLDAvis
+logger = getLogger("WFM.DynamicLda")
+
+
+def _fit_chain(chain: sslm, sstats: np.ndarray) -> Tuple[sslm, float]:
+    """
+    M-step of one topic chain in a worker process.
+    """
+    lhood = chain.fit_sslm(sstats)
+    return chain, lhood
+
+
+# Constants of the EM loop of `LdaSeqModel.fit_lda_seq`, copied from gensim 4.4;
+# TestParallelLdaSeqModel checks the copy of the loop against the installed gensim
+_EM_THRESHOLD = 1e-4  # gensim's LDASQE_EM_THRESHOLD
+_LOWER_ITER = 10  # Below this, the inference limit is doubled when the bound goes down
+_FINAL_ITER = 500  # Inference limit of the final iterations after convergence
+
+
+class ParallelLdaSeqModel(LdaSeqModel):
+    """
+    `LdaSeqModel` whose M-step fits the topic chains in parallel (each chain only depends on its own
+    sufficient statistics) and which saves a checkpoint after every EM iteration.
+
+    :param workers: Processes fitting topic chains; 1 keeps gensim's sequential loop.
+    :param checkpoint_path: File the model is saved to after every EM iteration, or None.
+    """
+
+    def __init__(self, *args, workers: int = 1, checkpoint_path: Optional[str] = None, **kwargs):
+        self.workers = max(1, workers)
+        self.checkpoint_path = checkpoint_path
+        self.em_iterations_done = 0
+        self.em_state: Optional[dict] = None  # State of the EM loop after the last iteration, saved with the model
+        self._executor: Optional[ProcessPoolExecutor] = None
+        super().__init__(*args, **kwargs)
+
+    def fit_lda_seq(self, corpus, lda_inference_max_iter, em_min_iter, em_max_iter, chunksize):
+        if self.workers <= 1 or self.num_topics < 2:
+            return self._fit_em(corpus, lda_inference_max_iter, em_min_iter, em_max_iter, chunksize)
+        workers = min(self.workers, self.num_topics)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            self._executor = executor
+            try:
+                return self._fit_em(corpus, lda_inference_max_iter, em_min_iter, em_max_iter, chunksize)
+            finally:
+                self._executor = None
+
+    def _fit_em(self, corpus, lda_inference_max_iter, em_min_iter, em_max_iter, chunksize):
+        """
+        The EM loop of gensim's `LdaSeqModel.fit_lda_seq`, with its state (iteration, bound, convergence and
+        inference limit) kept in `em_state` and saved in the checkpoint after every iteration, so that a
+        loaded checkpoint continues exactly where the interrupted run stopped.
+        """
+        state = getattr(self, "em_state", None) or {"iteration": 0, "bound": 0.0, "convergence": _EM_THRESHOLD + 1,
+                                                     "lda_inference_max_iter": lda_inference_max_iter}
+        iteration, bound = state["iteration"], state["bound"]
+        convergence, lda_inference_max_iter = state["convergence"], state["lda_inference_max_iter"]
+
+        while iteration < em_min_iter or (convergence > _EM_THRESHOLD and iteration <= em_max_iter):
+            logger.info(f"EM iteration {iteration}")
+            old_bound = bound
+            topic_suffstats = [np.zeros((self.vocab_len, self.num_time_slices)) for _ in range(self.num_topics)]
+            gammas = np.zeros((self.corpus_len, self.num_topics))
+            lhoods = np.zeros((self.corpus_len, self.num_topics + 1))
+            # E-step; the first iteration is the non-sequential one
+            bound, self.gammas = self.lda_seq_infer(corpus, topic_suffstats, gammas, lhoods, iteration,
+                                                    lda_inference_max_iter, chunksize)
+            bound += self.fit_lda_seq_topics(topic_suffstats)
+
+            if bound - old_bound < 0 and lda_inference_max_iter < _LOWER_ITER:
+                lda_inference_max_iter *= 2
+            convergence = np.fabs((bound - old_bound) / old_bound)
+            if convergence < _EM_THRESHOLD:
+                lda_inference_max_iter = _FINAL_ITER
+                convergence = 1.0
+            logger.info(f"EM iteration {iteration}: bound {bound:f}, convergence {convergence:f}")
+            iteration += 1
+
+            self.em_iterations_done = iteration
+            self.em_state = {"iteration": iteration, "bound": float(bound), "convergence": float(convergence),
+                             "lda_inference_max_iter": lda_inference_max_iter}
+            if self.checkpoint_path:
+                self.save(self.checkpoint_path, ignore=("_executor",))
+                logger.info(f"Checkpoint after EM iteration {iteration}: {self.checkpoint_path}")
+        return bound
+
+    def fit_lda_seq_topics(self, topic_suffstats):
+        if self._executor is None:
+            return super().fit_lda_seq_topics(topic_suffstats)
+        futures = [self._executor.submit(_fit_chain, chain, topic_suffstats[k])
+                   for k, chain in enumerate(self.topic_chains)]
+        lhood = 0
+        for k, future in enumerate(futures):
+            self.topic_chains[k], lhood_term = future.result()
+            lhood += lhood_term
+        return lhood
+
+    def resume(self, corpus, lda_inference_max_iter: int = 25, em_min_iter: int = 6, em_max_iter: int = 20,
+               chunksize: int = 100):
+        """
+        Continue the EM loop of a model loaded from a checkpoint from its saved `em_state`, with the same
+        arguments as the interrupted run.
+        """
+        logger.info(f"Resuming dynamic topic model after {self.em_iterations_done} EM iterations")
+        return self.fit_lda_seq(corpus, lda_inference_max_iter, em_min_iter, em_max_iter, chunksize)
+
+
+class DynamicLda:
+    """
+    Dynamic topic model over time slices (e.g. the years of a `GroupedLda`): topics are shared
+    across slices and their word distributions evolve from one slice to the next.
+
+    Long runs save a checkpoint after every EM iteration, named after a digest of the corpus and
+    settings, so an interrupted run on the same documents resumes where it stopped.
+
+    :param config: LdaConfig of the run (num_topics, passes of the initial LDA, chunksize, alpha).
+    :param profiler: Optional profiler recording stage timings.
+    :param workers: Processes fitting topic chains in parallel.
+    :param checkpoint_dir: Directory for checkpoints, or None to disable them.
+    """
+
+    def __init__(self, config: LdaConfig, profiler: Optional[Profiler] = None, workers: Optional[int] = None,
+                 checkpoint_dir: Optional[str] = None):
+        self._config = config
+        self._profiler = profiler or Profiler.disabled()
+        self._workers = max(1, workers or os.cpu_count() or 1)
+        self._checkpoint_dir = checkpoint_dir
+        self.model: Optional[ParallelLdaSeqModel] = None
+        self.labels: List[str] = []
+        self._dictionary = None
+        self._corpus: List[List[tuple]] = []
+
+    def _checkpoint_path(self, store: TokenStore, time_slice: Sequence[int]) -> Optional[str]:
+        if not self._checkpoint_dir:
+            return None
+        digest = store_digest(store, list(time_slice), self._config.get("num_topics"), self._config.get("passes"),
+                              self._config.get("alpha"), self._config.get("no_below"), self._config.get("no_above"))
+        os.makedirs(self._checkpoint_dir, exist_ok=True)
+        return os.path.join(self._checkpoint_dir, f"dtm_{digest}.gensim")
+
+    @profiled("lda.dynamic")
+    def train(self, store: TokenStore, time_slice: Sequence[int], labels: Sequence[str]) -> ParallelLdaSeqModel:
+        """
+        Train on documents ordered by time slice.
+
+        :param store: Documents of every slice, in slice order.
+        :param time_slice: Number of documents in each slice.
+        :param labels: Name of each slice, e.g. the year.
+        """
+        self.labels = list(labels)
+        self._dictionary = store.to_dictionary()
+        self._dictionary.filter_extremes(no_below=self._config.get("no_below"), no_above=self._config.get("no_above"))
+        if not len(self._dictionary):
+            raise ValueError("No terms left after filtering the dictionary")
+        self._corpus = store.to_corpus(self._dictionary)
+        temp = self._dictionary[0]  # only for dictionary loading
+        checkpoint_path = self._checkpoint_path(store, time_slice)
+
+        try:
+            alphas = float(self._config.get("alpha"))
+        except (TypeError, ValueError):
+            alphas = 0.01
+        fit = dict(lda_inference_max_iter=25, em_min_iter=6, em_max_iter=20, chunksize=self._config.get("chunksize"))
+
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self.model = ParallelLdaSeqModel.load(checkpoint_path)
+            self.model.workers = self._workers
+            self.model.checkpoint_path = checkpoint_path
+            self.model.resume(self._corpus, **fit)
+        else:
+            self.model = ParallelLdaSeqModel(
+                corpus=self._corpus, time_slice=list(time_slice), id2word=self._dictionary.id2token,
+                num_topics=self._config.get("num_topics"), alphas=alphas, passes=self._config.get("passes"),
+                workers=self._workers, checkpoint_path=checkpoint_path, **fit)
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self._profiler.count("lda.dynamic.em_iterations", self.model.em_iterations_done)
+        logger.info(f"Dynamic topic model trained over {len(time_slice)} time slices")
+        return self.model
+
+    def visualise(self, file_prefix: str):
+        """
+        Write one pyLDAvis page per time slice, `<file_prefix>_<label>.html`.
+        """
+        for time, label in enumerate(self.labels):
+            doc_topic, topic_term, doc_lengths, term_frequency, vocab = self.model.dtm_vis(time, self._corpus)
+            vis = pyLDAvis.prepare(topic_term_dists=topic_term, doc_topic_dists=doc_topic, doc_lengths=doc_lengths,
+                                   vocab=vocab, term_frequency=term_frequency, mds="mmds", sort_topics=False)
+            pyLDAvis.save_html(vis, f"{file_prefix}_{label}.html")
+        logger.info(f"Visualizing dynamic topic model at {file_prefix}_*.html")
+
+    def save(self, file_path: str):
+        self.model.save(file_path, ignore=("_executor",))
+
+
+class TestParallelLdaSeqModel(unittest.TestCase):
+    FIT = dict(lda_inference_max_iter=5, em_min_iter=3, em_max_iter=4, chunksize=100)
+
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        words = [f"w{i}" for i in range(12)]
+        documents = [list(rng.choice(words[(i % 2) * 6:(i % 2) * 6 + 8], size=20)) for i in range(9)]
+        store = TokenStore()
+        for document in documents:
+            store.add(document)
+        self.dictionary = store.to_dictionary()
+        self.corpus = store.to_corpus(self.dictionary)
+        self._tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _model(self, model_class=None, **kwargs):
+        model_class = model_class or ParallelLdaSeqModel
+        return model_class(corpus=self.corpus, time_slice=[3, 3, 3], id2word=self.dictionary,
+                           num_topics=2, passes=2, random_state=7, **self.FIT, **kwargs)
+
+    @staticmethod
+    def _chains(model: LdaSeqModel) -> np.ndarray:
+        return np.array([chain.e_log_prob for chain in model.topic_chains])
+
+    def test_em_loop_matches_gensim(self):
+        expected = self._model(LdaSeqModel)
+        model = self._model(workers=1)
+        np.testing.assert_array_equal(self._chains(model), self._chains(expected))
+        np.testing.assert_array_equal(model.gammas, expected.gammas)
+
+    def test_parallel_chains(self):
+        sequential = self._model(workers=1)
+        parallel = self._model(workers=2)
+        np.testing.assert_allclose(self._chains(parallel), self._chains(sequential))
+        self.assertEqual(parallel.em_iterations_done, sequential.em_iterations_done)
+
+    def test_resume(self):
+        expected = self._model()
+        checkpoint_path = os.path.join(self._tmp.name, "dtm.gensim")
+        fit_topics = ParallelLdaSeqModel.fit_lda_seq_topics
+
+        def interrupted(model, topic_suffstats):
+            if model.em_iterations_done == 2:
+                raise KeyboardInterrupt
+            return fit_topics(model, topic_suffstats)
+
+        with mock.patch.object(ParallelLdaSeqModel, "fit_lda_seq_topics", interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self._model(checkpoint_path=checkpoint_path)
+
+        model = ParallelLdaSeqModel.load(checkpoint_path)
+        self.assertEqual(model.em_iterations_done, 2)
+        model.resume(self.corpus, **self.FIT)
+        self.assertEqual(model.em_iterations_done, expected.em_iterations_done)
+        np.testing.assert_array_equal(self._chains(model), self._chains(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+import os
+import re
+import unittest
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+from logging import getLogger
+from src.config import LdaConfig
+from src.instrumentation import Profiler
+from src.processor.lda import Lda
+from src.processor.token_store import TokenStore
+logger = getLogger("WFM.GroupedLda")
+
+ALL_GROUP = "all"
+
+
+def group_of(file_path: str, group_by: str) -> str:
+    """
+    Group label of a file: its folder name, or for "year" the first number in the folder name
+    (the folder name itself if it has none), as picked in `token_extraction.ipynb`.
+    """
+    folder = os.path.basename(os.path.dirname(os.path.abspath(file_path)))
+    if group_by == "year":
+        years = re.findall(r'\d+', folder)
+        return years[0] if years else folder
+    return folder
+
+
+def _train_group(config: LdaConfig, store: TokenStore, checkpoint_dir: Optional[str]) -> tuple:
+    """
+    Train one group in a worker process.
+
+    :return: (model, dictionary, training report)
+    """
+    lda = Lda(config, dtm=store, checkpoint_dir=checkpoint_dir)
+    lda.train_model()
+    return lda._model, lda._dictionary, lda.training_report
+
+
+class GroupedLda:
+    """
+    Trains one `Lda` model per group of documents (e.g. per year or folder), plus one on all documents,
+    from a single shared `TokenStore`: every document is tokenised once, and each group's model trains
+    on a slice of the store that shares its arrays and vocabulary.
+
+    :param config: Settings of every model.
+    :param profiler: Optional profiler recording stage timings.
+    :param include_all: Also train the "all" model when there is more than one group.
+    :param workers: Processes training groups concurrently; 1 trains them one after another in this process.
+    :param checkpoint_dir: Directory for the training checkpoints of every group, or None.
+    """
+
+    def __init__(self, config: LdaConfig, profiler: Optional[Profiler] = None, include_all: bool = True,
+                 workers: Optional[int] = None, checkpoint_dir: Optional[str] = None):
+        self._config = config
+        self._profiler = profiler or Profiler.disabled()
+        self._include_all = include_all
+        self._workers = max(1, workers or os.cpu_count() or 1)
+        self._checkpoint_dir = checkpoint_dir
+        self._store = TokenStore()
+        self._groups: Dict[str, List[int]] = {}
+        self.models: Dict[str, Lda] = {}
+        self.failures: Dict[str, str] = {}
+
+    def append_to_dtm(self, tokens: List, group: str):
+        index = self._store.add(token for token in tokens if len(token) > 1)
+        self._groups.setdefault(group, []).append(index)
+
+    @property
+    def groups(self) -> Dict[str, List[int]]:
+        """
+        :return: Document indices of every group, including the "all" group if it is trained.
+        """
+        groups = dict(self._groups)
+        if self._include_all and len(self._groups) > 1:
+            groups[ALL_GROUP] = list(range(len(self._store)))
+        return groups
+
+    def time_slices(self) -> Tuple[TokenStore, List[int], List[str]]:
+        """
+        The documents ordered by group for a dynamic topic model; groups are sorted numerically
+        when every label is a number (years), alphabetically otherwise.
+
+        :return: (store slice in group order, documents per group, group labels)
+        """
+        if all(label.isdigit() for label in self._groups):
+            labels = sorted(self._groups, key=int)
+        else:
+            labels = sorted(self._groups)
+        order = [index for label in labels for index in self._groups[label]]
+        return self._store.subset(order), [len(self._groups[label]) for label in labels], labels
+
+    def train_models(self, on_model: Optional[Callable[[int, int], None]] = None) -> Dict[str, Lda]:
+        """
+        Train the model of every group. A group whose model cannot be trained (e.g. too few documents
+        left after filtering) is logged and listed in `failures` instead of stopping the others.
+
+        :param on_model: Called with (finished models, total models) after each model.
+        :return: The trained models by group.
+        """
+        slices = {name: self._store.subset(indices) for name, indices in self.groups.items()}
+        self.models, self.failures = {}, {}
+        with self._profiler.stage("lda.groups"):
+            if self._workers <= 1 or len(slices) < 2:
+                for name, store in slices.items():
+                    lda = Lda(self._config, self._profiler, store, self._checkpoint_dir)
+                    try:
+                        lda.train_model()
+                        self.models[name] = lda
+                    except Exception as e:
+                        self._fail(name, e)
+                    if on_model:
+                        on_model(len(self.models) + len(self.failures), len(slices))
+            else:
+                self._train_parallel(slices, on_model)
+        self._profiler.count("lda.models", len(self.models))
+        logger.info(f"Trained {len(self.models)} of {len(slices)} group models")
+        return {name: self.models[name] for name in slices if name in self.models}
+
+    def _train_parallel(self, slices: Dict[str, TokenStore], on_model: Optional[Callable[[int, int], None]]):
+        workers = min(self._workers, len(slices))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {executor.submit(_train_group, self._config, store, self._checkpoint_dir): name
+                       for name, store in slices.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    lda = Lda(self._config, self._profiler, slices[name])
+                    lda.load_trained(*future.result())
+                    self.models[name] = lda
+                except Exception as e:
+                    self._fail(name, e)
+                if on_model:
+                    on_model(len(self.models) + len(self.failures), len(slices))
+
+    def _fail(self, name: str, error: Exception):
+        logger.warning(f"Could not train the model of group {name}: {error}")
+        self.failures[name] = str(error)
+
+
+class TestGroupedLda(unittest.TestCase):
+    def setUp(self):
+        self.config = LdaConfig()
+        self.config.set_config(no_below=2, no_above=1.0, num_topics=2, chunk_size=10, passes=2, iterations=20)
+
+    def _grouped(self, workers: int = 1) -> GroupedLda:
+        grouped = GroupedLda(self.config, workers=workers)
+        for i in range(4):
+            grouped.append_to_dtm(["franchise", "royalty", "fee", "brand"][i % 2:] * 3, "2001")
+            grouped.append_to_dtm(["contract", "court", "law", "dispute"][i % 2:] * 3, "999")
+        # Every term of a single document is below no_below, so this group has an empty dictionary
+        grouped.append_to_dtm(["unique", "words", "only"], "2010")
+        return grouped
+
+    def test_group_of(self):
+        path = os.path.join("papers", "Franchising 2004 papers", "Paper 00001.pdf")
+        self.assertEqual(group_of(path, "folder"), "Franchising 2004 papers")
+        self.assertEqual(group_of(path, "year"), "2004")
+        self.assertEqual(group_of(os.path.join("papers", "drafts", "a.pdf"), "year"), "drafts")
+
+    def test_groups(self):
+        grouped = self._grouped()
+        self.assertEqual(grouped.groups, {"2001": [0, 2, 4, 6], "999": [1, 3, 5, 7], "2010": [8],
+                                          ALL_GROUP: list(range(9))})
+
+        single = GroupedLda(self.config)
+        single.append_to_dtm(["franchise", "fee"], "2001")
+        self.assertEqual(list(single.groups), ["2001"])
+        grouped._include_all = False
+        self.assertNotIn(ALL_GROUP, grouped.groups)
+
+    def test_time_slices(self):
+        store, time_slice, labels = self._grouped().time_slices()
+        self.assertEqual(labels, ["999", "2001", "2010"])
+        self.assertEqual(time_slice, [4, 4, 1])
+        self.assertEqual(store.tokens(0), sorted(["contract", "court", "law", "dispute"] * 3))
+
+        grouped = GroupedLda(self.config)
+        for label in ("b", "2001", "a"):
+            grouped.append_to_dtm(["franchise"], label)
+        self.assertEqual(grouped.time_slices()[2], ["2001", "a", "b"])
+
+    def test_train_models(self):
+        for workers in (1, 2):
+            grouped = self._grouped(workers)
+            progress = []
+            models = grouped.train_models(lambda done, total: progress.append((done, total)))
+
+            self.assertEqual(list(models), ["2001", "999", ALL_GROUP])
+            self.assertEqual(list(grouped.failures), ["2010"])
+            self.assertIn("No terms left", grouped.failures["2010"])
+            self.assertEqual(progress, [(done, 4) for done in range(1, 5)])
+            for name, lda in models.items():
+                # Models trained in worker processes are adopted with their dictionary and report
+                self.assertEqual(lda.training_report["passes_run"], 2)
+                self.assertEqual(len(lda._corpus), len(grouped.groups[name]))
+                self.assertEqual(lda._model.num_terms, len(lda._dictionary))
+            self.assertEqual(sorted(models["999"].vocabulary()), ["contract", "court", "dispute", "law"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,30 +1,59 @@
-from typing import Union, List, Dict, Optional
+import os
+import json
+import time
+import pickle
+import shutil
+import tempfile
+import unittest
+from typing import Union, List, Dict, Optional, Tuple
+import numpy as np
+from scipy import sparse
 from gensim import corpora
 from gensim.models.ldamodel import LdaModel
+from gensim.models.callbacks import Metric
 from src.config import LdaConfig
+from src.instrumentation import Profiler, profiled
+from src.processor.token_store import TokenStore
+from src.processor.sparse_corpus import save_corpus
+from src.processor.sklearn_backend import SklearnTopicModel
+from src.processor.callbacks import EarlyStoppingMetric, PassProgressMetric, CheckpointMetric, _Converged
+from src.processor.checkpoint import TrainingCheckpoint, store_digest
 from logging import getLogger
 import pyLDAvis.gensim_models
 logger = getLogger("WFM.Lda")
 
 
 class Lda:
-    def __init__(self, config: LdaConfig):
+    META_FILE = "model.json"
+    DICTIONARY_FILE = "dictionary.gensim"
+    GENSIM_MODEL_FILE = "model.gensim"
+    SKLEARN_MODEL_FILE = "model.pkl"
+
+    def __init__(self, config: LdaConfig, profiler: Optional[Profiler] = None, dtm: Optional[TokenStore] = None,
+                 checkpoint_dir: Optional[str] = None):
         """
         Initialize the LatDirAll class with no DTM and no trained models.
+
+        :param profiler: Optional profiler recording stage timings
+        :param dtm: Already filled token store to train on, e.g. a slice of a shared store
+        :param checkpoint_dir: Directory for training checkpoints, or None to disable them
         """
-        self._dtm = []
+        self._profiler = profiler or Profiler.disabled()
+        self._dtm = dtm if dtm is not None else TokenStore()
         self._config = config
-        self._model = None
+        self._model: Optional[Union[LdaModel, SklearnTopicModel]] = None
         self._dictionary: Optional[corpora.Dictionary] = None
         self._corpus: List[List[tuple]] = []
         self._models: Union[LdaModel, Dict[int, LdaModel]] = {}
+        self.training_report: Dict[str, object] = {}
+        self._checkpoint_dir = checkpoint_dir
         logger.info("Initializing LDA class")
 
     def append_to_dtm(self, tokens: List):
         logger.debug(f"Appending tokens to DTM: {tokens}")
-        ts = [token for token in tokens if len(token) > 1]
-        self._dtm.append(ts)
+        self._dtm.add(token for token in tokens if len(token) > 1)
 
+    @profiled("lda.dictionary")
     def _make_dictionary(self):
         """
         Makes a dictionary from the DTM.
@@ -32,35 +61,224 @@ class Lda:
         :return dictionary:
         """
 
-        self._dictionary = corpora.Dictionary(self._dtm)
+        workers = self._config.get("workers") or 1
+        self._dictionary = self._dtm.to_dictionary(workers)
         logger.debug(f"No Below: {self._config.get('no_below')}; No Above: {self._config.get('no_above')}")
         self._dictionary.filter_extremes(no_below=self._config.get("no_below"), no_above=self._config.get("no_above"))
-        self._corpus = [self._dictionary.doc2bow(doc) for doc in self._dtm]
+        self._corpus = self._dtm.to_corpus(self._dictionary, workers)
+        self._profiler.count("vocabulary", len(self._dictionary))
         logger.debug('Number of unique tokens: %d' % len(self._dictionary))
         logger.debug('Number of documents: %d' % len(self._corpus))
 
-    def train_model(self):
+    def vocabulary(self) -> List[str]:
         """
-        Train the LDA model on the corpus.
+        :return: Token of every dictionary id, in id order.
+        """
+        return [self._dictionary[i] for i in range(len(self._dictionary))]
+
+    def to_sparse(self) -> sparse.csr_matrix:
+        """
+        The filtered corpus as a CSR document-term matrix (documents x dictionary ids), for
+        engines other than gensim. The dictionary is built if it does not exist yet.
+        """
+        if self._dictionary is None:
+            self._make_dictionary()
+        return self._dtm.to_csr(self._dictionary)
+
+    def export_sparse(self, file_path: str):
+        """
+        Save the CSR corpus and its vocabulary to an uncompressed `.npz` file that
+        `load_corpus` can memory-map and `scipy.sparse.load_npz` can read.
+        """
+        save_corpus(file_path, self.to_sparse(), self.vocabulary())
+
+    def train_model(self, callbacks: Optional[List[Metric]] = None):
+        """
+        Train the topic model on the corpus with the configured backend.
+        :param callbacks: Gensim metrics evaluated at the end of every pass (gensim backend only)
         :return:
         """
         self._make_dictionary()
+        if not len(self._dictionary):
+            raise ValueError("No terms left after filtering the dictionary")
+        backend = self._config.get("backend") or "gensim"
+        if backend != "gensim":
+            model = SklearnTopicModel(backend, self._config, self.vocabulary())
+            with self._profiler.stage("lda.training"):
+                model.fit(self.to_sparse())
+            self._model = model
+            logger.debug(f"{backend} model trained")
+            return
+
         temp = self._dictionary[0] # only for dictionary loading
         id2word = self._dictionary.id2token
+        passes = self._config.get("passes")
+        mode = self._config.get("early_stopping") or "none"
+        training, monitor = self._corpus, None
+        if mode == "perplexity":
+            training, holdout = self._split_holdout()
+            monitor = EarlyStoppingMetric(mode, self._config.get("min_improvement"), self._config.get("patience"),
+                                          holdout)
+        elif mode != "none":
+            monitor = EarlyStoppingMetric(mode, self._config.get("min_improvement"), self._config.get("patience"))
+        # Held-out documents are left out of training until the monitor has stopped it
+        split = training is not self._corpus
+
+        callbacks = (callbacks or []) + ([monitor] if monitor else [])
+        checkpoint = self._training_checkpoint()
+        resumed = checkpoint.load() if checkpoint else None
 
-        self._model = LdaModel(
-            corpus=self._corpus,
-            id2word=id2word,
-            chunksize=self._config.get("chunksize"),
-            alpha=self._config.get("alpha"),
-            eta=self._config.get("eta"),
-            iterations=self._config.get("iterations"),
-            num_topics=self._config.get("num_topics"),
-            passes=self._config.get("passes"),
-            eval_every=self._config.get("eval_every"),
-        )
+        with self._profiler.stage("lda.training"):
+            started = time.perf_counter()
+            if resumed:
+                self._model, passes_done, state = resumed
+                self._model.callbacks = callbacks
+                if monitor:
+                    monitor.set_start(self._model)
+                    monitor.restore(state)
+                for callback in callbacks:
+                    if isinstance(callback, PassProgressMetric):
+                        callback.skip(passes_done)
+            else:
+                self._model = LdaModel(
+                    corpus=None,
+                    id2word=id2word,
+                    chunksize=self._config.get("chunksize"),
+                    alpha=self._config.get("alpha"),
+                    eta=self._config.get("eta"),
+                    iterations=self._config.get("iterations"),
+                    num_topics=self._config.get("num_topics"),
+                    passes=passes,
+                    eval_every=self._config.get("eval_every"),
+                    callbacks=callbacks,
+                )
+                passes_done = 0
+                if monitor:
+                    monitor.set_start(self._model)
+            resumed_from = passes_done
+            if checkpoint:
+                # Snapshots are taken at the end of a pass, after the monitor has measured it
+                self._model.callbacks = callbacks + [CheckpointMetric(
+                    checkpoint, passes, passes_done, monitor.state if monitor else None)]
+            # All passes in one update, as the LdaModel constructor runs them, until the monitor ends it.
+            # A resumed run trains its remaining passes in a new update, which restarts gensim's learning rate
+            try:
+                if passes_done < passes:
+                    self._model.update(training, passes=passes - passes_done)
+            except _Converged:
+                pass
+            passes_done = len(monitor.history) if monitor else passes
+            if split:
+                # Held-out documents are added like any new documents, with one online update
+                self._model.callbacks = None
+                self._model.update(holdout, passes=1)
+            seconds = time.perf_counter() - started
+        if checkpoint:
+            checkpoint.remove()
+        self._report_training(passes, passes_done, seconds, monitor, resumed_from)
         logger.debug("LDA model trained")
 
+    def _training_checkpoint(self) -> Optional[TrainingCheckpoint]:
+        """
+        Checkpoint of this corpus and these settings, or None if checkpoints are disabled.
+        """
+        every_passes, every_minutes = self._config.get("checkpoint_every") or 0, self._config.get("checkpoint_minutes") or 0
+        if not self._checkpoint_dir or not (every_passes or every_minutes):
+            return None
+        settings = sorted((key, repr(value)) for key, value in self._config.to_dict().items()
+                          if key not in ("passes", "workers", "checkpoint_every", "checkpoint_minutes"))
+        directory = os.path.join(self._checkpoint_dir, f"lda_{store_digest(self._dtm, settings)}")
+        return TrainingCheckpoint(directory, every_passes, every_minutes)
+
+    def _split_holdout(self) -> Tuple[List[List[tuple]], List[List[tuple]]]:
+        """
+        Split the corpus into (training, held-out) documents for early stopping: every n-th document is
+        held out, n = 1 / holdout. A corpus too small to spare a document is used for both.
+        """
+        fraction = self._config.get("holdout") or 0.0
+        if fraction <= 0 or int(len(self._corpus) * fraction) < 1 or len(self._corpus) < 2:
+            return self._corpus, self._corpus
+        step = max(2, round(1 / fraction))
+        training = [bow for i, bow in enumerate(self._corpus) if i % step != step - 1]
+        holdout = [bow for i, bow in enumerate(self._corpus) if i % step == step - 1]
+        return training, holdout
+
+    def _report_training(self, passes: int, passes_run: int, seconds: float, monitor: Optional[EarlyStoppingMetric],
+                         resumed_from: int = 0):
+        """
+        Log and count the passes run and saved; the time saved is estimated from the mean pass time
+        of this call (passes restored from a checkpoint took no time here).
+        """
+        passes_saved = passes - passes_run
+        timed = passes_run - resumed_from
+        seconds_saved = passes_saved * seconds / timed if timed > 0 else 0.0
+        self.training_report = {
+            "passes": passes,
+            "passes_run": passes_run,
+            "passes_saved": passes_saved,
+            "resumed_from_pass": resumed_from,
+            "seconds": seconds,
+            "estimated_seconds_saved": seconds_saved,
+            "history": monitor.history if monitor else [],
+        }
+        self._profiler.count("lda.passes_run", passes_run)
+        self._profiler.count("lda.passes_saved", passes_saved)
+        self._profiler.count("lda.seconds_saved", round(seconds_saved, 3))
+        if passes_saved:
+            logger.info(f"Converged after {passes_run}/{passes} passes: {passes_saved} passes and "
+                        f"about {seconds_saved:.1f}s saved")
+
+    def load_trained(self, model: Union[LdaModel, SklearnTopicModel], dictionary: corpora.Dictionary,
+                     training_report: Optional[Dict[str, object]] = None):
+        """
+        Adopt a model trained elsewhere (e.g. in a worker process) on this instance's DTM.
+        """
+        self._model = model
+        self._dictionary = dictionary
+        self._corpus = self._dtm.to_corpus(dictionary)
+        self.training_report = training_report or {}
+
+    def save_model(self, directory: str):
+        """
+        Persist the trained model and its dictionary so that new documents can be classified
+        without retraining (see `src.inference.TopicInferencer`).
+
+        :param directory: Directory to write to; created if missing.
+        """
+        if self._model is None:
+            raise AttributeError('No model has been trained.')
+        os.makedirs(directory, exist_ok=True)
+        self._dictionary.save(os.path.join(directory, Lda.DICTIONARY_FILE))
+        if isinstance(self._model, SklearnTopicModel):
+            backend = self._model.backend
+            with open(os.path.join(directory, Lda.SKLEARN_MODEL_FILE), "wb") as file:
+                pickle.dump(self._model, file)
+        else:
+            backend = "gensim"
+            self._model.save(os.path.join(directory, Lda.GENSIM_MODEL_FILE), ignore=("state", "dispatcher", "callbacks"))
+        with open(os.path.join(directory, Lda.META_FILE), "w") as file:
+            json.dump({"backend": backend, "num_topics": self._config.get("num_topics"),
+                       "documents": len(self._dtm), "vocabulary": len(self._dictionary)}, file, indent=2)
+        logger.info(f"Model saved to {directory}")
+
+    @staticmethod
+    def load_model(directory: str) -> Tuple[Union[LdaModel, SklearnTopicModel], corpora.Dictionary]:
+        """
+        Load a model written by `save_model`.
+
+        :return: (model, dictionary)
+        """
+        with open(os.path.join(directory, Lda.META_FILE)) as file:
+            backend = json.load(file)["backend"]
+        dictionary = corpora.Dictionary.load(os.path.join(directory, Lda.DICTIONARY_FILE))
+        if backend == "gensim":
+            model = LdaModel.load(os.path.join(directory, Lda.GENSIM_MODEL_FILE))
+        else:
+            with open(os.path.join(directory, Lda.SKLEARN_MODEL_FILE), "rb") as file:
+                model = pickle.load(file)
+        logger.info(f"Loaded {backend} model with {len(dictionary)} terms from {directory}")
+        return model, dictionary
+
     def get_topics(self):
         """
         Get topics from trained model.
@@ -70,17 +288,141 @@ class Lda:
         if self._models is None:
             raise AttributeError('No models has been trained.')
 
-        top_topics = self._model.top_topics(self._corpus)
+        if isinstance(self._model, SklearnTopicModel):
+            top_topics = self._model.top_topics()
+        else:
+            top_topics = self._model.top_topics(self._corpus)
         logger.debug(f"Top Topics: {top_topics} ")
         return top_topics
 
+    @profiled("lda.visualisation")
     def visualise(self, file_path: str):
         """
         Visualise the LDA model.
         :param file_path: a path to an HTML file
         :return:
         """
-        vis = pyLDAvis.gensim_models.prepare(self._model, self._corpus,
-                                             self._dictionary, mds="mmds")
+        if isinstance(self._model, SklearnTopicModel):
+            vis = self._model.prepare_vis(self.to_sparse(), mds="mmds")
+        else:
+            vis = pyLDAvis.gensim_models.prepare(self._model, self._corpus,
+                                                 self._dictionary, mds="mmds")
         pyLDAvis.save_html(vis, file_path)
         logger.info(f"Visualizing LDA model at path: {file_path}")
+
+
+class TestLda(unittest.TestCase):
+    def setUp(self):
+        topics = [["franchise", "royalty", "fee", "brand"], ["contract", "court", "law", "dispute"],
+                  ["owner", "store", "sales", "growth"]]
+        rng = np.random.default_rng(3)
+        self.documents = [list(rng.choice(topics[i % 3], size=40)) + list(rng.choice(topics[(i + 1) % 3], size=5))
+                          for i in range(12)]
+        self._tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+    def _lda(self, checkpoint_dir: Optional[str] = None, **settings) -> Lda:
+        config = LdaConfig()
+        config.set_config(**{"no_below": 1, "no_above": 1.0, "num_topics": 3, "chunk_size": 100, "passes": 6,
+                             "iterations": 50, **settings})
+        lda = Lda(config, checkpoint_dir=checkpoint_dir)
+        for document in self.documents:
+            lda.append_to_dtm(document)
+        return lda
+
+    def test_every_pass_without_early_stopping(self):
+        lda = self._lda()
+        lda.train_model()
+        self.assertEqual(lda.training_report["passes_run"], 6)
+        self.assertEqual(lda.training_report["history"], [])
+
+    def test_diff_early_stopping(self):
+        lda = self._lda(early_stopping="diff", min_improvement=1.0, patience=2)
+        lda.train_model()
+        self.assertEqual(lda.training_report["passes_run"], 2)
+        self.assertEqual(lda.training_report["passes_saved"], 4)
+        self.assertEqual(len(lda.training_report["history"]), 2)
+        # Every document is trained on, and the target corpus size is not inflated by one update per pass
+        self.assertEqual(lda._model.state.numdocs, len(self.documents))
+
+    def test_early_stopping_follows_gensim(self):
+        # Stopping after two passes of several chunks gives the topics of a plain two-pass model
+        lda = self._lda(early_stopping="diff", min_improvement=1.0, patience=2, chunk_size=4)
+        np.random.seed(5)
+        lda.train_model()
+        np.random.seed(5)
+        expected = LdaModel(lda._corpus, id2word=lda._dictionary.id2token, chunksize=4, alpha="auto", eta="auto",
+                            iterations=50, num_topics=3, passes=2, eval_every=None)
+        np.testing.assert_array_equal(lda._model.get_topics(), expected.get_topics())
+
+    def test_perplexity_early_stopping_trains_on_holdout(self):
+        lda = self._lda(early_stopping="perplexity", min_improvement=1.0, patience=1, holdout=0.25)
+        lda.train_model()
+        # The first pass cannot stall, the second does; the held-out documents are added afterwards
+        self.assertEqual(lda.training_report["passes_run"], 2)
+        self.assertEqual(len(lda.training_report["history"]), 2)
+        self.assertEqual(lda._model.state.numdocs, len(self.documents))
+
+    def test_split_holdout(self):
+        lda = self._lda(holdout=0.25)
+        lda._make_dictionary()
+        training, holdout = lda._split_holdout()
+        self.assertEqual((len(training), len(holdout)), (9, 3))
+        self.assertEqual(training + holdout, [lda._corpus[i] for i in [0, 1, 2, 4, 5, 6, 8, 9, 10, 3, 7, 11]])
+
+        lda = self._lda(holdout=0.05)
+        lda._make_dictionary()
+        training, holdout = lda._split_holdout()
+        self.assertIs(training, holdout)
+
+    def test_checkpoints_do_not_change_training(self):
+        # Snapshots are taken inside gensim's pass loop, so the topics match a run without them
+        topics = []
+        for checkpoint_dir in (None, self._tmp):
+            lda = self._lda(checkpoint_dir=checkpoint_dir, chunk_size=4, checkpoint_every=1)
+            np.random.seed(11)
+            lda.train_model()
+            topics.append(lda._model.get_topics())
+        np.testing.assert_array_equal(topics[0], topics[1])
+
+    def test_resume_from_checkpoint(self):
+        def interrupt(done: int, passes: int):
+            if done == 3:
+                raise KeyboardInterrupt
+
+        lda = self._lda(checkpoint_dir=self._tmp, checkpoint_every=1)
+        with self.assertRaises(KeyboardInterrupt):
+            lda.train_model(callbacks=[PassProgressMetric(interrupt, 6)])
+
+        progress = []
+        lda = self._lda(checkpoint_dir=self._tmp, checkpoint_every=1)
+        lda.train_model(callbacks=[PassProgressMetric(lambda done, passes: progress.append(done), 6)])
+        self.assertEqual(lda.training_report["resumed_from_pass"], 2)
+        self.assertEqual(lda.training_report["passes_run"], 6)
+        self.assertEqual(progress, [2, 3, 4, 5, 6])
+        # A finished training leaves no checkpoint behind
+        self.assertEqual(os.listdir(self._tmp), [])
+
+    def test_sklearn_backends(self):
+        for backend in ("sklearn_lda", "nmf"):
+            with self.subTest(backend=backend):
+                lda = self._lda(backend=backend)
+                lda.train_model()
+                self.assertIsInstance(lda._model, SklearnTopicModel)
+                doc_topics = lda._model.doc_topic_distribution()
+                self.assertEqual(doc_topics.shape, (len(self.documents), 3))
+                np.testing.assert_allclose(doc_topics.sum(axis=1), 1.0)
+                top_topics = lda._model.top_topics(topn=4)
+                self.assertEqual(len(top_topics), 3)
+                self.assertTrue(all(term in lda.vocabulary() for terms, _ in top_topics for _, term in terms))
+
+                lda.save_model(os.path.join(self._tmp, backend))
+                model, dictionary = Lda.load_model(os.path.join(self._tmp, backend))
+                np.testing.assert_allclose(model.infer(lda.to_sparse()), doc_topics, atol=0.05)
+                self.assertEqual(len(dictionary), len(lda.vocabulary()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+from logging import getLogger
+from src.config import ProcessorConfig
+from src.pdf_reader.text_arena import TextRef, EMPTY_TEXT, read_text, release_maps
+logger = getLogger("WFM.NlpPool")
+
+_processor = None  # Processor of a worker process, loaded once by `_init_worker`
+
+
+def _init_worker(config: ProcessorConfig, model_name: str):
+    global _processor
+    from src.processor.text_processor import Processor
+
+    _processor = Processor(config, model_name)
+
+
+def _process(ref: TextRef) -> List[str]:
+    """
+    Tokens of one text, read from its arena in the worker process.
+    """
+    text = read_text(ref)
+    if not text:
+        return []
+    _processor.set_text(text)
+    return _processor.process()
+
+
+class NlpPool:
+    """
+    `Processor` workers in separate processes, each loading the spaCy pipeline once. Texts are passed as
+    `TextRef`s into the arena files written by `MultiReader.read_to_arena`, so only the descriptors and
+    the resulting tokens are pickled; the workers read the texts from the memory-mapped arena.
+
+    :param config: Processor settings of every worker.
+    :param model_name: spaCy model loaded by every worker.
+    :param workers: Worker processes (defaults to the CPU count).
+    """
+
+    def __init__(self, config: ProcessorConfig, model_name: str = 'en_core_web_sm', workers: Optional[int] = None):
+        self._config = config
+        self._model_name = model_name
+        self._workers = max(1, workers or os.cpu_count() or 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "NlpPool":
+        self._executor = ProcessPoolExecutor(max_workers=self._workers,
+                                             mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker, initargs=(self._config, self._model_name))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def process(self, refs: Iterable[TextRef]) -> Iterator[List[str]]:
+        """
+        :return: The tokens of every text, in the order of `refs`.
+        """
+        if self._executor is None:
+            raise RuntimeError("NlpPool must be used as a context manager")
+        refs = list(refs)
+        logger.info(f"Processing {len(refs)} texts in {self._workers} processes")
+        return self._executor.map(_process, refs, chunksize=max(1, len(refs) // (self._workers * 4)))
+
+
+class TestNlpPool(unittest.TestCase):
+    def setUp(self):
+        from test.synthetic_corpus import make_corpus
+        from src.pdf_reader.multi_reader import MultiReader
+        self._tmp = tempfile.TemporaryDirectory()
+        make_corpus(os.path.join(self._tmp.name, "papers"), documents=3)
+        self.reader = MultiReader(os.path.join(self._tmp.name, "papers"))
+        self.config = ProcessorConfig()
+        self.config.set_config(capitalise=False)
+
+    def tearDown(self):
+        release_maps()
+        self._tmp.cleanup()
+
+    def test_matches_processor(self):
+        from src.processor.text_processor import Processor
+        refs = self.reader.read_to_arena(os.path.join(self._tmp.name, "arena"))
+        processor = Processor(self.config)
+        expected = []
+        for ref in refs:
+            processor.set_text(read_text(ref))
+            expected.append(processor.process())
+
+        with NlpPool(self.config, workers=2) as pool:
+            tokens = list(pool.process(refs + [EMPTY_TEXT]))
+
+        self.assertEqual(tokens, expected + [[]])
+        self.assertTrue(all(tokens[:-1]))
+
+    def test_requires_context(self):
+        with self.assertRaises(RuntimeError):
+            NlpPool(self.config).process([EMPTY_TEXT])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+from typing import List, Optional, Tuple
+from logging import getLogger
+import numpy as np
+from scipy import sparse
+logger = getLogger("WFM.SklearnBackend")
+
+
+def _prior(value) -> Optional[float]:
+    # gensim accepts "auto"/"symmetric"; scikit-learn only takes a number and uses 1 / n_components otherwise
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SklearnTopicModel:
+    """
+    Topic model trained with scikit-learn on the CSR document-term matrix of the corpus.
+
+    :param backend: "sklearn_lda" for `LatentDirichletAllocation` or "nmf" for `NMF`.
+    :param config: LdaConfig of the run; its parameters are mapped to the closest scikit-learn ones.
+    :param vocabulary: Token of every matrix column.
+    """
+
+    def __init__(self, backend: str, config, vocabulary: List[str]):
+        from sklearn.decomposition import LatentDirichletAllocation, NMF
+
+        self.backend = backend
+        self.vocabulary = vocabulary
+        if backend == "sklearn_lda":
+            self.estimator = LatentDirichletAllocation(
+                n_components=config.get("num_topics"),
+                doc_topic_prior=_prior(config.get("alpha")),
+                topic_word_prior=_prior(config.get("eta")),
+                learning_method="online",
+                batch_size=config.get("chunksize"),
+                max_iter=config.get("passes"),
+                max_doc_update_iter=config.get("iterations"),
+                evaluate_every=config.get("eval_every") or -1,
+                n_jobs=config.get("workers"),
+            )
+        elif backend == "nmf":
+            self.estimator = NMF(
+                n_components=config.get("num_topics"),
+                init="nndsvda",
+                max_iter=config.get("iterations"),
+            )
+        else:
+            raise ValueError(f"Unknown scikit-learn backend: {backend}")
+        self._doc_topics: Optional[np.ndarray] = None
+
+    def fit(self, matrix: sparse.csr_matrix):
+        self._doc_topics = self.estimator.fit_transform(matrix.astype(np.float64))
+        logger.debug(f"{self.backend} model trained on {matrix.shape[0]} documents")
+
+    def infer(self, matrix: sparse.csr_matrix) -> np.ndarray:
+        """
+        :return: Document-topic matrix of new documents (columns of the training vocabulary), rows normalised.
+        """
+        return self._normalise(self.estimator.transform(matrix.astype(np.float64)))
+
+    def topic_term_distribution(self) -> np.ndarray:
+        """
+        :return: Topic-term matrix with rows normalised to probabilities.
+        """
+        components = self.estimator.components_
+        return components / np.maximum(components.sum(axis=1, keepdims=True), np.finfo(float).tiny)
+
+    def doc_topic_distribution(self) -> np.ndarray:
+        """
+        :return: Document-topic matrix of the training corpus with rows normalised to probabilities.
+        """
+        return self._normalise(self._doc_topics)
+
+    @staticmethod
+    def _normalise(doc_topics: np.ndarray) -> np.ndarray:
+        totals = doc_topics.sum(axis=1, keepdims=True)
+        uniform = np.full_like(doc_topics, 1 / doc_topics.shape[1])
+        return np.divide(doc_topics, totals, out=uniform, where=totals > 0)
+
+    def top_topics(self, topn: int = 20) -> List[Tuple[List[Tuple[float, str]], None]]:
+        """
+        Top terms of every topic in the shape of gensim's `LdaModel.top_topics`, without a coherence score.
+        Topics are ordered by their share of the corpus.
+        """
+        distribution = self.topic_term_distribution()
+        weights = self.doc_topic_distribution().sum(axis=0)
+        topics = []
+        for topic in np.argsort(-weights):
+            terms = np.argsort(-distribution[topic])[:topn]
+            topics.append(([(float(distribution[topic, term]), self.vocabulary[term]) for term in terms], None))
+        return topics
+
+    def prepare_vis(self, matrix: sparse.csr_matrix, **kwargs):
+        """
+        :return: pyLDAvis data of the model, built from the raw distributions.
+        """
+        import pyLDAvis
+
+        return pyLDAvis.prepare(
+            topic_term_dists=self.topic_term_distribution(),
+            doc_topic_dists=self.doc_topic_distribution(),
+            doc_lengths=np.asarray(matrix.sum(axis=1)).ravel(),
+            vocab=self.vocabulary,
+            term_frequency=np.asarray(matrix.sum(axis=0)).ravel(),
+            **kwargs,
+        )
@@ -0,0 +1,146 @@
+import os
+import shutil
+import struct
+import zipfile
+import tempfile
+import unittest
+from typing import List, Tuple
+from logging import getLogger
+import numpy as np
+from scipy import sparse
+logger = getLogger("WFM.SparseCorpus")
+
+_LOCAL_HEADER = struct.Struct("<4s22xHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+def save_corpus(file_path: str, matrix: sparse.csr_matrix, vocabulary: List[str]):
+    """
+    Save a document-term matrix and its vocabulary to an uncompressed `.npz` file.
+
+    The keys match `scipy.sparse.save_npz`, so `scipy.sparse.load_npz` reads the matrix as well,
+    and the arrays are stored without compression so that `load_corpus` can memory-map them.
+
+    :param file_path: Path of the `.npz` file.
+    :param matrix: CSR matrix with one row per document and one column per vocabulary id.
+    :param vocabulary: Token of every column.
+    """
+    matrix = matrix.tocsr()
+    np.savez(file_path,
+             format=np.array("csr"),
+             shape=np.array(matrix.shape),
+             data=matrix.data,
+             indices=matrix.indices,
+             indptr=matrix.indptr,
+             vocabulary=np.array(vocabulary, dtype=str))
+    logger.info(f"Corpus of {matrix.shape[0]} documents and {matrix.shape[1]} terms saved to {file_path}")
+
+
+def _memmap_member(file, file_path: str, info: zipfile.ZipInfo) -> np.ndarray:
+    """
+    Memory-map one uncompressed `.npy` member of a zip archive.
+    """
+    file.seek(info.header_offset)
+    signature, name_length, extra_length = _LOCAL_HEADER.unpack(file.read(_LOCAL_HEADER.size))
+    if signature != _LOCAL_HEADER_SIGNATURE:
+        raise ValueError(f"Bad zip member header for {info.filename}")
+    file.seek(info.header_offset + _LOCAL_HEADER.size + name_length + extra_length)
+    version = np.lib.format.read_magic(file)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+    if dtype.hasobject or not np.prod(shape):
+        raise ValueError(f"{info.filename} cannot be memory-mapped")
+    return np.memmap(file_path, dtype=dtype, mode="r", offset=file.tell(), shape=shape,
+                     order="F" if fortran_order else "C")
+
+
+def load_corpus(file_path: str, mmap: bool = True) -> Tuple[sparse.csr_matrix, List[str]]:
+    """
+    Load a corpus written by `save_corpus`, or a CSR matrix written by `scipy.sparse.save_npz`
+    (which has no vocabulary).
+
+    :param file_path: Path of the `.npz` file.
+    :param mmap: Memory-map the matrix arrays instead of reading them, so that a large corpus is paged
+        in on demand and shared between processes. Compressed members are read normally.
+    :return: (matrix, vocabulary)
+    """
+    arrays = {}
+    if mmap:
+        with zipfile.ZipFile(file_path) as archive, open(file_path, "rb") as file:
+            for info in archive.infolist():
+                name = info.filename[:-len(".npy")]
+                if name not in ("data", "indices", "indptr") or info.compress_type != zipfile.ZIP_STORED:
+                    continue
+                try:
+                    arrays[name] = _memmap_member(file, file_path, info)
+                except ValueError as e:
+                    logger.debug(f"Reading {name} instead of memory-mapping it: {e}")
+
+    with np.load(file_path) as loaded:
+        # scipy.sparse.save_npz stores the format as bytes
+        matrix_format = loaded["format"].item()
+        if (matrix_format.decode() if isinstance(matrix_format, bytes) else matrix_format) != "csr":
+            raise ValueError(f"{file_path} does not hold a CSR matrix")
+        for name in ("data", "indices", "indptr"):
+            if name not in arrays:
+                arrays[name] = loaded[name]
+        shape = tuple(loaded["shape"].tolist())
+        vocabulary = loaded["vocabulary"].tolist() if "vocabulary" in loaded else []
+
+    matrix = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+    return matrix, vocabulary
+
+
+class TestSparseCorpus(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.mkdtemp()
+        self.matrix = sparse.random(30, 50, density=0.2, format="csr", dtype=np.float32,
+                                    random_state=np.random.default_rng(0))
+        self.vocabulary = [f"term_{i}" for i in range(50)]
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+    def test_round_trip(self):
+        file_path = os.path.join(self._tmp, "corpus.npz")
+        save_corpus(file_path, self.matrix, self.vocabulary)
+        for mmap in (True, False):
+            with self.subTest(mmap=mmap):
+                matrix, vocabulary = load_corpus(file_path, mmap=mmap)
+                self.assertEqual(vocabulary, self.vocabulary)
+                self.assertEqual(matrix.shape, self.matrix.shape)
+                self.assertEqual((matrix != self.matrix).nnz, 0)
+                # The matrix wraps (views of) the mapped arrays rather than copies of them
+                self.assertEqual([self._mapped(array) for array in (matrix.data, matrix.indices, matrix.indptr)],
+                                 [mmap] * 3)
+        self.assertEqual((sparse.load_npz(file_path) != self.matrix).nnz, 0)
+
+    @staticmethod
+    def _mapped(array: np.ndarray) -> bool:
+        while array is not None:
+            if isinstance(array, np.memmap):
+                return True
+            array = getattr(array, "base", None)
+        return False
+
+    def test_compressed_file_is_read(self):
+        file_path = os.path.join(self._tmp, "compressed.npz")
+        sparse.save_npz(file_path, self.matrix, compressed=True)
+        matrix, vocabulary = load_corpus(file_path)
+        self.assertEqual(vocabulary, [])
+        self.assertFalse(self._mapped(matrix.data))
+        self.assertEqual((matrix != self.matrix).nnz, 0)
+
+    def test_empty_matrix(self):
+        file_path = os.path.join(self._tmp, "empty.npz")
+        save_corpus(file_path, sparse.csr_matrix((3, 4), dtype=np.float32), ["a", "b", "c", "d"])
+        matrix, vocabulary = load_corpus(file_path)
+        self.assertEqual(matrix.shape, (3, 4))
+        self.assertEqual(matrix.nnz, 0)
+        self.assertEqual(vocabulary, ["a", "b", "c", "d"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,29 +1,76 @@
+import re
+import unittest
 import spacy
 from spacy.language import Language
-from typing import List
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 
-from spacy.tokens.token import Token
+from spacy.tokens import Doc
 
 from src.config import ProcessorConfig
+from src.processor.token_filter import TokenFilter
+from src.instrumentation import Profiler, profiled
 from logging import getLogger
 logger = getLogger("WFM.TextProcessor")
 
+_DROPPED = ""  # Memo value of a token that is filtered out
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """
+    Split a text into chunks of at most `max_chars` characters, cutting at the last paragraph break of
+    a chunk, else at its last sentence end, else at its last space. A cut is only taken in the second
+    half of a chunk, so chunks never get much shorter than `max_chars / 2`. Joining the chunks gives
+    the text back.
+
+    :param max_chars: Longest chunk; 0 returns the text as a single chunk.
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text]
+    chunks, start = [], 0
+    while len(text) - start > max_chars:
+        window = text[start:start + max_chars]
+        half = max(1, max_chars // 2)
+        cut = window.rfind("\n\n", half) + 2
+        if cut < half:
+            cut = max((match.end() for match in _SENTENCE_END.finditer(window, half)), default=0)
+        if cut < half:
+            cut = window.rfind(" ", half) + 1
+        if cut < half:
+            cut = max_chars
+        chunks.append(text[start:start + cut])
+        start += cut
+    chunks.append(text[start:])
+    return chunks
+
 
 class Processor:
+    MEMO_SIZE = 100_000  # (word, lemma) pairs whose filter decision and normalised lemma are remembered
 
-    def __init__(self, config: ProcessorConfig, model_name: str = 'en_core_web_sm') -> None:
+    def __init__(self, config: ProcessorConfig, model_name: str = 'en_core_web_sm',
+                 profiler: Optional[Profiler] = None) -> None:
         """
         Initializes the Processor with a specified spaCy language model.
 
         :param model_name: The name of the spaCy language model to load.
                            Default is 'en_core_web_sm'.
+        :param profiler: Optional profiler recording stage timings and token counts.
         """
         logger.info("Initializing Processor with spaCy language model.")
+        self._profiler = profiler or Profiler.disabled()
         try:
             self.nlp: Language = spacy.load(model_name)
             self._raw_text = None
             self._doc = None
+            self._docs: List[Doc] = []
             self._config: ProcessorConfig = config
+            # The filters only depend on the word and the lemma on the word and its tag, so each
+            # (orth, lemma) pair is decided once and repeated words cost a dict lookup
+            self._memo: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+            self._memo_key = None
+            self._token_filter: Optional[TokenFilter] = None
+            self._token_filter_rules = None
 
             logger.debug(f"Loaded spaCy model: {model_name}")
         except Exception as e:
@@ -33,8 +80,11 @@ class Processor:
         """
         :return doc: Spacy Document object
         """
-        if self._doc is None:
+        if not self._docs:
             raise Exception("Spacy Document is not loaded")
+        if self._doc is None:
+            # A chunked text is only merged into one Doc when it is asked for
+            self._doc = Doc.from_docs(self._docs)
         return self._doc
 
     def get_text(self):
@@ -45,17 +95,33 @@ class Processor:
             raise Exception("Spacy Document is not loaded")
         return self._raw_text
 
+    @profiled("nlp.parse")
     def set_text(self, raw_text):
+        """
+        Parse a text. A text longer than the `chunk_chars` setting is parsed in chunks cut at paragraph
+        or sentence ends (see `split_text`), so spaCy's memory is bounded by the chunk size rather than
+        the document, and `nlp.max_length` never needs raising.
+        """
         self._raw_text = raw_text
-        self._doc = self.nlp(raw_text)
+        chunks = split_text(raw_text, self._config.get("chunk_chars") or 0)
+        if len(chunks) == 1:
+            self._doc = self.nlp(raw_text)
+            self._docs = [self._doc]
+        else:
+            self._doc = None
+            self._docs = list(self.nlp.pipe(chunks, n_process=self._config.get("n_process") or 1))
+            self._profiler.count("nlp.chunks", len(chunks))
+        self._profiler.count("tokens", sum(len(doc) for doc in self._docs))
         logger.debug("Setting raw text")
 
+    @profiled("nlp.filter")
     def process(self, stop_words=None) -> List[str]:
         """
         Process the Spacy Doc object by performing the following:
-            1. Remove punctuations, numbers, and special characters.
-            2. Remove stop words.
-            3. Lemmatize the remaining tokens.
+            1. Remove the tokens dropped by the `token_filter` of the config (by default punctuation,
+               numbers, non-alphabetic tokens and stop words), plus words containing any of `stop_words`.
+            2. Lemmatize the remaining tokens.
+            3. Keep the short noun chunks of the lemmatized text.
 
         :return processed_tokens: List of tokens from the doc.
         """
@@ -65,35 +131,155 @@ class Processor:
         else:
             f = lambda x: x
 
-        _text = ""
-        for token in self._doc:
-            if not token.is_punct and not token.is_stop and not token.is_digit and token.is_alpha and self._custom_stopwards(token, stop_words):
-                _text += f(token.lemma_) + ' '
+        token_filter = self._get_token_filter()
+        memo_key = (tuple(stop_words) if stop_words is not None else None, self._config.get("capitalise"),
+                    token_filter)
+        if memo_key != self._memo_key:
+            self._memo.clear()
+            self._memo_key = memo_key
+        memo, hits = self._memo, 0
 
-        doc = self.nlp(_text)
-        for chunk in doc.noun_chunks:
-            words = chunk.text.split(" ")
-            if not len(words) > 3:
-                if len(words) > 1 and len(chunk.text) > 5:
-                    _tokens.append(f(chunk.text))
-                elif len(words) <= 1:
-                    _tokens.append(f(chunk.text))
+        # The lemmas of each chunk are parsed again for noun chunks, one chunk at a time
+        _texts = []
+        strings = self.nlp.vocab.strings
+        for parsed in self._docs:
+            _lemmas = []
+            orths, lemmas = token_filter.select(parsed)
+            for key in zip(orths.tolist(), lemmas.tolist()):
+                lemma = memo.get(key)
+                if lemma is None:
+                    lemma = self._filter(strings[key[0]], strings[key[1]], token_filter, stop_words, f)
+                    memo[key] = lemma
+                    if len(memo) > Processor.MEMO_SIZE:
+                        memo.popitem(last=False)
+                else:
+                    memo.move_to_end(key)
+                    hits += 1
+                if lemma:
+                    _lemmas.append(lemma)
+            _texts.append("".join(lemma + ' ' for lemma in _lemmas))
+        self._profiler.count("nlp.memo_hits", hits)
+
+        for doc in self.nlp.pipe(_texts, n_process=self._config.get("n_process") or 1):
+            for chunk in doc.noun_chunks:
+                words = chunk.text.split(" ")
+                if not len(words) > 3:
+                    if len(words) > 1 and len(chunk.text) > 5:
+                        _tokens.append(f(chunk.text))
+                    elif len(words) <= 1:
+                        _tokens.append(f(chunk.text))
 
         logger.debug(f"Processed tokens: {_tokens}")
+        self._profiler.count("terms", len(_tokens))
         return _tokens
 
-    def _custom_stopwards(self, text: Token, stop_wards):
+    def _get_token_filter(self) -> TokenFilter:
+        rules = self._config.get("token_filter")
+        if self._token_filter is None or rules != self._token_filter_rules:
+            self._token_filter = TokenFilter(rules, self.nlp.vocab.strings)
+            self._token_filter_rules = rules
+        return self._token_filter
+
+    def _filter(self, text: str, lemma: str, token_filter: TokenFilter, stop_words, f) -> str:
+        """
+        The checks on the text of a token that passed the vectorised rules.
+
+        :return: The normalised lemma of the token, or `_DROPPED` if it is filtered out.
+        """
+        if token_filter.keeps_text(text) and self._custom_stopwards(text, stop_words):
+            return f(lemma).strip()
+        return _DROPPED
+
+    def _custom_stopwards(self, text: str, stop_wards):
         if stop_wards is not None:
             for token in stop_wards:
-                if token in text.text:
+                if token in text:
                     return False
         return True
 
-if __name__ == '__main__':
-    conf = ProcessorConfig()
-    conf.set_config(capitalise=False)
-    processor = Processor(conf, 'en_core_web_sm')
-    text = "In 2023, Natural Language Processing (NLP) continues to evolve rapidly! Researchers focus on improving models like GPT-4, BERT, and others to achieve state-of-the-art performance in text understanding, generation, & translation. Some challenges in NLP include handling rare words, ambiguous meanings, and training models efficiently (with fewer resources). Popular frameworks, such as TensorFlow, PyTorch, & Hugging Face's Transformers, are used for training massive language models. Can we predict that by 2030, NLP systems will fully understand human emotions? Only time will tell... #AI #NLP #Future, Russia, Russian"
-    processor.set_text(text)
-    processed_tokens = processor.process()
-    print(processed_tokens)
+
+@Language.component("one_word_chunks")
+def _one_word_chunks(doc: Doc) -> Doc:
+    """
+    Test stand-in for a trained parser: every alphabetic word is a noun chunk of its own, lemmatised as written.
+    """
+    for token in doc:
+        token.lemma_ = token.text
+        token.pos_ = "NOUN" if token.is_alpha else "PUNCT"
+        token.dep_ = "ROOT"
+    return doc
+
+
+class TestProcessor(unittest.TestCase):
+    TEXT = ("In 2023, Natural Language Processing continues to evolve rapidly! Researchers focus on improving "
+            "models to achieve better performance in text understanding, generation, & translation.\n\n"
+            "Some challenges include handling rare words, ambiguous meanings, and training models efficiently. "
+            "Popular frameworks, such as TensorFlow and PyTorch, are used for training massive language models. "
+            "Can we predict that by 2030, Language systems will fully understand human emotions? Only time will tell.")
+
+    def _processor(self, **settings) -> Processor:
+        config = ProcessorConfig()
+        config.set_config(**settings)
+        processor = Processor(config, "blank:en")
+        processor.nlp.add_pipe("one_word_chunks")
+        return processor
+
+    def test_split_text(self):
+        for max_chars in (40, 100, 250):
+            chunks = split_text(self.TEXT, max_chars)
+            self.assertEqual("".join(chunks), self.TEXT)
+            self.assertTrue(all(len(chunk) <= max_chars for chunk in chunks))
+            # Every chunk but the last ends at a paragraph break, a sentence end or, failing those, a space
+            self.assertTrue(all(chunk.endswith((" ", "\n")) for chunk in chunks[:-1]))
+        self.assertEqual(split_text(self.TEXT, 250)[0], self.TEXT[:self.TEXT.index("\n\n") + 2])
+        self.assertTrue(all(chunk.endswith((". ", "! ", "? ")) for chunk in split_text(self.TEXT, 180)[1:-1]))
+        self.assertEqual(split_text(self.TEXT, 0), [self.TEXT])
+        self.assertEqual(split_text(self.TEXT, len(self.TEXT)), [self.TEXT])
+        self.assertEqual(split_text("x" * 25, 10), ["x" * 10, "x" * 10, "x" * 5])
+
+    def test_chunked_process(self):
+        whole = self._processor(chunk_chars=0)
+        whole.set_text(self.TEXT)
+        expected = whole.process()
+        self.assertIn("language", expected)
+
+        below = self._processor(chunk_chars=len(self.TEXT))
+        below.set_text(self.TEXT)
+        self.assertEqual(len(below._docs), 1)
+        self.assertEqual(below.process(), expected)
+
+        chunked = self._processor(chunk_chars=100)
+        chunked.set_text(self.TEXT)
+        self.assertEqual(len(chunked._docs), len(split_text(self.TEXT, 100)))
+        self.assertEqual(chunked.process(), expected)
+        self.assertEqual(chunked.get_doc().text.replace(" ", ""), self.TEXT.replace(" ", ""))
+
+    def test_memo_follows_settings(self):
+        processor = self._processor()
+        processor.set_text(self.TEXT)
+        self.assertIn("language", processor.process())
+        self.assertIn("language", processor._memo.values())
+        # A memoised decision must not survive a change of the stop words ...
+        self.assertNotIn("language", processor.process(stop_words=["anguage"]))
+        self.assertIn("language", processor.process())
+        # ... or of the capitalisation
+        processor._config.set_config(capitalise=True)
+        tokens = processor.process()
+        self.assertIn("Natural", tokens)
+        self.assertNotIn("natural", tokens)
+
+    def test_memo_size(self):
+        processor = self._processor()
+        processor.set_text(self.TEXT)
+        expected = processor.process()
+        original, Processor.MEMO_SIZE = Processor.MEMO_SIZE, 5
+        try:
+            processor._memo.clear()
+            self.assertEqual(processor.process(), expected)
+            self.assertEqual(len(processor._memo), 5)
+        finally:
+            Processor.MEMO_SIZE = original
+
+
+if __name__ == "__main__":
+    unittest.main()
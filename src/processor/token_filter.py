@@ -0,0 +1,55 @@
+import re
+from typing import Tuple
+import numpy as np
+from spacy.attrs import ORTH, LEMMA, LENGTH, POS, ENT_TYPE, IS_ALPHA, IS_DIGIT, IS_PUNCT, IS_SPACE, IS_STOP, \
+    LIKE_EMAIL, LIKE_NUM, LIKE_URL
+from spacy.strings import StringStore
+from spacy.tokens import Doc
+
+FLAGS = {"is_alpha": IS_ALPHA, "is_digit": IS_DIGIT, "is_punct": IS_PUNCT, "is_space": IS_SPACE,
+         "is_stop": IS_STOP, "like_email": LIKE_EMAIL, "like_num": LIKE_NUM, "like_url": LIKE_URL}
+_ORTH, _LEMMA, _LENGTH, _POS, _ENT_TYPE = range(5)  # Leading columns of the attribute array
+
+
+class TokenFilter:
+    """
+    The rules of a `ProcessorConfig` token filter compiled into NumPy masks over `Doc.to_array`:
+    flags, part of speech, entity type and length are checked for all tokens of a Doc at once.
+
+    Only `drop_pattern` needs the token text; it is checked per word with `keeps_text`, which
+    `Processor` memoises, so it runs once per distinct word rather than once per token.
+
+    :param rules: Token filter rules, as resolved by `ProcessorConfig`.
+    :param strings: String store of the pipeline, mapping part-of-speech and entity labels to ids.
+    """
+
+    def __init__(self, rules: dict, strings: StringStore):
+        self._drop_flags = list(rules["drop_flags"])
+        self._require_flags = list(rules["require_flags"])
+        self.attrs = [ORTH, LEMMA, LENGTH, POS, ENT_TYPE] + [FLAGS[flag] for flag in
+                                                            self._drop_flags + self._require_flags]
+        self._drop_pos = np.array([strings.add(pos) for pos in rules["drop_pos"]], dtype=np.uint64)
+        self._drop_entities = np.array([strings.add(label) for label in rules["drop_entities"]], dtype=np.uint64)
+        self._min_length = rules["min_length"]
+        self._pattern = re.compile(rules["drop_pattern"]) if rules["drop_pattern"] else None
+
+    def select(self, doc: Doc) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: (orth ids, lemma ids) of the tokens of a Doc that pass the vectorised rules, in order.
+        """
+        array = doc.to_array(self.attrs).reshape(len(doc), len(self.attrs))
+        keep = array[:, _LENGTH] >= self._min_length
+        if len(self._drop_pos):
+            keep &= ~np.isin(array[:, _POS], self._drop_pos)
+        if len(self._drop_entities):
+            keep &= ~np.isin(array[:, _ENT_TYPE], self._drop_entities)
+        flags = array[:, _ENT_TYPE + 1:] != 0
+        drop = len(self._drop_flags)
+        keep &= ~flags[:, :drop].any(axis=1) & flags[:, drop:].all(axis=1)
+        return array[keep, _ORTH], array[keep, _LEMMA]
+
+    def keeps_text(self, text: str) -> bool:
+        """
+        :return: Whether a word passes `drop_pattern` (matched at its start, as `re.match` does in the notebook).
+        """
+        return self._pattern is None or self._pattern.match(text) is None
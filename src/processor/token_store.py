@@ -0,0 +1,300 @@
+import multiprocessing
+import unittest
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from logging import getLogger
+import numpy as np
+from scipy import sparse
+from gensim import corpora
+logger = getLogger("WFM.TokenStore")
+
+ID_DTYPE = np.uint32
+
+
+def _shard_frequencies(ids: List[np.ndarray], counts: List[np.ndarray], size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Partial document and collection frequencies of one shard of documents.
+    """
+    if not ids:
+        return np.zeros(size, dtype=np.int64), np.zeros(size, dtype=np.int64)
+    all_ids = np.concatenate(ids)
+    dfs = np.bincount(all_ids, minlength=size)
+    cfs = np.bincount(all_ids, weights=np.concatenate(counts), minlength=size).astype(np.int64)
+    return dfs, cfs
+
+
+def _shard_bow(ids: List[np.ndarray], counts: List[np.ndarray], mapping: np.ndarray,
+               ordered: bool) -> List[List[Tuple[int, int]]]:
+    """
+    Bag-of-words of one shard of documents, with ids remapped by `mapping`.
+    """
+    corpus = []
+    for doc_ids, doc_counts in zip(ids, counts):
+        new_ids = mapping[doc_ids]
+        keep = new_ids >= 0
+        new_ids, kept_counts = new_ids[keep], doc_counts[keep]
+        if not ordered:
+            order = np.argsort(new_ids, kind="stable")
+            new_ids, kept_counts = new_ids[order], kept_counts[order]
+        corpus.append(list(zip(new_ids.tolist(), kept_counts.tolist())))
+    return corpus
+
+
+class TokenStore:
+    """
+    Compact document-term store: every distinct token is interned once in a shared vocabulary
+    and each document is kept as a sorted `uint32` array of token ids plus a matching count array.
+
+    Token ids are assigned exactly like `gensim.corpora.Dictionary` assigns them (new tokens of a
+    document in sorted order), so the dictionary and BoW corpus built from the store are identical
+    to building them from lists of strings. A store sharing another store's vocabulary (e.g. a
+    `subset`) renumbers its dictionary in the same way, by the documents it holds.
+
+    :param vocabulary: Id-to-token list of another store to share, so that ids are comparable between stores.
+    :param token2id: Token-to-id mapping belonging to `vocabulary`.
+    """
+
+    def __init__(self, vocabulary: Optional[List[str]] = None, token2id: Optional[Dict[str, int]] = None):
+        self._id2token: List[str] = vocabulary if vocabulary is not None else []
+        self._token2id: Dict[str, int] = token2id if token2id is not None else {}
+        self._ids: List[np.ndarray] = []
+        self._counts: List[np.ndarray] = []
+        self._ids_in_order = vocabulary is None  # Whether the vocabulary ids follow the documents of this store
+
+    def add(self, tokens: Iterable[str]) -> int:
+        """
+        Add a document.
+
+        :param tokens: Tokens of the document, in any order.
+        :return: Index of the document.
+        """
+        counter = Counter(tokens)
+        for token in sorted(token for token in counter if token not in self._token2id):
+            self._token2id[token] = len(self._id2token)
+            self._id2token.append(token)
+        ids = np.fromiter((self._token2id[token] for token in counter), dtype=ID_DTYPE, count=len(counter))
+        counts = np.fromiter(counter.values(), dtype=ID_DTYPE, count=len(counter))
+        order = np.argsort(ids, kind="stable")
+        self._ids.append(ids[order])
+        self._counts.append(counts[order])
+        return len(self._ids) - 1
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        return iter(zip(self._ids, self._counts))
+
+    def __getitem__(self, index: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self._ids[index], self._counts[index]
+
+    @property
+    def vocabulary(self) -> List[str]:
+        return self._id2token
+
+    def tokens(self, index: int) -> List[str]:
+        """
+        :return: The tokens of a document, each repeated by its count (in id order).
+        """
+        ids, counts = self[index]
+        return [self._id2token[i] for i, c in zip(ids.tolist(), counts.tolist()) for _ in range(c)]
+
+    def subset(self, indices: Sequence[int]) -> "TokenStore":
+        """
+        A store with only the given documents. Arrays and vocabulary are shared, not copied.
+        """
+        store = TokenStore(self._id2token, self._token2id)
+        store._ids = [self._ids[i] for i in indices]
+        store._counts = [self._counts[i] for i in indices]
+        return store
+
+    def nbytes(self) -> int:
+        """
+        :return: Memory held by the id and count arrays.
+        """
+        return sum(ids.nbytes + counts.nbytes for ids, counts in self)
+
+    def _map_shards(self, func: Callable, workers: int, *args) -> list:
+        """
+        Apply `func(ids, counts, *args)` to contiguous shards of documents, in a process pool if workers > 1.
+
+        :return: The results of the shards, in document order.
+        """
+        if workers <= 1 or len(self) < 2:
+            return [func(self._ids, self._counts, *args)]
+        step = -(-len(self) // workers)
+        bounds = [(start, min(start + step, len(self))) for start in range(0, len(self), step)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(func, self._ids[start:stop], self._counts[start:stop], *args)
+                       for start, stop in bounds]
+            return [future.result() for future in futures]
+
+    def frequencies(self, workers: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param workers: Number of processes counting shards of documents; partial counts are summed.
+        :return: (document frequency, collection frequency) of every vocabulary id.
+        """
+        size = len(self._id2token)
+        partials = self._map_shards(_shard_frequencies, workers, size)
+        dfs = np.sum([partial[0] for partial in partials], axis=0)
+        cfs = np.sum([partial[1] for partial in partials], axis=0)
+        return dfs, cfs
+
+    def to_dictionary(self, workers: int = 1) -> corpora.Dictionary:
+        """
+        Build the gensim dictionary of the documents in this store.
+
+        :param workers: Number of processes used to count frequencies.
+        """
+        dfs, cfs = self.frequencies(workers)
+        present = np.flatnonzero(dfs) if self._ids_in_order else self._gensim_order()
+        dictionary = corpora.Dictionary()
+        dictionary.token2id = {self._id2token[i]: new_id for new_id, i in enumerate(present.tolist())}
+        dictionary.dfs = dict(enumerate(dfs[present].tolist()))
+        dictionary.cfs = dict(enumerate(cfs[present].tolist()))
+        dictionary.num_docs = len(self)
+        dictionary.num_pos = int(cfs.sum())
+        dictionary.num_nnz = int(sum(len(ids) for ids in self._ids))
+        return dictionary
+
+    def _gensim_order(self) -> np.ndarray:
+        """
+        :return: The vocabulary ids used by the documents of this store, in the order gensim would number
+            them: by the first document containing them, and by token within a document.
+        """
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        documents = np.repeat(np.arange(len(self)), [len(ids) for ids in self._ids])
+        used, first = np.unique(np.concatenate(self._ids), return_index=True)
+        tokens = np.array([self._id2token[i] for i in used.tolist()])
+        return used[np.lexsort((tokens, documents[first]))].astype(np.int64)
+
+    def id_map(self, dictionary: corpora.Dictionary) -> np.ndarray:
+        """
+        :return: Array mapping each vocabulary id to its id in the dictionary, or -1 if it was filtered out.
+        """
+        mapping = np.full(len(self._id2token), -1, dtype=np.int64)
+        for token, new_id in dictionary.token2id.items():
+            old_id = self._token2id.get(token)
+            if old_id is not None:
+                mapping[old_id] = new_id
+        return mapping
+
+    @staticmethod
+    def _is_ordered(mapping: np.ndarray) -> bool:
+        # Dictionaries built from this store keep the relative id order, so no per-document sort is needed
+        kept = mapping[mapping >= 0]
+        return bool(np.all(kept[1:] > kept[:-1]))
+
+    def to_bow(self, index: int, mapping: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        Convert one document to a gensim bag-of-words with ids remapped by `id_map`.
+        """
+        ids, counts = self[index]
+        return _shard_bow([ids], [counts], mapping, False)[0]
+
+    def to_corpus(self, dictionary: corpora.Dictionary, workers: int = 1) -> List[List[Tuple[int, int]]]:
+        """
+        Build the BoW corpus, identical to `[dictionary.doc2bow(doc) for doc in documents]`.
+
+        :param workers: Number of processes converting shards of documents.
+        """
+        mapping = self.id_map(dictionary)
+        shards = self._map_shards(_shard_bow, workers, mapping, self._is_ordered(mapping))
+        return [bow for shard in shards for bow in shard]
+
+    def to_csr(self, dictionary: corpora.Dictionary) -> sparse.csr_matrix:
+        """
+        Build the document-term matrix with the same content as `to_corpus`: one row per document,
+        one column per dictionary id, counts as values.
+        """
+        mapping = self.id_map(dictionary)
+        shape = (len(self), len(dictionary))
+        if not len(self):
+            return sparse.csr_matrix(shape, dtype=np.int64)
+        columns = mapping[np.concatenate(self._ids)]
+        keep = columns >= 0
+        rows = np.repeat(np.arange(len(self)), [len(ids) for ids in self._ids])[keep]
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self)), out=indptr[1:])
+        matrix = sparse.csr_matrix((np.concatenate(self._counts)[keep].astype(np.int64),
+                                    columns[keep].astype(np.int32), indptr), shape=shape)
+        if not self._is_ordered(mapping):
+            matrix.sort_indices()
+        return matrix
+
+
+class TestTokenStore(unittest.TestCase):
+    def setUp(self):
+        words = ["franchise", "royalty", "contract", "brand", "fee", "territory", "owner", "agency", "trust"]
+        rng = np.random.default_rng(7)
+        self.documents = [[words[i] for i in rng.integers(0, len(words) - offset, size=30)]
+                          for offset in (0, 1, 2, 3, 4, 5)]
+        self.documents.append([])
+        self.store = TokenStore()
+        for document in self.documents:
+            self.store.add(document)
+
+    def assertSameDictionary(self, actual: corpora.Dictionary, expected: corpora.Dictionary):
+        self.assertEqual(actual.token2id, expected.token2id)
+        self.assertEqual(actual.dfs, expected.dfs)
+        self.assertEqual(actual.cfs, expected.cfs)
+        self.assertEqual((actual.num_docs, actual.num_pos, actual.num_nnz),
+                         (expected.num_docs, expected.num_pos, expected.num_nnz))
+
+    def test_dictionary_matches_gensim(self):
+        self.assertSameDictionary(self.store.to_dictionary(), corpora.Dictionary(self.documents))
+
+    def test_corpus_matches_gensim(self):
+        expected = corpora.Dictionary(self.documents)
+        expected.filter_extremes(no_below=2, no_above=0.9)
+        dictionary = self.store.to_dictionary()
+        dictionary.filter_extremes(no_below=2, no_above=0.9)
+
+        self.assertEqual(dictionary.token2id, expected.token2id)
+        corpus = self.store.to_corpus(dictionary)
+        self.assertEqual(corpus, [expected.doc2bow(document) for document in self.documents])
+        self.assertEqual(self.store.to_csr(dictionary).toarray().tolist(),
+                         [[dict(bow).get(i, 0) for i in range(len(dictionary))] for bow in corpus])
+
+    def test_sharded_in_processes(self):
+        dictionary = self.store.to_dictionary()
+        self.assertSameDictionary(self.store.to_dictionary(workers=2), dictionary)
+        self.assertEqual(self.store.to_corpus(dictionary, workers=2), self.store.to_corpus(dictionary))
+
+    def test_subset_matches_gensim(self):
+        indices = [1, 3, 4]
+        subset = self.store.subset(indices)
+        documents = [self.documents[i] for i in indices]
+
+        expected = corpora.Dictionary(documents)
+        self.assertSameDictionary(subset.to_dictionary(), expected)
+        self.assertEqual(subset.to_corpus(subset.to_dictionary()),
+                         [expected.doc2bow(document) for document in documents])
+        self.assertIs(subset.vocabulary, self.store.vocabulary)
+
+    def test_subset_renumbers_like_gensim(self):
+        # The skipped first document introduced "b" and "c", so the shared ids are not in gensim's order
+        documents = [["b", "b", "c"], ["a", "b", "c", "c"], ["a", "d", "d"]]
+        store = TokenStore()
+        for document in documents:
+            store.add(document)
+
+        for indices in ([1, 2], [2, 1], [2]):
+            subset = store.subset(indices)
+            expected = corpora.Dictionary([documents[i] for i in indices])
+            self.assertSameDictionary(subset.to_dictionary(), expected)
+            self.assertEqual(subset.to_corpus(subset.to_dictionary()),
+                             [expected.doc2bow(documents[i]) for i in indices])
+            self.assertEqual(subset.to_csr(subset.to_dictionary()).toarray().tolist(),
+                             [[dict(expected.doc2bow(documents[i])).get(j, 0) for j in range(len(expected))]
+                              for i in indices])
+
+    def test_tokens_round_trip(self):
+        for index, document in enumerate(self.documents):
+            self.assertEqual(sorted(self.store.tokens(index)), sorted(document))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+"""
+Throughput benchmark of the extraction, NLP and LDA stages on a synthetic PDF corpus.
+
+Run from the repository root:
+    python -m test.benchmark --sizes 5 20 50 --baseline ./output/benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import logging
+from typing import Dict, List, Optional
+
+from src.config import ReaderSettings, ProcessorConfig, LdaConfig
+from src.pdf_reader import PdfReader, MultiReader
+from src.processor import Processor, Lda, TokenStore
+from src.instrumentation import Profiler
+from test.synthetic_corpus import make_corpus
+
+logger = logging.getLogger("WFM.Benchmark")
+
+
+def _throughput(profiler: Profiler, stage: str, units: int) -> dict:
+    stats = profiler.to_dict()["stages"].get(stage, {})
+    seconds = stats.get("wall_seconds", 0.0)
+    return {
+        "seconds": seconds,
+        "units": units,
+        "units_per_second": units / seconds if seconds else None,
+        "peak_rss_bytes": stats.get("peak_rss_bytes", 0),
+    }
+
+
+def run_size(directory: str, documents: int, pages: int, processor: Processor) -> Dict[str, dict]:
+    """
+    Benchmark every stage on a corpus of the given size.
+
+    :return: Throughput of each stage, in documents per second.
+    """
+    paths = make_corpus(directory, documents, pages)
+    profiler = Profiler()
+
+    texts = []
+    reader = PdfReader(ReaderSettings(), profiler)
+    with profiler.stage("PdfReader.read"):
+        for pdf_path in paths:
+            reader.set_path(pdf_path)
+            reader.open()
+            texts.append(reader.read())
+            reader.close()
+
+    with profiler.stage("MultiReader.read_all"):
+        MultiReader(directory, ReaderSettings()).read_all()
+
+    lda_config = LdaConfig()
+    lda_config.set_config(no_below=1, no_above=1.0, num_topics=4, passes=2, iterations=50)
+    lda = Lda(lda_config)
+    with profiler.stage("Processor.process"):
+        for text in texts:
+            processor.set_text(text)
+            lda.append_to_dtm(processor.process())
+
+    with profiler.stage("Lda.train_model"):
+        lda.train_model()
+
+    return {stage: _throughput(profiler, stage, documents)
+            for stage in ("PdfReader.read", "MultiReader.read_all", "Processor.process", "Lda.train_model")}
+
+
+def run_dictionary(documents: int, workers: int, vocabulary: int = 50000, seed: int = 0) -> Dict[str, dict]:
+    """
+    Benchmark dictionary and BoW construction on synthetic token lists: gensim's Dictionary/doc2bow
+    path against the TokenStore path, serial and with `workers` processes. All outputs must be identical.
+    """
+    import numpy as np
+    from gensim import corpora
+
+    rng = np.random.default_rng(seed)
+    words = np.array([f"term{i}" for i in range(vocabulary)])
+    docs = [words[rng.zipf(1.3, size=rng.integers(50, 300)) % vocabulary].tolist() for _ in range(documents)]
+    profiler = Profiler()
+
+    with profiler.stage("gensim"):
+        dictionary = corpora.Dictionary(docs)
+        dictionary.filter_extremes(no_below=2, no_above=0.6)
+        expected = [dictionary.doc2bow(doc) for doc in docs]
+
+    store = TokenStore()
+    with profiler.stage("TokenStore.add"):
+        for doc in docs:
+            store.add(doc)
+
+    for stage, stage_workers in (("TokenStore", 1), (f"TokenStore x{workers}", workers)):
+        with profiler.stage(stage):
+            store_dictionary = store.to_dictionary(stage_workers)
+            store_dictionary.filter_extremes(no_below=2, no_above=0.6)
+            corpus = store.to_corpus(store_dictionary, stage_workers)
+        if corpus != expected or store_dictionary.token2id != dictionary.token2id:
+            raise AssertionError(f"{stage} output differs from gensim")
+
+    return {stage: _throughput(profiler, stage, documents) for stage in profiler.to_dict()["stages"]}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    :return: Descriptions of the stages whose throughput dropped by more than `tolerance` against the baseline.
+    """
+    regressions = []
+    for size, stages in results["sizes"].items():
+        for stage, stats in stages.items():
+            old = baseline.get("sizes", {}).get(size, {}).get(stage, {}).get("units_per_second")
+            new = stats["units_per_second"]
+            if not old or not new:
+                continue
+            ratio = new / old
+            logger.info(f"{size:>6} docs  {stage:<22} {new:10.2f} docs/s  ({ratio:.2f}x baseline)")
+            if ratio < 1 - tolerance:
+                regressions.append(f"{stage} at {size} documents: {ratio:.2f}x baseline")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 50], help="Corpus sizes in documents")
+    parser.add_argument("--pages", type=int, default=6, help="Pages per synthetic document")
+    parser.add_argument("--output", default="./output/benchmarks", help="Directory for the result JSON files")
+    parser.add_argument("--baseline", help="Result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative throughput drop")
+    parser.add_argument("--model", default="en_core_web_sm", help="spaCy model")
+    parser.add_argument("--dictionary-docs", type=int, default=0,
+                        help="Also benchmark dictionary/BoW construction on this many documents (e.g. 100000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for the parallel paths")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s', level=logging.INFO)
+    logging.getLogger("WFM").setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    processor_config = ProcessorConfig()
+    processor_config.set_config(capitalise=False)
+    processor = Processor(processor_config, args.model)
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pages": args.pages,
+        "sizes": {},
+    }
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            logger.info(f"Benchmarking {size} documents")
+            results["sizes"][str(size)] = run_size(directory, size, args.pages, processor)
+    if args.dictionary_docs:
+        logger.info(f"Benchmarking dictionary construction on {args.dictionary_docs} documents")
+        results["sizes"].setdefault(str(args.dictionary_docs), {}).update(
+            run_dictionary(args.dictionary_docs, args.workers))
+
+    os.makedirs(args.output, exist_ok=True)
+    result_path = os.path.join(args.output, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(result_path, "w") as file:
+        json.dump(results, file, indent=2)
+    logger.info(f"Results written to {result_path}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            logger.warning(f"Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import os
+import random
+from typing import List
+import pymupdf as fitz
+
+# Base-14 fonts shipped with PyMuPDF: (body font, bold font)
+FONTS = [("helv", "hebo"), ("tiro", "tibo"), ("cour", "cobo")]
+TOPIC_WORDS = [
+    ["franchise", "franchisee", "franchisor", "royalty", "contract", "territory", "agreement", "outlet"],
+    ["market", "growth", "expansion", "strategy", "brand", "customer", "demand", "retail"],
+    ["governance", "control", "monitoring", "agency", "incentive", "ownership", "conflict", "trust"],
+    ["performance", "survival", "profit", "revenue", "efficiency", "investment", "capital", "risk"],
+]
+FILLER_WORDS = ["the", "of", "and", "in", "a", "to", "is", "that", "for", "with", "as", "on", "by"]
+
+
+def _sentence(rng: random.Random, topic: List[str]) -> str:
+    words = [rng.choice(topic) if rng.random() < 0.4 else rng.choice(FILLER_WORDS) for _ in range(rng.randint(8, 16))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, topic: List[str]) -> str:
+    return " ".join(_sentence(rng, topic) for _ in range(rng.randint(4, 8)))
+
+
+def make_pdf(file_path: str, pages: int = 6, seed: int = 0, references: bool = True) -> str:
+    """
+    Write a synthetic paper: a title page, body pages and an optional bold "References" section.
+
+    :param file_path: Where to save the PDF.
+    :param pages: Number of pages, including the references page.
+    :param seed: Seed making the document reproducible.
+    :param references: Whether to end the paper with a bold "References" heading.
+    :return: The path of the PDF.
+    """
+    rng = random.Random(seed)
+    body_font, bold_font = FONTS[seed % len(FONTS)]
+    body_size = rng.choice([9, 10, 11])
+    topic = TOPIC_WORDS[seed % len(TOPIC_WORDS)]
+
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        rect = page.rect
+        margin = rect.width * 0.12
+        if page_num == 0:
+            page.insert_textbox(fitz.Rect(margin, 60, rect.width - margin, 120),
+                                f"A Study of {topic[0].title()} and {topic[1].title()}",
+                                fontname=bold_font, fontsize=body_size + 8)
+        if references and page_num == pages - 1:
+            page.insert_textbox(fitz.Rect(margin, rect.height * 0.3, rect.width - margin, rect.height * 0.35),
+                                "References", fontname=bold_font, fontsize=body_size)
+            page.insert_textbox(fitz.Rect(margin, rect.height * 0.36, rect.width - margin, rect.height * 0.9),
+                                "\n".join(f"Author {i}. {_sentence(rng, topic)} Journal, {1990 + i}." for i in range(10)),
+                                fontname=body_font, fontsize=body_size - 1)
+            continue
+        page.insert_textbox(fitz.Rect(margin, rect.height * 0.2, rect.width - margin, rect.height * 0.85),
+                            "\n\n".join(_paragraph(rng, topic) for _ in range(2)),
+                            fontname=body_font, fontsize=body_size)
+    doc.save(file_path)
+    doc.close()
+    return file_path
+
+
+def make_corpus(directory: str, documents: int, pages: int = 6, seed: int = 0) -> List[str]:
+    """
+    Write `documents` synthetic papers into a directory.
+
+    :return: The paths of the PDFs.
+    """
+    os.makedirs(directory, exist_ok=True)
+    return [make_pdf(os.path.join(directory, f"Paper {index:05d}.pdf"), pages, seed + index)
+            for index in range(documents)]